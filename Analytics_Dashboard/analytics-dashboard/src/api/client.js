@@ -3,6 +3,7 @@ import axios from "axios";
 const API_BASE_URL =
   import.meta.env.VITE_API_URL || "http://localhost:8000/api/v1";
 const API_KEY = import.meta.env.VITE_API_KEY || "read-key-xyz789";
+const STREAM_RETRY_MS = 5000;
 
 // Create axios instance
 const apiClient = axios.create({
@@ -26,11 +27,51 @@ apiClient.interceptors.response.use(
 export const metricsApi = {
   getOverview: () => apiClient.get("/metrics/overview"),
   getTrends: (params = {}) => apiClient.get("/metrics/trends", { params }),
+  // params.group_by is "lane", "equipment" or "carrier"; params.top limits the series
+  getTrendSeries: (params = {}) =>
+    apiClient.get("/metrics/trends/series", { params }),
+  getDistinctCounts: (params = {}) =>
+    apiClient.get("/metrics/distinct-counts", { params }),
   getRecentCalls: (limit = 10) =>
     apiClient.get("/metrics/recent-calls", { params: { limit } }),
   getRateVarianceDistribution: () =>
     apiClient.get("/metrics/rate-variance-distribution"),
   getConversionFunnel: () => apiClient.get("/metrics/conversion-funnel"),
+  // EventSource can't send headers, so the stream is opened with a short-lived
+  // token instead of the key; listeners maps event names to handlers
+  openStream: (listeners) => {
+    let source = null;
+    let closed = false;
+    const open = () =>
+      apiClient
+        .post("/metrics/stream-token")
+        .then(({ data }) => {
+          if (closed) return;
+          source = new EventSource(
+            `${API_BASE_URL}/metrics/stream?token=${encodeURIComponent(data.token)}`
+          );
+          Object.entries(listeners).forEach(([event, listener]) =>
+            source.addEventListener(event, listener)
+          );
+          source.onerror = () => {
+            // The browser retries on its own unless the reconnect was refused
+            // (e.g. the token expired); then start over with a fresh token
+            if (source.readyState === EventSource.CLOSED && !closed) {
+              setTimeout(open, STREAM_RETRY_MS);
+            }
+          };
+        })
+        .catch(() => {
+          if (!closed) setTimeout(open, STREAM_RETRY_MS);
+        });
+    open();
+    return {
+      close: () => {
+        closed = true;
+        if (source) source.close();
+      },
+    };
+  },
 };
 
 export const breakdownsApi = {
@@ -40,7 +81,7 @@ export const breakdownsApi = {
 };
 
 export const carriersApi = {
-  getCarriers: () => apiClient.get("/carriers"),
+  getCarriers: (params = {}) => apiClient.get("/carriers", { params }),
   getCarrier: (id) => apiClient.get(`/carriers/${id}`),
   getCarrierEquipment: (id) => apiClient.get(`/carriers/${id}/equipment`),
   getCarrierLanes: (id) => apiClient.get(`/carriers/${id}/lanes`),
@@ -57,4 +98,9 @@ export const intelligenceApi = {
     }),
 };
 
+export const dashboardApi = {
+  // All panels of "performance" or "intelligence" from one consistent snapshot
+  getPage: (page, params = {}) => apiClient.get(`/dashboard/${page}`, { params }),
+};
+
 export default apiClient;
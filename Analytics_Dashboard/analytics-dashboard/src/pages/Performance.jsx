@@ -1,5 +1,5 @@
-import React, { useState } from "react";
-import { useQuery } from "@tanstack/react-query";
+import React, { useEffect, useState } from "react";
+import { useQuery, useQueryClient } from "@tanstack/react-query";
 import {
   Phone,
   TrendingUp,
@@ -18,6 +18,30 @@ import { metricsApi, breakdownsApi } from "../api/client";
 
 const Performance = () => {
   const [timeRange, setTimeRange] = useState("30"); // days
+  const queryClient = useQueryClient();
+
+  // Live updates pushed by the API instead of polling
+  useEffect(() => {
+    const stream = metricsApi.openStream({
+      overview: (event) => {
+        queryClient.setQueryData(["overview"], JSON.parse(event.data));
+        queryClient.invalidateQueries({ queryKey: ["recentCalls"] });
+      },
+      trend: (event) => {
+        const { data: points } = JSON.parse(event.data);
+        queryClient.setQueriesData({ queryKey: ["trends"] }, (current) => {
+          if (!current) return current;
+          const byDate = new Map(current.data.map((point) => [point.date, point]));
+          points.forEach((point) => byDate.set(point.date, point));
+          const data = [...byDate.values()].sort((a, b) =>
+            a.date.localeCompare(b.date)
+          );
+          return { ...current, data };
+        });
+      },
+    });
+    return () => stream.close();
+  }, [queryClient]);
   const {
     data: overview,
     isLoading: overviewLoading,
@@ -72,7 +96,6 @@ const Performance = () => {
   } = useQuery({
     queryKey: ["recentCalls"],
     queryFn: () => metricsApi.getRecentCalls(10).then((res) => res.data),
-    refetchInterval: 30000, // Refresh every 30 seconds
   });
 
   const {
@@ -0,0 +1,176 @@
+from collections import OrderedDict, defaultdict
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+import math
+import os
+import time
+from .auth import hash_api_key, key_ring
+
+API_PREFIX = "/api/v1"
+
+# Route classes in priority order: ingest is shed last, heavy reads first
+INGEST = "ingest"
+READ = "read"
+HEAVY_READ = "heavy_read"
+
+INGEST_PATHS = ("/events/",)
+HEAVY_READ_PATHS = (
+    "/breakdowns/by-carrier",
+    "/breakdowns/by-lane",
+    "/carriers",
+    "/dashboard/",
+    "/matching/",
+    "/metrics/trends",
+)
+# Long-lived streams are rate limited on connect but don't count as in-flight work
+STREAM_PATHS = ("/metrics/stream",)
+
+def _rate(variable: str, default: str) -> float:
+    return float(os.getenv(variable, default))
+
+# Token bucket per API key and route class: sustained requests/second and burst size (0 disables).
+# Requests without a valid key share one bucket per client address.
+RATE_LIMITS = {
+    INGEST: (_rate("INGEST_RATE_LIMIT_PER_SECOND", "50"), _rate("INGEST_RATE_LIMIT_BURST", "100")),
+    READ: (_rate("READ_RATE_LIMIT_PER_SECOND", "20"), _rate("READ_RATE_LIMIT_BURST", "40")),
+}
+RATE_LIMITS[HEAVY_READ] = RATE_LIMITS[READ]
+
+# Concurrent requests the worker admits before shedding; lower-priority classes
+# are shed earlier so ingest keeps flowing when reads pile up
+MAX_IN_FLIGHT = int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "64"))
+SHED_AT = {
+    HEAVY_READ: float(os.getenv("SHED_HEAVY_READS_AT", "0.5")),
+    READ: float(os.getenv("SHED_READS_AT", "0.8")),
+    INGEST: 1.0,
+}
+SHED_RETRY_AFTER_SECONDS = 1
+MAX_BUCKETS = 10_000
+
+def route_class(path: str):
+    if not path.startswith(API_PREFIX):
+        return None
+    path = path[len(API_PREFIX):]
+    if path.startswith(INGEST_PATHS):
+        return INGEST
+    if path.startswith(HEAVY_READ_PATHS):
+        return HEAVY_READ
+    return READ
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token; returns 0 if allowed, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+class AdmissionState:
+    """Buckets, in-flight count and counters shared by the middleware and /health"""
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.in_flight = 0
+        self.counters = defaultdict(lambda: {"admitted": 0, "rate_limited": 0, "shed": 0})
+
+    def bucket(self, client, klass: str):
+        """The bucket of a client (see AdmissionMiddleware._client) for a route class"""
+        rate, burst = RATE_LIMITS[klass]
+        if rate <= 0:
+            return None
+        # Heavy and normal reads share one budget per client
+        key = (client, READ if klass == HEAVY_READ else klass)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate, burst)
+            while len(self.buckets) > MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": MAX_IN_FLIGHT,
+            "classes": {klass: dict(counters) for klass, counters in self.counters.items()},
+        }
+
+admission_state = AdmissionState()
+
+class AdmissionMiddleware:
+    """Per-key token-bucket rate limiting and priority load shedding
+
+    Requests with a known API key are limited per key; anything else (no key,
+    an unknown key, stream tokens) per client address, so made-up keys can't
+    mint fresh buckets or evict real ones. Requests over their rate get 429, and requests shed under load get
+    503. Both responses carry Retry-After. Runs on the event loop, so no
+    locking is needed.
+    """
+
+    def __init__(self, app: ASGIApp, state: AdmissionState = admission_state):
+        self.app = app
+        self.state = state
+
+    def _client(self, scope: Scope) -> tuple:
+        headers = Headers(scope=scope)
+        authorization = headers.get("authorization", "")
+        if authorization.lower().startswith("bearer "):
+            api_key = authorization[7:].strip()
+        else:
+            api_key = headers.get("x-api-key")
+        if api_key and key_ring.scopes(api_key):
+            return ("key", hash_api_key(api_key))
+        address = scope.get("client")
+        return ("address", address[0] if address else None)
+
+    async def _reject(self, scope, receive, send, status_code: int, detail: str, retry_after: float):
+        response = JSONResponse(
+            {"detail": detail},
+            status_code=status_code,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+        await response(scope, receive, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        klass = route_class(scope["path"]) if scope["type"] == "http" else None
+        if klass is None or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+        state = self.state
+        counters = state.counters[klass]
+
+        bucket = state.bucket(self._client(scope), klass)
+        if bucket is not None:
+            wait = bucket.take()
+            if wait:
+                counters["rate_limited"] += 1
+                await self._reject(scope, receive, send, 429, "Rate limit exceeded", wait)
+                return
+
+        if scope["path"][len(API_PREFIX):].startswith(STREAM_PATHS):
+            counters["admitted"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        if state.in_flight >= MAX_IN_FLIGHT * SHED_AT[klass]:
+            counters["shed"] += 1
+            await self._reject(scope, receive, send, 503, "Server busy, try again shortly", SHED_RETRY_AFTER_SECONDS)
+            return
+
+        counters["admitted"] += 1
+        state.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            state.in_flight -= 1
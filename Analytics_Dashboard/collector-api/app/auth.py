@@ -1,105 +1,197 @@
 from fastapi import HTTPException, Depends, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, FrozenSet, Optional
+import hashlib
+import hmac
 import os
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
 
 security = HTTPBearer(auto_error=False)
 
-def get_api_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Validate API key from either Authorization header or x-api-key header"""
-    
-    # Try to get API key from Authorization header first
-    if credentials:
-        api_key = credentials.credentials
-    else:
-        # Fall back to x-api-key header
-        api_key = request.headers.get("x-api-key")
-    
+READ_SCOPE = "read"
+INGEST_SCOPE = "ingest"
+
+# Environment variables holding comma-separated keys for each scope. The singular
+# variables are the original single-key settings; list several keys to rotate.
+# Entries may be plain keys or "sha256:<hex digest>" so plaintext never has to be deployed.
+SCOPE_KEY_VARIABLES = {
+    READ_SCOPE: ("READ_API_KEY", "READ_API_KEYS"),
+    INGEST_SCOPE: ("INGEST_API_KEY", "INGEST_API_KEYS"),
+}
+
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+
+# Signed tokens that open /metrics/stream (browser EventSource can't send headers).
+# Every worker must share the secret; without one it's derived from the read keys.
+STREAM_TOKEN_SECRET = os.getenv("STREAM_TOKEN_SECRET", "")
+STREAM_TOKEN_TTL_SECONDS = int(os.getenv("STREAM_TOKEN_TTL_SECONDS", "60"))
+
+def hash_api_key(api_key: str) -> bytes:
+    return hashlib.sha256(api_key.encode("utf-8")).digest()
+
+def _parse_key(entry: str) -> bytes:
+    if entry.startswith("sha256:"):
+        return bytes.fromhex(entry[len("sha256:"):])
+    return hash_api_key(entry)
+
+class KeyRing:
+    """API key digests and their scopes, loaded once from the environment
+
+    Presented keys are hashed and compared against every known digest with
+    hmac.compare_digest; accepted keys are cached (bounded) so repeat requests
+    skip the hashing entirely. Call reload() after rotating keys.
+    """
+
+    def __init__(self, max_cached: int = AUTH_CACHE_SIZE):
+        self.max_cached = max_cached
+        self._digests: Dict[bytes, FrozenSet[str]] = {}
+        self._configured: FrozenSet[str] = frozenset()
+        self._cache = OrderedDict()
+        self._lock = Lock()
+        self.reload()
+
+    def reload(self):
+        scopes_by_digest: Dict[bytes, set] = {}
+        for scope, variables in SCOPE_KEY_VARIABLES.items():
+            for variable in variables:
+                for entry in os.getenv(variable, "").split(","):
+                    entry = entry.strip()
+                    if entry:
+                        scopes_by_digest.setdefault(_parse_key(entry), set()).add(scope)
+        with self._lock:
+            self._digests = {digest: frozenset(scopes) for digest, scopes in scopes_by_digest.items()}
+            self._configured = frozenset(scope for scopes in self._digests.values() for scope in scopes)
+            self._cache.clear()
+
+    def fingerprint(self, scope: str) -> bytes:
+        """A digest of every key granting scope (changes when they are rotated)"""
+        with self._lock:
+            digests = sorted(digest for digest, scopes in self._digests.items() if scope in scopes)
+        return hashlib.sha256(b"".join(digests)).digest()
+
+    def is_configured(self, scope: Optional[str] = None) -> bool:
+        return bool(self._configured) if scope is None else scope in self._configured
+
+    def scopes(self, api_key: str) -> FrozenSet[str]:
+        """Scopes granted to api_key (empty if the key is unknown)"""
+        with self._lock:
+            scopes = self._cache.get(api_key)
+            if scopes is not None:
+                self._cache.move_to_end(api_key)
+                return scopes
+
+        presented = hash_api_key(api_key)
+        scopes = frozenset()
+        # Compare against every digest so timing doesn't depend on which one matched
+        for digest, digest_scopes in self._digests.items():
+            if hmac.compare_digest(presented, digest):
+                scopes = digest_scopes
+
+        if scopes:
+            # Only accepted keys are cached, so bad keys can't flush the cache
+            with self._lock:
+                self._cache[api_key] = scopes
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+        return scopes
+
+key_ring = KeyRing()
+
+def reload_api_keys():
+    """Re-read API keys from the environment (e.g. after adding or retiring a key)"""
+    key_ring.reload()
+
+def _presented_key(request: Request, credentials: Optional[HTTPAuthorizationCredentials]) -> str:
+    # Try to get API key from Authorization header first, then x-api-key
+    api_key = credentials.credentials if credentials else request.headers.get("x-api-key")
     if not api_key:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API key required in Authorization header or x-api-key header"
         )
-    
-    # Get valid API keys from environment
-    ingest_key = os.getenv("INGEST_API_KEY")
-    read_key = os.getenv("READ_API_KEY")
-    
-    valid_keys = [k for k in [ingest_key, read_key] if k]
-    
-    if not valid_keys:
+    return api_key
+
+def require_scope(request: Request, credentials: Optional[HTTPAuthorizationCredentials], scope: str, label: str) -> str:
+    """Validate the presented API key and require it to carry scope"""
+    api_key = _presented_key(request, credentials)
+
+    if not key_ring.is_configured(scope):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="API keys not configured"
+            detail=f"{label} API key not configured"
         )
-    
-    if api_key not in valid_keys:
+
+    if scope not in key_ring.scopes(api_key):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid API key"
+            detail=f"Invalid {label.lower()} API key"
         )
-    
+
     return api_key
 
-def require_ingest_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Require ingest API key for webhook endpoints"""
-    
-    # Try to get API key from Authorization header first
-    if credentials:
-        api_key = credentials.credentials
-    else:
-        # Fall back to x-api-key header
-        api_key = request.headers.get("x-api-key")
-    
-    if not api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="API key required in Authorization header or x-api-key header"
-        )
-    
-    ingest_key = os.getenv("INGEST_API_KEY")
-    
-    if not ingest_key:
+def get_api_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Validate API key from either Authorization header or x-api-key header"""
+    api_key = _presented_key(request, credentials)
+
+    if not key_ring.is_configured():
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Ingest API key not configured"
+            detail="API keys not configured"
         )
-    
-    if api_key != ingest_key:
+
+    if not key_ring.scopes(api_key):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid ingest API key"
+            detail="Invalid API key"
         )
-    
+
     return api_key
 
+def require_ingest_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Require ingest API key for webhook endpoints"""
+    return require_scope(request, credentials, INGEST_SCOPE, "Ingest")
+
 def require_read_key(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Require read API key for analytics endpoints"""
-    
-    # Try to get API key from Authorization header first
-    if credentials:
-        api_key = credentials.credentials
-    else:
-        # Fall back to x-api-key header
-        api_key = request.headers.get("x-api-key")
-    
-    if not api_key:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="API key required in Authorization header or x-api-key header"
-        )
-    
-    read_key = os.getenv("READ_API_KEY")
-    
-    if not read_key:
+    return require_scope(request, credentials, READ_SCOPE, "Read")
+
+def _stream_signature(expires: int) -> str:
+    secret = STREAM_TOKEN_SECRET.encode() if STREAM_TOKEN_SECRET else key_ring.fingerprint(READ_SCOPE)
+    return hmac.new(secret, f"stream:{expires}".encode(), hashlib.sha256).hexdigest()
+
+def issue_stream_token() -> Dict[str, int]:
+    """A token that opens the metrics stream within STREAM_TOKEN_TTL_SECONDS"""
+    expires = int(time.time()) + STREAM_TOKEN_TTL_SECONDS
+    return {"token": f"{expires}.{_stream_signature(expires)}", "expires_at": expires}
+
+def verify_stream_token(token: str) -> bool:
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(signature, _stream_signature(int(expires)))
+
+def require_read_key_for_stream(request: Request, credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Require a read API key, or a stream token in the token query parameter, for streaming endpoints
+
+    Tokens come from POST /metrics/stream-token, so the key itself never appears in a URL.
+    """
+    token = request.query_params.get("token")
+    if credentials or request.headers.get("x-api-key") or not token:
+        return require_read_key(request, credentials)
+
+    if not key_ring.is_configured(READ_SCOPE):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Read API key not configured"
         )
-    
-    if api_key != read_key:
+    if not verify_stream_token(token):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid read API key"
+            detail="Invalid or expired stream token"
         )
-    
-    return api_key
+    return token
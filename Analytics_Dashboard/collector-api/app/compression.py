@@ -0,0 +1,43 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+import os
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+
+try:
+    # Optional: brotli-asgi serves br when the client accepts it and falls back to gzip
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+class CompressionMiddleware:
+    """Compress responses above a size threshold (brotli if available, else gzip)
+
+    Server-sent event streams are passed through untouched, since the
+    compressors buffer output and would hold back individual events.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed_app = BrotliMiddleware(
+                app,
+                minimum_size=minimum_size,
+                gzip_fallback=True
+            )
+        else:
+            self.compressed_app = GZipMiddleware(
+                app,
+                minimum_size=minimum_size,
+                compresslevel=COMPRESSION_LEVEL
+            )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "text/event-stream" not in headers.get("accept", ""):
+                await self.compressed_app(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
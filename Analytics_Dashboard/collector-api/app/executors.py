@@ -0,0 +1,54 @@
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+from typing import Any, Callable, Optional
+import asyncio
+import os
+
+# Threads for blocking database calls made from async handlers
+DB_THREAD_POOL_SIZE = int(os.getenv("DB_THREAD_POOL_SIZE", "32"))
+# Processes for CPU-bound scoring / aggregation (0 runs that work on the DB threads instead)
+CPU_PROCESS_POOL_SIZE = int(os.getenv("CPU_PROCESS_POOL_SIZE", "2"))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_THREAD_POOL_SIZE, thread_name_prefix="db")
+
+_cpu_executor: Optional[ProcessPoolExecutor] = None
+_cpu_lock = Lock()
+
+def _get_cpu_executor() -> Optional[ProcessPoolExecutor]:
+    # Started on first use so imports and boot don't pay for forking workers
+    global _cpu_executor
+    if CPU_PROCESS_POOL_SIZE <= 0:
+        return None
+    with _cpu_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ProcessPoolExecutor(max_workers=CPU_PROCESS_POOL_SIZE)
+        return _cpu_executor
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking database call on the DB thread pool, off the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(db_executor, partial(fn, *args, **kwargs))
+
+async def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound work in the process pool
+
+    fn must be a module-level function and its arguments and result picklable
+    (plain data or Pydantic models, never sessions or ORM rows).
+    """
+    executor = _get_cpu_executor() or db_executor
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args, **kwargs))
+
+def executor_stats() -> dict:
+    return {
+        "db_threads": DB_THREAD_POOL_SIZE,
+        "db_queue": db_executor._work_queue.qsize(),
+        "cpu_processes": CPU_PROCESS_POOL_SIZE if _cpu_executor is not None else 0,
+    }
+
+def shutdown_executors():
+    global _cpu_executor
+    db_executor.shutdown(wait=False, cancel_futures=True)
+    with _cpu_lock:
+        if _cpu_executor is not None:
+            _cpu_executor.shutdown(wait=False, cancel_futures=True)
+            _cpu_executor = None
@@ -1,30 +1,132 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
+from sqlalchemy import inspect, text
 
-from .database import engine, Base
-from .routes import ingest, metrics, breakdowns, intelligence
+from .database import engine, Base, SessionLocal, read_router
+from .routes import ingest, metrics, breakdowns, intelligence, dashboard
+from .utils.carrier_cache import carrier_resolver
+from .utils.dimensions import lane_dimension, equipment_dimension
+from .utils.live_metrics import metrics_publisher
+from .utils.fast_json import FastJSONResponse
+from .utils.result_cache import result_cache
+from .utils.single_flight import single_flight
+from .utils.olap_mirror import olap_mirror, run_tailer
+from .utils.cold_archive import cold_archive
+from .utils.cache_invalidation import invalidation_listener, run_listener, CACHE_INVALIDATION_LISTENER
+from .compression import CompressionMiddleware
+from .admission import AdmissionMiddleware, admission_state
+from .executors import run_db, executor_stats, shutdown_executors
 
 load_dotenv()
 
-# Create tables
+logger = logging.getLogger(__name__)
+
+# "create_all" creates missing tables on boot; "migrations" skips schema
+# introspection and relies on `alembic upgrade head` having been run
+SCHEMA_MODE = os.getenv("SCHEMA_MODE", "create_all")
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+def prepare_schema():
+    """Create (create_all mode) or check the schema; refuse to start behind the Alembic head
+
+    create_all only adds missing tables, never columns, so a database created
+    by an older version must be upgraded with `alembic upgrade head` first.
+    A database create_all builds from scratch is stamped at head.
+    """
+    from alembic.config import Config
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    config = Config(ALEMBIC_INI)
+    config.set_main_option("script_location", os.path.join(os.path.dirname(ALEMBIC_INI), "migrations"))
+    scripts = ScriptDirectory.from_config(config)
+    head = scripts.get_current_head()
+    with engine.begin() as connection:
+        context = MigrationContext.configure(connection)
+        current = context.get_current_revision()
+        if SCHEMA_MODE == "create_all" and current is None and not inspect(connection).get_table_names():
+            Base.metadata.create_all(bind=connection)
+            context.stamp(scripts, head)
+            return
+        if current != head:
+            raise RuntimeError(
+                f"Database schema is at revision {current or 'none'}, expected {head}; run `alembic upgrade head`"
+            )
+
+# Built from call_events by ingest and scripts/rebuild_rollups.py, never by migrations
+DERIVED_TABLES = ("carrier_daily_stats", "carrier_decayed_stats", "rate_sketch_buckets", "distinct_sketch_registers")
+
+def check_derived_tables():
+    """Warn when there are call events but derived tables were never filled
+
+    This happens after `alembic upgrade head` on a database created before
+    those tables existed: percentiles, distinct counts and windowed carrier
+    scores read as empty until scripts/rebuild_rollups.py runs.
+    """
+    with engine.connect() as connection:
+        if not connection.execute(text("SELECT EXISTS (SELECT 1 FROM call_events)")).scalar():
+            return
+        empty = [
+            table for table in DERIVED_TABLES
+            if not connection.execute(text(f"SELECT EXISTS (SELECT 1 FROM {table})")).scalar()
+        ]
+    if empty:
+        logger.warning(
+            "call_events has rows but %s %s empty; run `python scripts/rebuild_rollups.py`",
+            ", ".join(empty), "is" if len(empty) == 1 else "are"
+        )
+
+def warm_carrier_cache():
+    db = SessionLocal()
+    try:
+        carrier_resolver.warm(db)
+        lane_dimension.warm(db)
+        equipment_dimension.warm(db)
+    except Exception:
+        logger.exception("Failed to warm carrier cache")
+    finally:
+        db.close()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
+    prepare_schema()
+    check_derived_tables()
+    # Warm in the background; until then ingest resolves carriers from the database
+    warm_task = asyncio.create_task(run_db(warm_carrier_cache))
+    # Keep the DuckDB mirror in sync when OLAP_MIRROR_PATH is set
+    mirror_task = asyncio.create_task(run_tailer(read_router.session, run_db)) if olap_mirror.enabled else None
+    # Drop cached aggregates when any worker commits a change they depend on
+    listen = CACHE_INVALIDATION_LISTENER and engine.dialect.name == "postgresql"
+    invalidation_task = asyncio.create_task(run_listener(engine)) if listen else None
     yield
     # Shutdown
-    pass
+    warm_task.cancel()
+    if mirror_task is not None:
+        mirror_task.cancel()
+    if invalidation_task is not None:
+        invalidation_task.cancel()
+    await metrics_publisher.close()
+    read_router.dispose()
+    shutdown_executors()
+    olap_mirror.close()
 
 app = FastAPI(
     title="HappyRobot Analytics Collector API",
     description="API for collecting and analyzing carrier call data",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
+# Rate limiting and load shedding (innermost, so 429/503 still get CORS headers)
+app.add_middleware(AdmissionMiddleware)
+
 # CORS configuration
 cors_origins = os.getenv("CORS_ORIGINS", "*").split(",")
 app.add_middleware(
@@ -33,18 +135,34 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Last-Write"],
 )
 
+# Compress large responses (carrier lists, breakdowns)
+app.add_middleware(CompressionMiddleware)
+
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "collector-api"}
+    return {
+        "status": "healthy",
+        "service": "collector-api",
+        "database": read_router.stats(),
+        "result_cache": result_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "admission": admission_state.stats(),
+        "executors": executor_stats(),
+        "olap_mirror": olap_mirror.stats(),
+        "cache_invalidation": invalidation_listener.stats(),
+        "cold_archive": cold_archive.stats(),
+    }
 
 # Include routers
 app.include_router(ingest.router, prefix="/api/v1", tags=["ingest"])
 app.include_router(metrics.router, prefix="/api/v1", tags=["metrics"])
 app.include_router(breakdowns.router, prefix="/api/v1", tags=["breakdowns"])
 app.include_router(intelligence.router, prefix="/api/v1", tags=["intelligence"])
+app.include_router(dashboard.router, prefix="/api/v1", tags=["dashboard"])
 
 if __name__ == "__main__":
     import uvicorn
@@ -1,8 +1,20 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, Boolean, Index, Date, Numeric, ForeignKey, CheckConstraint
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Integer, SmallInteger, BigInteger, Float, DateTime, Boolean, Index, Date, Numeric, ForeignKey, CheckConstraint, UniqueConstraint
+from sqlalchemy.sql import func, literal_column
 from sqlalchemy.orm import relationship
 from .database import Base
 
+# Carrier names are matched on a key with runs of ASCII whitespace collapsed, trimmed
+# and lowercased; the whitespace class is spelled out so Postgres and Python
+# (utils/carrier_cache.normalize_carrier_name) agree on it
+CARRIER_NAME_WHITESPACE = r"[ \t\n\r\f\v]+"
+CARRIER_NAME_KEY_SQL = "lower(btrim(regexp_replace({column}, '" + CARRIER_NAME_WHITESPACE + "', ' ', 'g')))"
+
+def carrier_name_key(column):
+    """SQL carrier name key of a name column (constants inlined so uq_carriers_name_key matches)"""
+    return func.lower(func.btrim(func.regexp_replace(
+        column, literal_column(f"'{CARRIER_NAME_WHITESPACE}'"), literal_column("' '"), literal_column("'g'")
+    )))
+
 class Carrier(Base):
     __tablename__ = "carriers"
     
@@ -43,16 +55,77 @@ class Carrier(Base):
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
+    daily_stats = relationship("CarrierDailyStats", back_populates="carrier", cascade="all, delete-orphan")
+    decayed_stats = relationship("CarrierDecayedStats", back_populates="carrier", uselist=False, cascade="all, delete-orphan")
     equipment = relationship("CarrierEquipment", back_populates="carrier", cascade="all, delete-orphan")
     lanes = relationship("CarrierLane", back_populates="carrier", cascade="all, delete-orphan")
     call_events = relationship("CallEvent", back_populates="carrier")
     
     __table_args__ = (
         CheckConstraint("status IN ('active', 'inactive', 'watch_list')"),
-        Index('idx_carriers_success_rate', 'success_rate'),
-        Index('idx_carriers_avg_rpm', 'avg_rpm'),
     )
 
+# One carrier per normalized name (ingest and the bulk loader resolve names through it)
+Index('uq_carriers_name_key', carrier_name_key(Carrier.carrier_name), unique=True)
+
+# GET /carriers sort orders (nulls lowest, carrier_id tie-break): scanned forward
+# for descending sorts and backward for ascending ones
+Index('idx_carriers_success_rate_sort', Carrier.success_rate.desc().nullslast(), Carrier.carrier_id.desc())
+Index('idx_carriers_avg_rpm_sort', Carrier.avg_rpm.desc().nullslast(), Carrier.carrier_id.desc())
+Index('idx_carriers_total_calls_sort', Carrier.total_calls.desc().nullslast(), Carrier.carrier_id.desc())
+Index('idx_carriers_last_call_date_sort', Carrier.last_call_date.desc().nullslast(), Carrier.carrier_id.desc())
+
+class CarrierDailyStats(Base):
+    __tablename__ = "carrier_daily_stats"
+    
+    # Per-carrier, per-day counters; rolling 7/30/90-day windows are sums over these rows
+    id = Column(Integer, primary_key=True, index=True)
+    carrier_id = Column(Integer, ForeignKey('carriers.carrier_id', ondelete='CASCADE'), nullable=False)
+    stat_date = Column(Date, nullable=False)
+    total_calls = Column(Integer, default=0, nullable=False)
+    successful_calls = Column(Integer, default=0, nullable=False)
+    rpm_sum = Column(Float, default=0, nullable=False)
+    rpm_count = Column(Integer, default=0, nullable=False)
+    rounds_sum = Column(Integer, default=0, nullable=False)
+    rounds_count = Column(Integer, default=0, nullable=False)
+    
+    # Relationships
+    carrier = relationship("Carrier", back_populates="daily_stats")
+    
+    __table_args__ = (
+        UniqueConstraint('carrier_id', 'stat_date', name='uq_carrier_daily_stats_carrier_date'),
+        Index('idx_carrier_daily_stats_stat_date', 'stat_date'),
+    )
+
+class CarrierDecayedStats(Base):
+    __tablename__ = "carrier_decayed_stats"
+    
+    # Exponentially-decayed sums (see utils/carrier_stats.py), all decayed to as_of
+    carrier_id = Column(Integer, ForeignKey('carriers.carrier_id', ondelete='CASCADE'), primary_key=True)
+    calls = Column(Float, default=0, nullable=False)
+    successful_calls = Column(Float, default=0, nullable=False)
+    rpm_sum = Column(Float, default=0, nullable=False)
+    rpm_weight = Column(Float, default=0, nullable=False)
+    rounds_sum = Column(Float, default=0, nullable=False)
+    rounds_weight = Column(Float, default=0, nullable=False)
+    as_of = Column(Date, nullable=False)
+    
+    # Relationships
+    carrier = relationship("Carrier", back_populates="decayed_stats")
+
+class Lane(Base):
+    __tablename__ = "lanes"
+    
+    # Dictionary of lane names; call_events and carrier_lanes reference lane_id
+    lane_id = Column(Integer, primary_key=True)
+    name = Column(String(200), unique=True, nullable=False)
+
+class EquipmentType(Base):
+    __tablename__ = "equipment_types"
+    
+    equipment_type_id = Column(SmallInteger, primary_key=True)
+    name = Column(String(50), unique=True, nullable=False)
+
 class CarrierEquipment(Base):
     __tablename__ = "carrier_equipment"
     
@@ -77,6 +150,7 @@ class CarrierLane(Base):
     id = Column(Integer, primary_key=True, index=True)
     carrier_id = Column(Integer, ForeignKey('carriers.carrier_id', ondelete='CASCADE'), nullable=False)
     lane = Column(String(200), nullable=False)
+    lane_id = Column(Integer, ForeignKey('lanes.lane_id'))
     miles = Column(Integer)
     
     # Performance
@@ -94,6 +168,7 @@ class CarrierLane(Base):
     __table_args__ = (
         Index('idx_carrier_lanes_carrier_id', 'carrier_id'),
         Index('idx_carrier_lanes_lane', 'lane'),
+        Index('idx_carrier_lanes_lane_id', 'lane_id'),
     )
 
 class CallEvent(Base):
@@ -108,6 +183,8 @@ class CallEvent(Base):
     lane = Column(String(200), nullable=False)
     miles = Column(Integer, nullable=False)
     equipment_type = Column(String(50), nullable=False)
+    lane_id = Column(Integer, ForeignKey('lanes.lane_id'), nullable=False)
+    equipment_type_id = Column(SmallInteger, ForeignKey('equipment_types.equipment_type_id'), nullable=False)
     commodity_type = Column(String(100))
     weight = Column(Integer)
     
@@ -150,6 +227,49 @@ class CallEvent(Base):
         Index('idx_call_events_carrier_name', 'carrier_name'),
         Index('idx_call_events_lane', 'lane'),
         Index('idx_call_events_equipment_type', 'equipment_type'),
+        Index('idx_call_events_lane_id', 'lane_id'),
+        Index('idx_call_events_equipment_type_id', 'equipment_type_id'),
         Index('idx_call_events_outcome', 'group_outcome_simple'),
         Index('idx_call_events_created_at', 'created_at'),
     )
+
+class RateSketchBucket(Base):
+    __tablename__ = "rate_sketch_buckets"
+    
+    # DDSketch bucket counts of final rate per mile (see utils/rate_sketch.py).
+    # scope 'lane_equipment' uses carrier_id 0; scope 'carrier_lane' uses equipment_type ''.
+    scope = Column(String(20), primary_key=True)
+    lane = Column(String(200), primary_key=True)
+    equipment_type = Column(String(50), primary_key=True, default='')
+    carrier_id = Column(Integer, primary_key=True, default=0)
+    bucket = Column(Integer, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+    
+    __table_args__ = (
+        CheckConstraint("scope IN ('lane_equipment', 'carrier_lane')"),
+    )
+
+class DistinctSketchRegister(Base):
+    __tablename__ = "distinct_sketch_registers"
+    
+    # HyperLogLog registers per day and segment (see utils/distinct_sketch.py).
+    # segment_type 'all' uses segment ''.
+    stat_date = Column(Date, primary_key=True)
+    metric = Column(String(20), primary_key=True)
+    segment_type = Column(String(20), primary_key=True)
+    segment = Column(String(50), primary_key=True, default='')
+    register = Column(Integer, primary_key=True)
+    rank = Column(Integer, nullable=False)
+    
+    __table_args__ = (
+        CheckConstraint("metric IN ('carriers', 'lanes')"),
+        CheckConstraint("segment_type IN ('all', 'equipment_type')"),
+    )
+
+class DataVersion(Base):
+    __tablename__ = "data_versions"
+    
+    # Monotonic change counter per data domain ("call_events", "carriers"), advanced by ingest
+    domain = Column(String(50), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
@@ -1,22 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Response, Depends, HTTPException, status, Request, Query
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..schemas import LaneBreakdown, EquipmentBreakdown, CarrierBreakdown, ErrorResponse
+from typing import List, Optional
+from ..database import get_read_db
+from ..schemas import LaneBreakdown, EquipmentBreakdown, CarrierBreakdown, LaneRatePercentiles, ErrorResponse
 from ..auth import require_read_key
-from ..utils.aggregations import get_lane_breakdown, get_equipment_breakdown, get_carrier_breakdown
+from ..executors import run_db
+from ..utils.data_version import check_not_modified, CALL_EVENTS, CARRIERS
+from ..utils.fast_json import FastJSONResponse
+from ..utils.aggregations import get_lane_breakdown, get_equipment_breakdown, get_carrier_breakdown, get_rate_percentiles
 
 router = APIRouter()
 
 @router.get("/breakdowns/by-lane", response_model=List[LaneBreakdown])
 async def get_lane_breakdowns(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get performance breakdown by lane"""
     try:
-        return get_lane_breakdown(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        return await run_db(get_lane_breakdown, db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -26,12 +33,16 @@ async def get_lane_breakdowns(
 @router.get("/breakdowns/by-equipment", response_model=List[EquipmentBreakdown])
 async def get_equipment_breakdowns(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get performance breakdown by equipment type"""
     try:
-        return get_equipment_breakdown(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        return await run_db(get_equipment_breakdown, db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -41,14 +52,40 @@ async def get_equipment_breakdowns(
 @router.get("/breakdowns/by-carrier", response_model=List[CarrierBreakdown])
 async def get_carrier_breakdowns(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get performance breakdown by carrier"""
     try:
-        return get_carrier_breakdown(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS, CARRIERS])
+        if not_modified:
+            return not_modified
+        # Already built as CarrierBreakdown models; serialize without validating again
+        return FastJSONResponse(await run_db(get_carrier_breakdown, db), headers=dict(response.headers))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get carrier breakdown: {str(e)}"
         )
+
+@router.get("/breakdowns/rate-percentiles", response_model=List[LaneRatePercentiles])
+async def get_rate_percentiles(
+    request: Request,
+    response: Response,
+    lane: Optional[str] = Query(None, description="Limit to one lane"),
+    equipment_type: Optional[str] = Query(None, description="Limit to one equipment type"),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(require_read_key)
+):
+    """Get p10/p50/p90 agreed rate per mile by lane and equipment type (approximate, ~1%)"""
+    try:
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        return await run_db(get_rate_percentiles, db, lane, equipment_type)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get rate percentiles: {str(e)}"
+        )
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, Response, Depends, Query, HTTPException, status, Request
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, date
+from typing import Optional, Union
+from ..database import get_read_db, export_snapshot
+from ..schemas import PerformanceDashboard, IntelligenceDashboard
+from ..auth import require_read_key
+from ..executors import run_db
+from ..utils.data_version import check_not_modified
+from ..utils.fast_json import FastJSONResponse
+from ..utils.dashboard import PAGE_DOMAINS, performance_page, intelligence_page
+
+router = APIRouter()
+
+@router.get("/dashboard/{page}", response_model=Union[PerformanceDashboard, IntelligenceDashboard])
+async def get_dashboard(
+    request: Request,
+    response: Response,
+    page: str,
+    start_date: Optional[datetime] = Query(None, description="Trends start date (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Trends end date (ISO format)"),
+    interval: str = Query("day", description="Trends interval: hour, day, or week"),
+    recent_limit: int = Query(10, description="Number of recent calls to return"),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(require_read_key)
+):
+    """Get every panel of a dashboard page (performance or intelligence) from one consistent snapshot"""
+    if page not in PAGE_DOMAINS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown dashboard page: {page}"
+        )
+    if interval not in ["hour", "day", "week"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Interval must be 'hour', 'day', or 'week'"
+        )
+
+    try:
+        # Taken first, so the ETag describes the same data as the panels
+        snapshot_id = await run_db(export_snapshot, db)
+        not_modified = await run_db(check_not_modified, request, response, db, PAGE_DOMAINS[page], salt=date.today().isoformat())
+        if not_modified:
+            return not_modified
+
+        if page == "performance":
+            # Default to last 30 days if no dates provided
+            if not end_date:
+                end_date = datetime.now()
+            if not start_date:
+                start_date = end_date - timedelta(days=30)
+            dashboard = await performance_page(db, snapshot_id, start_date, end_date, interval, recent_limit)
+        else:
+            dashboard = await intelligence_page(db, snapshot_id)
+
+        # Panels are already validated models; serialize without validating again
+        return FastJSONResponse(dashboard, headers=dict(response.headers))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get {page} dashboard: {str(e)}"
+        )
@@ -1,11 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from datetime import date
-from ..database import get_db
+from ..database import get_db, mark_write
 from ..models import CallEvent, Carrier, CarrierEquipment, CarrierLane
 from ..schemas import CallEventRequest, CallEventResponse
 from ..auth import require_ingest_key
+from ..executors import run_db
+from ..utils.carrier_cache import carrier_resolver
+from ..utils.dimensions import lane_dimension, equipment_dimension
+from ..utils.data_version import bump_data_version
+from ..utils.live_metrics import metrics_publisher
+from ..utils.cache_invalidation import invalidation_listener
+from ..utils.carrier_stats import record_carrier_event
+from ..utils.rate_sketch import record_rate
+from ..utils.distinct_sketch import record_distinct
+from ..utils.rollups import lock_carriers, lock_shared_sketches
+from ..utils.cold_archive import cold_archive, merge_sums
 
 router = APIRouter()
 
@@ -13,142 +24,220 @@ router = APIRouter()
 async def ingest_call_event(
     event: CallEventRequest,
     request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     api_key: str = Depends(require_ingest_key)
 ):
     """Ingest a new call event from HappyRobot"""
     
     try:
-        # Find or create carrier
-        carrier = db.query(Carrier).filter(Carrier.carrier_name == event.carrier_name).first()
-        if not carrier:
-            carrier = Carrier(
-                carrier_name=event.carrier_name,
-                status='active'
-            )
-            db.add(carrier)
-            db.flush()  # Get the carrier_id
+        # Every database step runs on the DB threads; carrier resolution and the lock waits block
+        call_event = await run_db(store_call_event, db, event)
+        carrier_id, lane_id, equipment_type_id = call_event.carrier_id, call_event.lane_id, call_event.equipment_type_id
+        # This client's reads go to the primary until replicas have caught up
+        mark_write(response)
         
-        # Create new call event
-        call_event = CallEvent(
-            call_id=event.call_id,
-            carrier_id=carrier.carrier_id,
-            carrier_name=event.carrier_name,
-            lane=event.lane,
-            miles=event.miles,
-            equipment_type=event.equipment_type,
-            commodity_type=event.commodity_type,
-            weight=event.weight,
-            loadboard_rate=event.loadboard_rate,
-            offered_rate_initial=event.offered_rate_initial,
-            carrier_counter_rate=event.carrier_counter_rate,
-            final_rate_agreed=event.final_rate_agreed,
-            kpi_rpm=event.kpi_rpm,
-            kpi_rate_variance_pct=event.kpi_rate_variance_pct,
-            num_negotiation_rounds=event.num_negotiation_rounds,
-            num_loads_shown=event.num_loads_shown,
-            outcome=event.outcome,
-            group_outcome_simple=event.group_outcome_simple,
-            rate_band=event.rate_band,
-            carrier_sentiment=event.carrier_sentiment,
-            group_sentiment_outcome=event.group_sentiment_outcome,
-            call_duration_seconds=event.call_duration_seconds,
-            objection_count=event.objection_count,
-            positive_words_count=event.positive_words_count,
-            negative_words_count=event.negative_words_count,
-            call_date=event.call_date
-        )
+        # Update carrier metrics (may wait on the carrier's rollup lock)
+        await run_db(update_carrier_metrics, db, carrier_id)
         
-        db.add(call_event)
-        db.commit()
-        db.refresh(call_event)
+        # Invalidate conditional (ETag) responses and, in every worker, the cached aggregates this call affects
+        await run_db(bump_data_version, db, touched={
+            "carrier_id": carrier_id,
+            "lane_id": lane_id,
+            "lane": event.lane,
+            "equipment_type_id": equipment_type_id,
+            "equipment_type": event.equipment_type,
+            "call_date": event.call_date,
+        })
         
-        # Update carrier metrics
-        update_carrier_metrics(db, carrier.carrier_id)
+        # Push live updates to dashboard stream subscribers; with the listener connected,
+        # every worker (this one included) is woken by the change notification instead
+        if not invalidation_listener.connected:
+            metrics_publisher.notify_change([event.call_date])
         
+        # Reload what the commits above expired, so serializing the response doesn't query on the event loop
+        await run_db(db.refresh, call_event)
         return call_event
         
     except Exception as e:
-        db.rollback()
+        await run_db(db.rollback)
+        # The carrier row may have been created in the rolled-back transaction
+        carrier_resolver.forget(event.carrier_name, event.mc_number)
+        lane_dimension.forget(event.lane)
+        equipment_dimension.forget(event.equipment_type)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to ingest call event: {str(e)}"
         )
 
+def store_call_event(db: Session, event: CallEventRequest) -> CallEvent:
+    """Insert a call event with its stats and sketch increments, in one transaction"""
+    
+    # Find or create carrier (served from the resolver cache in the common case)
+    carrier_id = carrier_resolver.resolve(db, event.carrier_name, event.mc_number)
+    lane_id = lane_dimension.resolve(db, event.lane)
+    equipment_type_id = equipment_dimension.resolve(db, event.equipment_type)
+    
+    # Create new call event
+    call_event = CallEvent(
+        call_id=event.call_id,
+        carrier_id=carrier_id,
+        carrier_name=event.carrier_name,
+        lane=event.lane,
+        lane_id=lane_id,
+        miles=event.miles,
+        equipment_type=event.equipment_type,
+        equipment_type_id=equipment_type_id,
+        commodity_type=event.commodity_type,
+        weight=event.weight,
+        loadboard_rate=event.loadboard_rate,
+        offered_rate_initial=event.offered_rate_initial,
+        carrier_counter_rate=event.carrier_counter_rate,
+        final_rate_agreed=event.final_rate_agreed,
+        kpi_rpm=event.kpi_rpm,
+        kpi_rate_variance_pct=event.kpi_rate_variance_pct,
+        num_negotiation_rounds=event.num_negotiation_rounds,
+        num_loads_shown=event.num_loads_shown,
+        outcome=event.outcome,
+        group_outcome_simple=event.group_outcome_simple,
+        rate_band=event.rate_band,
+        carrier_sentiment=event.carrier_sentiment,
+        group_sentiment_outcome=event.group_sentiment_outcome,
+        call_duration_seconds=event.call_duration_seconds,
+        objection_count=event.objection_count,
+        positive_words_count=event.positive_words_count,
+        negative_words_count=event.negative_words_count,
+        call_date=event.call_date
+    )
+    
+    db.add(call_event)
+    db.flush()
+    
+    # A concurrent rollup refresh must not overwrite the increments below, so hold the
+    # carrier's rollup lock and the sketches' lock (in the same order refreshes take them)
+    lock_carriers(db, [carrier_id])
+    lock_shared_sketches(db, shared=True)
+    
+    # Rolling-window, decayed stats and rate / distinct-count sketches, committed together with the event
+    record_carrier_event(db, carrier_id, call_event)
+    record_rate(db, carrier_id, call_event)
+    record_distinct(db, carrier_id, call_event)
+    db.commit()
+    db.refresh(call_event)
+    return call_event
+
+# Carrier averages: archive summary name -> call_events column
+AVERAGED_FIELDS = {
+    "rpm": "kpi_rpm",
+    "rounds": "num_negotiation_rounds",
+    "variance": "kpi_rate_variance_pct",
+    "duration": "call_duration_seconds",
+    "objections": "objection_count",
+    "positive_words": "positive_words_count",
+    "negative_words": "negative_words_count",
+}
+
+def _average(sums: dict, name: str) -> float:
+    return sums[f"{name}_sum"] / sums[f"{name}_n"] if sums.get(f"{name}_n") else 0
+
 def update_carrier_metrics(db: Session, carrier_id: int):
-    """Update carrier-level metrics after a new call event"""
+    """Update carrier-level metrics after a new call event
     
-    # Get all call events for this carrier
+    Runs as one transaction under the carrier's rollup lock, so concurrent
+    events for the same carrier are applied in turn (each one reading every
+    event committed before it) while other carriers proceed in parallel.
+    Calls moved to the cold archive count through their archived sums.
+    """
+    
+    lock_carriers(db, [carrier_id])
+    
+    # Get all call events for this carrier, and the sums of its archived ones
     calls = db.query(CallEvent).filter(CallEvent.carrier_id == carrier_id).all()
+    history = cold_archive.carrier_history([carrier_id]).get(carrier_id, {})
     
-    if not calls:
+    if not calls and not history:
+        db.commit()
         return
     
+    # Sums and counts over the calls (averages skip missing / zero values)
+    sums = {
+        "calls": len(calls),
+        "successful": len([c for c in calls if c.group_outcome_simple == "Successful"]),
+        "loads_sum": sum([c.num_loads_shown for c in calls if c.num_loads_shown is not None]),
+        "loads_n": len([c for c in calls if c.num_loads_shown is not None]),
+    }
+    for name, attribute in AVERAGED_FIELDS.items():
+        values = [float(getattr(c, attribute)) for c in calls if getattr(c, attribute)]
+        sums[f"{name}_sum"] = sum(values)
+        sums[f"{name}_n"] = len(values)
+    for sentiment in ("positive", "negative", "neutral", "unknown"):
+        sums[sentiment] = len([c for c in calls if c.carrier_sentiment == sentiment])
+    if calls:
+        sums["last_call"] = max([c.call_date for c in calls]).isoformat()
+    totals = merge_sums({"totals": sums}, {"totals": history.get("totals", {})})["totals"]
+    
     # Calculate metrics
-    total_calls = len(calls)
-    successful_calls = len([c for c in calls if c.group_outcome_simple == "Successful"])
+    total_calls = totals["calls"]
+    successful_calls = totals["successful"]
     success_rate = (successful_calls / total_calls) * 100 if total_calls > 0 else 0
     
     # Calculate averages
-    avg_rpm = sum([float(c.kpi_rpm or 0) for c in calls if c.kpi_rpm]) / len([c for c in calls if c.kpi_rpm]) if any(c.kpi_rpm for c in calls) else 0
-    avg_negotiation_rounds = sum([c.num_negotiation_rounds or 0 for c in calls]) / len([c for c in calls if c.num_negotiation_rounds]) if any(c.num_negotiation_rounds for c in calls) else 0
-    avg_rate_variance = sum([float(c.kpi_rate_variance_pct or 0) for c in calls if c.kpi_rate_variance_pct]) / len([c for c in calls if c.kpi_rate_variance_pct]) if any(c.kpi_rate_variance_pct for c in calls) else 0
-    avg_call_duration = sum([c.call_duration_seconds or 0 for c in calls]) / len([c for c in calls if c.call_duration_seconds]) if any(c.call_duration_seconds for c in calls) else 0
-    avg_objections = sum([c.objection_count or 0 for c in calls]) / len([c for c in calls if c.objection_count]) if any(c.objection_count for c in calls) else 0
-    avg_positive_words = sum([c.positive_words_count or 0 for c in calls]) / len([c for c in calls if c.positive_words_count]) if any(c.positive_words_count for c in calls) else 0
-    avg_negative_words = sum([c.negative_words_count or 0 for c in calls]) / len([c for c in calls if c.negative_words_count]) if any(c.negative_words_count for c in calls) else 0
-    avg_loads_per_call = sum([c.num_loads_shown for c in calls]) / len(calls)
-    total_loads_shown = sum([c.num_loads_shown for c in calls])
-    
-    # Sentiment distribution
-    positive_calls = len([c for c in calls if c.carrier_sentiment == "positive"])
-    negative_calls = len([c for c in calls if c.carrier_sentiment == "negative"])
-    neutral_calls = len([c for c in calls if c.carrier_sentiment == "neutral"])
-    unknown_calls = len([c for c in calls if c.carrier_sentiment == "unknown"])
+    avg_rpm = _average(totals, "rpm")
+    avg_negotiation_rounds = _average(totals, "rounds")
+    avg_rate_variance = _average(totals, "variance")
+    avg_call_duration = _average(totals, "duration")
+    avg_objections = _average(totals, "objections")
+    avg_positive_words = _average(totals, "positive_words")
+    avg_negative_words = _average(totals, "negative_words")
+    avg_loads_per_call = _average(totals, "loads")
+    total_loads_shown = totals["loads_sum"]
     
     # Last call date
-    last_call_date = max([c.call_date for c in calls]) if calls else None
-    
-    # Update carrier
-    carrier = db.query(Carrier).filter(Carrier.carrier_id == carrier_id).first()
-    if carrier:
-        carrier.total_calls = total_calls
-        carrier.successful_calls = successful_calls
-        carrier.success_rate = success_rate
-        carrier.avg_rpm = avg_rpm
-        carrier.avg_negotiation_rounds = avg_negotiation_rounds
-        carrier.avg_rate_variance_pct = avg_rate_variance
-        carrier.avg_call_duration_seconds = int(avg_call_duration)
-        carrier.avg_objections = int(avg_objections)
-        carrier.avg_positive_words = int(avg_positive_words)
-        carrier.avg_negative_words = int(avg_negative_words)
-        carrier.total_loads_shown = total_loads_shown
-        carrier.avg_loads_per_call = avg_loads_per_call
-        carrier.positive_sentiment_calls = positive_calls
-        carrier.negative_sentiment_calls = negative_calls
-        carrier.neutral_sentiment_calls = neutral_calls
-        carrier.unknown_sentiment_calls = unknown_calls
-        carrier.last_call_date = last_call_date
-        
-        db.commit()
-        
+    last_call_date = date.fromisoformat(totals["last_call"])
+    
+    # Update carrier in place (no need to load the row first)
+    updated = db.query(Carrier).filter(Carrier.carrier_id == carrier_id).update({
+        Carrier.total_calls: total_calls,
+        Carrier.successful_calls: successful_calls,
+        Carrier.success_rate: success_rate,
+        Carrier.avg_rpm: avg_rpm,
+        Carrier.avg_negotiation_rounds: avg_negotiation_rounds,
+        Carrier.avg_rate_variance_pct: avg_rate_variance,
+        Carrier.avg_call_duration_seconds: int(avg_call_duration),
+        Carrier.avg_objections: int(avg_objections),
+        Carrier.avg_positive_words: int(avg_positive_words),
+        Carrier.avg_negative_words: int(avg_negative_words),
+        Carrier.total_loads_shown: total_loads_shown,
+        Carrier.avg_loads_per_call: avg_loads_per_call,
+        Carrier.positive_sentiment_calls: totals["positive"],
+        Carrier.negative_sentiment_calls: totals["negative"],
+        Carrier.neutral_sentiment_calls: totals["neutral"],
+        Carrier.unknown_sentiment_calls: totals["unknown"],
+        Carrier.last_call_date: last_call_date
+    }, synchronize_session=False)
+    
+    if updated:
         # Update equipment tracking
-        update_equipment_tracking(db, carrier_id, calls)
+        update_equipment_tracking(db, carrier_id, calls, history.get("equipment", {}))
         
         # Update lane tracking
-        update_lane_tracking(db, carrier_id, calls)
+        update_lane_tracking(db, carrier_id, calls, history.get("lanes", {}))
+    
+    # Releases the rollup lock
+    db.commit()
 
-def update_equipment_tracking(db: Session, carrier_id: int, calls: list):
-    """Update carrier equipment tracking"""
+def update_equipment_tracking(db: Session, carrier_id: int, calls: list, history: dict = None):
+    """Update carrier equipment tracking (history: archived sums per equipment type)"""
     
     equipment_counts = {}
     for call in calls:
         eq_type = call.equipment_type
         if eq_type not in equipment_counts:
-            equipment_counts[eq_type] = {"total": 0, "successful": 0}
-        equipment_counts[eq_type]["total"] += 1
+            equipment_counts[eq_type] = {"calls": 0, "successful": 0}
+        equipment_counts[eq_type]["calls"] += 1
         if call.group_outcome_simple == "Successful":
             equipment_counts[eq_type]["successful"] += 1
+    equipment_counts = merge_sums(equipment_counts, history or {})
     
     # Update or create equipment records
     for eq_type, counts in equipment_counts.items():
@@ -158,45 +247,50 @@ def update_equipment_tracking(db: Session, carrier_id: int, calls: list):
         ).first()
         
         if existing:
-            existing.call_count = counts["total"]
+            existing.call_count = counts["calls"]
             existing.success_count = counts["successful"]
-            existing.success_rate = (counts["successful"] / counts["total"]) * 100 if counts["total"] > 0 else 0
+            existing.success_rate = (counts["successful"] / counts["calls"]) * 100 if counts["calls"] > 0 else 0
         else:
             new_equipment = CarrierEquipment(
                 carrier_id=carrier_id,
                 equipment_type=eq_type,
-                call_count=counts["total"],
+                call_count=counts["calls"],
                 success_count=counts["successful"],
-                success_rate=(counts["successful"] / counts["total"]) * 100 if counts["total"] > 0 else 0
+                success_rate=(counts["successful"] / counts["calls"]) * 100 if counts["calls"] > 0 else 0
             )
             db.add(new_equipment)
     
-    db.commit()
+    db.flush()
 
-def update_lane_tracking(db: Session, carrier_id: int, calls: list):
-    """Update carrier lane tracking"""
+def update_lane_tracking(db: Session, carrier_id: int, calls: list, history: dict = None):
+    """Update carrier lane tracking (history: archived sums per lane)"""
     
     lane_counts = {}
+    lane_details = {}
     for call in calls:
         lane = call.lane
         if lane not in lane_counts:
             lane_counts[lane] = {
-                "total": 0, 
-                "successful": 0, 
-                "miles": call.miles,
-                "rates": [],
-                "loadboard_rates": [],
-                "last_call": call.call_date
+                "calls": 0,
+                "successful": 0,
+                "final_sum": 0.0,
+                "final_n": 0,
+                "loadboard_sum": 0.0,
+                "loadboard_n": 0,
+                "last_call": call.call_date.isoformat()
             }
-        lane_counts[lane]["total"] += 1
+            lane_details[lane] = (call.lane_id, call.miles)
+        lane_counts[lane]["calls"] += 1
         if call.group_outcome_simple == "Successful":
             lane_counts[lane]["successful"] += 1
         if call.final_rate_agreed:
-            lane_counts[lane]["rates"].append(float(call.final_rate_agreed))
+            lane_counts[lane]["final_sum"] += float(call.final_rate_agreed)
+            lane_counts[lane]["final_n"] += 1
         if call.loadboard_rate:
-            lane_counts[lane]["loadboard_rates"].append(float(call.loadboard_rate))
-        if call.call_date > lane_counts[lane]["last_call"]:
-            lane_counts[lane]["last_call"] = call.call_date
+            lane_counts[lane]["loadboard_sum"] += float(call.loadboard_rate)
+            lane_counts[lane]["loadboard_n"] += 1
+        lane_counts[lane]["last_call"] = max(lane_counts[lane]["last_call"], call.call_date.isoformat())
+    lane_counts = merge_sums(lane_counts, history or {})
     
     # Update or create lane records
     for lane, counts in lane_counts.items():
@@ -205,32 +299,38 @@ def update_lane_tracking(db: Session, carrier_id: int, calls: list):
             CarrierLane.lane == lane
         ).first()
         
-        success_rate = (counts["successful"] / counts["total"]) * 100 if counts["total"] > 0 else 0
-        avg_rpm = sum(counts["rates"]) / len(counts["rates"]) if counts["rates"] else 0
-        avg_loadboard_rate = sum(counts["loadboard_rates"]) / len(counts["loadboard_rates"]) if counts["loadboard_rates"] else 0
-        avg_final_rate = avg_rpm * counts["miles"] if counts["miles"] else 0
+        lane_id, miles = lane_details.get(lane, (None, None))
+        if miles is None and existing:
+            miles = existing.miles
+        success_rate = (counts["successful"] / counts["calls"]) * 100 if counts["calls"] > 0 else 0
+        avg_rpm = _average(counts, "final")
+        avg_loadboard_rate = _average(counts, "loadboard")
+        avg_final_rate = avg_rpm * miles if miles else 0
+        last_call = date.fromisoformat(counts["last_call"])
         
         if existing:
-            existing.total_calls = counts["total"]
+            existing.total_calls = counts["calls"]
             existing.successful_calls = counts["successful"]
             existing.success_rate = success_rate
             existing.avg_rpm = avg_rpm
             existing.avg_loadboard_rate = avg_loadboard_rate
             existing.avg_final_rate = avg_final_rate
-            existing.last_call_date = counts["last_call"]
+            existing.last_call_date = last_call
+            existing.lane_id = existing.lane_id or lane_id
         else:
             new_lane = CarrierLane(
                 carrier_id=carrier_id,
                 lane=lane,
-                miles=counts["miles"],
-                total_calls=counts["total"],
+                lane_id=lane_id,
+                miles=miles,
+                total_calls=counts["calls"],
                 successful_calls=counts["successful"],
                 success_rate=success_rate,
                 avg_rpm=avg_rpm,
                 avg_loadboard_rate=avg_loadboard_rate,
                 avg_final_rate=avg_final_rate,
-                last_call_date=counts["last_call"]
+                last_call_date=last_call
             )
             db.add(new_lane)
     
-    db.commit()
\ No newline at end of file
+    db.flush()
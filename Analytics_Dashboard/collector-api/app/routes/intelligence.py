@@ -1,24 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Response, Depends, Query, HTTPException, status, Request
 from sqlalchemy.orm import Session
-from typing import List
-from ..database import get_db
-from ..schemas import MatchingResponse, MatchingRequest, CarrierResponse, CarrierEquipmentResponse, CarrierLaneResponse, ErrorResponse
+from typing import List, Optional
+from ..database import get_read_db
+from ..schemas import MatchingResponse, MatchingRequest, CarrierResponse, CarrierEquipmentResponse, CarrierLaneResponse, CarrierStatsResponse, ErrorResponse
 from ..auth import require_read_key
-from ..utils.aggregations import get_smart_matching
-from ..models import Carrier, CarrierEquipment, CarrierLane
+from ..utils.data_version import check_not_modified, CARRIERS
+from ..utils.fast_json import FastJSONResponse, schema_columns, rows_to_dicts
+from ..executors import run_db, run_cpu
+from ..utils.aggregations import load_matching_inputs, score_matching
+from ..utils.carrier_stats import WINDOWS, window_stats_subquery, window_stats, decayed_stats
+from ..models import Carrier, CarrierEquipment, CarrierLane, CarrierDecayedStats
 
 router = APIRouter()
 
+# Sortable carrier columns (success_rate and avg_rpm are indexed)
+CARRIER_SORT_COLUMNS = {
+    "success_rate": Carrier.success_rate,
+    "avg_rpm": Carrier.avg_rpm,
+    "total_calls": Carrier.total_calls,
+    "last_call_date": Carrier.last_call_date,
+    "carrier_id": Carrier.carrier_id,
+}
+
 @router.post("/matching/find-carriers", response_model=MatchingResponse)
 async def find_carriers(
     request_data: MatchingRequest,
     request: Request,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get smart carrier matching for a load"""
     try:
-        return get_smart_matching(db, request_data)
+        # Queries on the DB threads, scoring in the process pool, never on the event loop
+        inputs = await run_db(load_matching_inputs, db, request_data)
+        return await run_cpu(score_matching, **inputs)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -28,13 +43,77 @@ async def find_carriers(
 @router.get("/carriers", response_model=List[CarrierResponse])
 async def get_carriers(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return (default: all)"),
+    status_filter: Optional[str] = Query(None, alias="status", description="Filter by status: active, inactive, or watch_list"),
+    preferred: Optional[bool] = Query(None, description="Filter by preferred flag"),
+    min_calls: Optional[int] = Query(None, ge=0, description="Minimum total calls"),
+    sort: str = Query("carrier_id", description="Sort column, prefix with '-' for descending: success_rate, avg_rpm, total_calls, last_call_date, carrier_id"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (default: all carriers)"),
+    offset: int = Query(0, ge=0, description="Rows to skip"),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
-    """Get all carriers"""
+    """Get carriers, optionally filtered, sorted, paginated and projected to selected fields"""
     try:
-        carriers = db.query(Carrier).all()
-        return carriers
+        # Validate field selection
+        if fields:
+            selected = [f.strip() for f in fields.split(",") if f.strip()]
+            unknown = [f for f in selected if f not in CarrierResponse.model_fields]
+            if unknown:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Unknown fields: {', '.join(unknown)}"
+                )
+            if "carrier_id" not in selected:
+                selected.insert(0, "carrier_id")
+        else:
+            selected = list(CarrierResponse.model_fields)
+        
+        # Validate sort
+        sort_name = sort.lstrip("-")
+        if sort_name not in CARRIER_SORT_COLUMNS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Sort must be one of: {', '.join(CARRIER_SORT_COLUMNS)}"
+            )
+        
+        if status_filter and status_filter not in ("active", "inactive", "watch_list"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Status must be 'active', 'inactive', or 'watch_list'"
+            )
+        
+        not_modified = await run_db(check_not_modified, request, response, db, [CARRIERS])
+        if not_modified:
+            return not_modified
+        
+        # Only the selected columns are read from the table
+        query = db.query(*schema_columns(CarrierResponse, Carrier, selected))
+        if status_filter:
+            query = query.filter(Carrier.status == status_filter)
+        if preferred is not None:
+            query = query.filter(Carrier.preferred == preferred)
+        if min_calls is not None:
+            query = query.filter(Carrier.total_calls >= min_calls)
+        
+        # Nulls sort lowest both ways, so one idx_carriers_*_sort index serves either direction
+        sort_column = CARRIER_SORT_COLUMNS[sort_name]
+        if sort.startswith("-"):
+            query = query.order_by(sort_column.desc().nullslast(), Carrier.carrier_id.desc())
+        else:
+            query = query.order_by(sort_column.asc().nullsfirst(), Carrier.carrier_id.asc())
+        
+        if offset:
+            query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        
+        # Trusted rows: skip re-validation
+        carriers = await run_db(query.all)
+        return FastJSONResponse(rows_to_dicts(carriers, CarrierResponse, selected), headers=dict(response.headers))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -45,12 +124,16 @@ async def get_carriers(
 async def get_carrier(
     carrier_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get carrier by ID"""
     try:
-        carrier = db.query(Carrier).filter(Carrier.carrier_id == carrier_id).first()
+        not_modified = await run_db(check_not_modified, request, response, db, [CARRIERS])
+        if not_modified:
+            return not_modified
+        carrier = await run_db(db.query(Carrier).filter(Carrier.carrier_id == carrier_id).first)
         if not carrier:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -65,16 +148,63 @@ async def get_carrier(
             detail=f"Failed to get carrier: {str(e)}"
         )
 
+@router.get("/carriers/{carrier_id}/stats", response_model=CarrierStatsResponse)
+async def get_carrier_stats(
+    carrier_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(require_read_key)
+):
+    """Get rolling 7/30/90-day and exponentially-decayed stats for a carrier"""
+    try:
+        not_modified = await run_db(check_not_modified, request, response, db, [CARRIERS])
+        if not_modified:
+            return not_modified
+        windows = window_stats_subquery(db, [carrier_id])
+        row = await run_db(db.query(
+            Carrier.carrier_id,
+            CarrierDecayedStats,
+            *[column for column in windows.c if column.name != 'carrier_id']
+        ).outerjoin(
+            CarrierDecayedStats, CarrierDecayedStats.carrier_id == Carrier.carrier_id
+        ).outerjoin(
+            windows, windows.c.carrier_id == Carrier.carrier_id
+        ).filter(
+            Carrier.carrier_id == carrier_id
+        ).first)
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Carrier not found"
+            )
+        return CarrierStatsResponse(
+            carrier_id=row.carrier_id,
+            windows=[window_stats(row, days) for days in WINDOWS],
+            decayed=decayed_stats(row.CarrierDecayedStats)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get carrier stats: {str(e)}"
+        )
+
 @router.get("/carriers/{carrier_id}/equipment", response_model=List[CarrierEquipmentResponse])
 async def get_carrier_equipment(
     carrier_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get carrier equipment"""
     try:
-        equipment = db.query(CarrierEquipment).filter(CarrierEquipment.carrier_id == carrier_id).all()
+        not_modified = await run_db(check_not_modified, request, response, db, [CARRIERS])
+        if not_modified:
+            return not_modified
+        equipment = await run_db(db.query(CarrierEquipment).filter(CarrierEquipment.carrier_id == carrier_id).all)
         return equipment
     except Exception as e:
         raise HTTPException(
@@ -86,12 +216,16 @@ async def get_carrier_equipment(
 async def get_carrier_lanes(
     carrier_id: int,
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get carrier lanes"""
     try:
-        lanes = db.query(CarrierLane).filter(CarrierLane.carrier_id == carrier_id).all()
+        not_modified = await run_db(check_not_modified, request, response, db, [CARRIERS])
+        if not_modified:
+            return not_modified
+        lanes = await run_db(db.query(CarrierLane).filter(CarrierLane.carrier_id == carrier_id).all)
         return lanes
     except Exception as e:
         raise HTTPException(
@@ -1,59 +1,161 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status, Request
+from fastapi import APIRouter, Response, Depends, Query, Header, HTTPException, status, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 from typing import Optional, List
-from ..database import get_db
-from ..schemas import OverviewMetrics, TrendsResponse, ErrorResponse, CallEventResponse, RateVarianceDistribution, ConversionFunnel
-from ..auth import require_read_key
-from ..utils.aggregations import get_overview_metrics, get_trends_data, get_rate_variance_distribution, get_conversion_funnel
-from ..models import CallEvent
+from ..database import get_read_db
+from ..schemas import OverviewMetrics, StreamToken, TrendsResponse, TrendSeriesResponse, DistinctCountsResponse, ErrorResponse, CallEventResponse, RateVarianceDistribution, ConversionFunnel
+from ..auth import require_read_key, require_read_key_for_stream, issue_stream_token
+from ..executors import run_db
+from ..utils.live_metrics import metrics_publisher
+from ..utils.fast_json import FastJSONResponse
+from ..utils.data_version import check_not_modified, CALL_EVENTS, CARRIERS
+from ..utils.distinct_sketch import distinct_counts, INTERVALS, SEGMENT_TYPES
+from ..utils.aggregations import get_overview_metrics, get_trends_data, get_rate_variance_distribution, get_conversion_funnel, get_recent_calls, get_trend_series
+from ..utils.trend_series import SERIES_GROUPS, TREND_SERIES_MAX, TREND_SERIES_MAX_PERIODS, period_count
+from ..utils.cold_archive import cold_archive
+from ..utils.olap_mirror import olap_mirror
 
 router = APIRouter()
 
 @router.get("/metrics/overview", response_model=OverviewMetrics)
 async def get_overview(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get overview metrics for all calls"""
     try:
-        return get_overview_metrics(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        return await run_db(get_overview_metrics, db)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get overview metrics: {str(e)}"
         )
 
+@router.post("/metrics/stream-token", response_model=StreamToken)
+async def create_stream_token(api_key: str = Depends(require_read_key)):
+    """Short-lived token for opening /metrics/stream?token=... from a browser EventSource"""
+    return issue_stream_token()
+
+@router.get("/metrics/stream")
+async def stream_metrics(
+    request: Request,
+    last_event_id: Optional[str] = Header(None),
+    api_key: str = Depends(require_read_key_for_stream)
+):
+    """Server-sent events with overview and daily trend updates as calls are ingested"""
+    return StreamingResponse(
+        metrics_publisher.stream(request, last_event_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
+
 @router.get("/metrics/trends", response_model=TrendsResponse)
 async def get_trends(
     request: Request,
+    response: Response,
     start_date: Optional[datetime] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[datetime] = Query(None, description="End date (ISO format)"),
     interval: str = Query("day", description="Time interval: hour, day, or week"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get time-series trend data"""
     try:
+        # Validated before the ETag lookup, so bad requests never reach the database
+        if interval not in ["hour", "day", "week"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Interval must be 'hour', 'day', or 'week'"
+            )
         # Default to last 30 days if no dates provided
         if not end_date:
             end_date = datetime.now()
         if not start_date:
             start_date = end_date - timedelta(days=30)
         
-        # Validate interval
+        # The default window moves with the calendar, so today's date is part of the version
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS], salt=date.today().isoformat())
+        if not_modified:
+            return not_modified
+        
+        data = await run_db(get_trends_data, db, start_date, end_date, interval)
+        
+        return TrendsResponse(
+            data=data,
+            interval=interval
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get trends data: {str(e)}"
+        )
+
+@router.get("/metrics/trends/series", response_model=TrendSeriesResponse)
+async def get_trends_series(
+    request: Request,
+    response: Response,
+    group_by: str = Query(..., description="Split by: lane, equipment, or carrier"),
+    top: int = Query(5, ge=1, description=f"Number of series (busiest first, at most {TREND_SERIES_MAX})"),
+    start_date: Optional[datetime] = Query(None, description="Start date (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="End date (ISO format)"),
+    interval: str = Query("day", description="Time interval: hour, day, or week"),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(require_read_key)
+):
+    """Get one gap-filled trend series per top lane, equipment type or carrier"""
+    try:
+        # Validated before the ETag lookup, so bad requests never reach the database
         if interval not in ["hour", "day", "week"]:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Interval must be 'hour', 'day', or 'week'"
             )
+        if group_by not in SERIES_GROUPS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"group_by must be one of: {', '.join(SERIES_GROUPS)}"
+            )
+        if top > TREND_SERIES_MAX:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"top must be at most {TREND_SERIES_MAX}"
+            )
+        if not end_date:
+            end_date = datetime.now()
+        if not start_date:
+            start_date = end_date - timedelta(days=30)
+        if period_count(start_date.date(), end_date.date(), interval) > TREND_SERIES_MAX_PERIODS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"The window may span at most {TREND_SERIES_MAX_PERIODS} {interval if interval == 'week' else 'day'}s"
+            )
+        # Archive summaries aren't kept per lane / carrier and day; only the mirror reads archived rows
+        if cold_archive.enabled and cold_archive.covers(start_date.date(), end_date.date()) and not olap_mirror.serving():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Trend series can't reach archived months unless the OLAP mirror is serving"
+            )
         
-        data = get_trends_data(db, start_date, end_date, interval)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS, CARRIERS], salt=date.today().isoformat())
+        if not_modified:
+            return not_modified
         
-        return TrendsResponse(
-            data=data,
-            interval=interval
+        return TrendSeriesResponse(
+            series=await run_db(get_trend_series, db, start_date, end_date, interval, group_by, top),
+            interval=interval,
+            group_by=group_by
         )
         
     except HTTPException:
@@ -61,23 +163,71 @@ async def get_trends(
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to get trends data: {str(e)}"
+            detail=f"Failed to get trend series: {str(e)}"
+        )
+
+@router.get("/metrics/distinct-counts", response_model=DistinctCountsResponse)
+async def get_distinct_counts(
+    request: Request,
+    response: Response,
+    start_date: Optional[date] = Query(None, description="Start date (ISO format)"),
+    end_date: Optional[date] = Query(None, description="End date (ISO format), inclusive"),
+    interval: str = Query("day", description="Time interval: day, week, month, or total"),
+    segment_type: str = Query("all", description="Segment by: all or equipment_type"),
+    db: Session = Depends(get_read_db),
+    api_key: str = Depends(require_read_key)
+):
+    """Get approximate unique carriers engaged and lanes worked (HyperLogLog, ~2% error)"""
+    try:
+        # Validated before the ETag lookup, so bad requests never reach the database
+        if interval not in INTERVALS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Interval must be one of: {', '.join(INTERVALS)}"
+            )
+        if segment_type not in SEGMENT_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"segment_type must be one of: {', '.join(SEGMENT_TYPES)}"
+            )
+        if not end_date:
+            end_date = date.today()
+        if not start_date:
+            start_date = end_date - timedelta(days=30)
+        
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS], salt=date.today().isoformat())
+        if not_modified:
+            return not_modified
+        
+        return DistinctCountsResponse(
+            data=await run_db(distinct_counts, db, start_date, end_date, interval, segment_type),
+            interval=interval,
+            segment_type=segment_type
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to get distinct counts: {str(e)}"
         )
 
 @router.get("/metrics/recent-calls", response_model=List[CallEventResponse])
-async def get_recent_calls(
+async def get_recent_call_events(
     request: Request,
+    response: Response,
     limit: int = Query(10, description="Number of recent calls to return"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get most recent call events"""
     try:
-        calls = db.query(CallEvent).order_by(
-            CallEvent.created_at.desc()
-        ).limit(limit).all()
-        
-        return calls
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        calls = await run_db(get_recent_calls, db, limit)
+        return FastJSONResponse(calls, headers=dict(response.headers))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -87,12 +237,16 @@ async def get_recent_calls(
 @router.get("/metrics/rate-variance-distribution", response_model=RateVarianceDistribution)
 async def get_rate_variance_dist(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get rate variance distribution"""
     try:
-        buckets = get_rate_variance_distribution(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        buckets = await run_db(get_rate_variance_distribution, db)
         return RateVarianceDistribution(buckets=buckets)
     except Exception as e:
         raise HTTPException(
@@ -103,12 +257,16 @@ async def get_rate_variance_dist(
 @router.get("/metrics/conversion-funnel", response_model=ConversionFunnel)
 async def get_funnel(
     request: Request,
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     api_key: str = Depends(require_read_key)
 ):
     """Get conversion funnel data"""
     try:
-        stages = get_conversion_funnel(db)
+        not_modified = await run_db(check_not_modified, request, response, db, [CALL_EVENTS])
+        if not_modified:
+            return not_modified
+        stages = await run_db(get_conversion_funnel, db)
         return ConversionFunnel(stages=stages)
     except Exception as e:
         raise HTTPException(
@@ -7,6 +7,7 @@ from decimal import Decimal
 class CallEventRequest(BaseModel):
     call_id: str
     carrier_name: str
+    mc_number: Optional[str] = None
     lane: str
     miles: int
     equipment_type: str
@@ -140,10 +141,36 @@ class TrendDataPoint(BaseModel):
     avg_rpm: float
     total_calls: int
 
+class StreamToken(BaseModel):
+    token: str
+    expires_at: int  # Unix time; the token only has to be valid when the stream is opened
+
 class TrendsResponse(BaseModel):
     data: List[TrendDataPoint]
     interval: str
 
+class TrendSeries(BaseModel):
+    key: int  # lane_id, equipment_type_id or carrier_id
+    label: str
+    total_calls: int
+    data: List[TrendDataPoint]  # every period of the window, zeros where there were no calls
+
+class TrendSeriesResponse(BaseModel):
+    series: List[TrendSeries]
+    interval: str
+    group_by: str
+
+class DistinctCountPoint(BaseModel):
+    period: Optional[str]  # Start of the period; None for interval=total
+    segment: Optional[str]  # Equipment type; None for segment_type=all
+    unique_carriers: int
+    unique_lanes: int
+
+class DistinctCountsResponse(BaseModel):
+    data: List[DistinctCountPoint]
+    interval: str
+    segment_type: str
+
 class RateVarianceBucket(BaseModel):
     bucket: str
     count: int
@@ -185,6 +212,42 @@ class CarrierBreakdown(BaseModel):
     preferred_lanes: List[str]
     last_call_date: Optional[date]
 
+class PerformanceDashboard(BaseModel):
+    page: str = "performance"  # all panels read from one database snapshot
+    overview: OverviewMetrics
+    trends: TrendsResponse
+    lane_breakdown: List[LaneBreakdown]
+    equipment_breakdown: List[EquipmentBreakdown]
+    recent_calls: List[CallEventResponse]
+    rate_variance: RateVarianceDistribution
+    conversion_funnel: ConversionFunnel
+
+class IntelligenceDashboard(BaseModel):
+    page: str = "intelligence"
+    carrier_breakdown: List[CarrierBreakdown]
+    lane_breakdown: List[LaneBreakdown]
+    equipment_breakdown: List[EquipmentBreakdown]
+
+class WindowStats(BaseModel):
+    days: int
+    total_calls: int
+    success_rate: Optional[float] = None
+    avg_rpm: Optional[float] = None
+    avg_negotiation_rounds: Optional[float] = None
+
+class DecayedStats(BaseModel):
+    half_life_days: float
+    effective_calls: float  # decayed call volume as of today
+    success_rate: Optional[float] = None
+    avg_rpm: Optional[float] = None
+    avg_negotiation_rounds: Optional[float] = None
+    as_of: Optional[date] = None
+
+class CarrierStatsResponse(BaseModel):
+    carrier_id: int
+    windows: List[WindowStats]  # rolling 7/30/90-day windows
+    decayed: DecayedStats
+
 class MatchingRequest(BaseModel):
     lane: str
     equipment_type: str
@@ -193,12 +256,22 @@ class MatchingRequest(BaseModel):
     weight: Optional[int] = None
     target_rate: Optional[float] = None
 
+class LaneRatePercentiles(BaseModel):
+    lane: Optional[str]
+    equipment_type: Optional[str]
+    count: int
+    p10: float
+    p50: float
+    p90: float
+
 class Recommendation(BaseModel):
     carrier_id: int
     carrier_name: str
     match_score: float
     expected_rate_min: float
     expected_rate_max: float
+    expected_rate_median: Optional[float] = None
+    rate_basis: Optional[str] = None  # "carrier_lane", "lane_equipment" or "default"
     confidence: str  # "High", "Medium", "Low"
     reasons: List[str]
 
@@ -1,10 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, and_, or_, case
+from sqlalchemy import func, desc, and_, or_, case, select
 from datetime import datetime, timedelta, date
 from typing import List, Dict, Any
-from ..models import CallEvent, Carrier, CarrierEquipment, CarrierLane
-from ..schemas import OverviewMetrics, TrendDataPoint, LaneBreakdown, EquipmentBreakdown, CarrierBreakdown, Recommendation, MatchingRequest, MatchingResponse
+from ..models import CallEvent, Carrier, CarrierEquipment, CarrierLane, CarrierDecayedStats
+from ..schemas import OverviewMetrics, TrendDataPoint, LaneBreakdown, EquipmentBreakdown, CarrierBreakdown, Recommendation, MatchingRequest, MatchingResponse, CallEventResponse, TrendSeries, LaneRatePercentiles
+from .carrier_stats import window_stats_subquery, window_stats, decayed_stats
+from .result_cache import cached
+from .single_flight import coalesced
+from .data_version import CALL_EVENTS, CARRIERS
+from .rate_sketch import lane_rate_quantiles, carrier_lane_rate_quantiles, MIN_CARRIER_SAMPLES
+from .dimensions import lane_dimension, equipment_dimension
+from .olap_mirror import olap_routed
+from . import olap_aggregations
+from . import cold_archive
+from .cold_archive import with_cold_history
+from .fast_json import schema_columns, rows_to_dicts
+from .trend_series import build_series
 
+@coalesced("overview", [CALL_EVENTS, CARRIERS])
+@olap_routed(olap_aggregations.get_overview_metrics)
+@with_cold_history(cold_archive.union_overview_metrics)
 def get_overview_metrics(db: Session) -> OverviewMetrics:
     """Calculate overview metrics for all calls"""
     
@@ -68,9 +83,19 @@ def get_overview_metrics(db: Session) -> OverviewMetrics:
         sentiment_distribution=sentiment_dist
     )
 
+def _touches_window(touched: dict, start_date: date, end_date: date, *args, **kwargs) -> bool:
+    """Whether an ingested call (see bump_data_version) falls inside a cached date window"""
+    return start_date <= date.fromisoformat(touched["call_date"][:10]) <= end_date
+
 def get_trends_data(db: Session, start_date: datetime, end_date: datetime, interval: str = "day") -> List[TrendDataPoint]:
     """Get time-series trend data"""
-    
+    # call_date is a date, so only the calendar days of the range matter (and key the cache)
+    return _get_trends_data(db, start_date.date(), end_date.date(), interval)
+
+@cached("trends", List[TrendDataPoint], [CALL_EVENTS], affected_by=_touches_window)
+@olap_routed(olap_aggregations.get_trends_data)
+@with_cold_history(cold_archive.union_trends_data)
+def _get_trends_data(db: Session, start_date: date, end_date: date, interval: str) -> List[TrendDataPoint]:
     # Determine the date truncation based on interval
     if interval == "hour":
         date_trunc = func.date_trunc('hour', CallEvent.call_date)
@@ -101,8 +126,8 @@ def get_trends_data(db: Session, start_date: datetime, end_date: datetime, inter
         func.avg(CallEvent.kpi_rpm).label('avg_rpm')
     ).filter(
         and_(
-            CallEvent.call_date >= start_date.date(),
-            CallEvent.call_date <= end_date.date()
+            CallEvent.call_date >= start_date,
+            CallEvent.call_date <= end_date
         )
     ).group_by(
         date_trunc
@@ -121,11 +146,94 @@ def get_trends_data(db: Session, start_date: datetime, end_date: datetime, inter
         for trend in trends
     ]
 
+# Series key column per trends group_by
+SERIES_KEYS = {
+    "lane": CallEvent.lane_id,
+    "equipment": CallEvent.equipment_type_id,
+    "carrier": CallEvent.carrier_id,
+}
+
+def _series_labels(db: Session, group_by: str, keys) -> Dict[int, str]:
+    if group_by == "lane":
+        return lane_dimension.names(db, keys)
+    if group_by == "equipment":
+        return equipment_dimension.names(db, keys)
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    return dict(db.query(Carrier.carrier_id, Carrier.carrier_name).filter(Carrier.carrier_id.in_(keys)).all())
+
+def get_trend_series(db: Session, start_date: datetime, end_date: datetime, interval: str, group_by: str, top: int) -> List[TrendSeries]:
+    """Get one gap-filled trend series for each of the top lanes, equipment types or carriers"""
+    return _get_trend_series(db, start_date.date(), end_date.date(), interval, group_by, top)
+
+def _archived_trend_series(db: Session, *args, **kwargs):
+    # The route rejects these windows up front; this covers a mirror that fell behind meanwhile
+    raise RuntimeError("Trend series can't reach archived months unless the OLAP mirror is serving")
+
+@cached("trend_series", List[TrendSeries], [CALL_EVENTS, CARRIERS], affected_by=_touches_window)
+@olap_routed(olap_aggregations.get_trend_series)
+@with_cold_history(_archived_trend_series)
+def _get_trend_series(db: Session, start_date: date, end_date: date, interval: str, group_by: str, top: int) -> List[TrendSeries]:
+    key = SERIES_KEYS[group_by]
+    date_trunc = func.date_trunc(interval, CallEvent.call_date)
+    in_window = and_(
+        CallEvent.call_date >= start_date,
+        CallEvent.call_date <= end_date
+    )
+    
+    # Top keys by calls in the window, joined in so every series comes from one grouped query
+    top_keys = db.query(
+        key.label('key')
+    ).filter(
+        in_window,
+        key.isnot(None)
+    ).group_by(
+        key
+    ).order_by(
+        func.count(CallEvent.id).desc(),
+        key
+    ).limit(top).subquery()
+    
+    rows = db.query(
+        key.label('key'),
+        date_trunc.label('date'),
+        func.count(CallEvent.id).label('total_calls'),
+        func.avg(
+            case(
+                (CallEvent.group_outcome_simple == "Successful", 1),
+                else_=0
+            )
+        ).label('success_rate'),
+        func.avg(
+            case(
+                (CallEvent.carrier_sentiment == "positive", 1),
+                (CallEvent.carrier_sentiment == "negative", -1),
+                else_=0
+            )
+        ).label('avg_sentiment'),
+        func.avg(CallEvent.kpi_rpm).label('avg_rpm')
+    ).join(
+        top_keys, key == top_keys.c.key
+    ).filter(
+        in_window
+    ).group_by(
+        key,
+        date_trunc
+    ).all()
+    
+    labels = _series_labels(db, group_by, [row.key for row in rows])
+    return build_series(rows, labels, start_date, end_date, interval)
+
+@cached("lane_breakdown", List[LaneBreakdown], [CALL_EVENTS])
+@olap_routed(olap_aggregations.get_lane_breakdown)
+@with_cold_history(cold_archive.union_lane_breakdown)
 def get_lane_breakdown(db: Session) -> List[LaneBreakdown]:
     """Get performance breakdown by lane"""
     
+    # Group on the integer lane key; names are joined in once per lane at the end
     lanes = db.query(
-        CallEvent.lane,
+        CallEvent.lane_id,
         func.count(CallEvent.id).label('total_calls'),
         func.avg(
             case(
@@ -137,14 +245,15 @@ def get_lane_breakdown(db: Session) -> List[LaneBreakdown]:
         func.avg(CallEvent.loadboard_rate).label('avg_loadboard_rate'),
         func.avg(CallEvent.final_rate_agreed).label('avg_final_rate')
     ).group_by(
-        CallEvent.lane
+        CallEvent.lane_id
     ).order_by(
         desc('total_calls')
     ).all()
+    names = lane_dimension.names(db, [lane.lane_id for lane in lanes])
     
     return [
         LaneBreakdown(
-            lane=lane.lane,
+            lane=names.get(lane.lane_id, ""),
             total_calls=lane.total_calls,
             success_rate=round(lane.success_rate * 100, 2),
             avg_rpm=round(lane.avg_rpm, 2) if lane.avg_rpm else 0,
@@ -154,11 +263,14 @@ def get_lane_breakdown(db: Session) -> List[LaneBreakdown]:
         for lane in lanes
     ]
 
+@cached("equipment_breakdown", List[EquipmentBreakdown], [CALL_EVENTS])
+@olap_routed(olap_aggregations.get_equipment_breakdown)
+@with_cold_history(cold_archive.union_equipment_breakdown)
 def get_equipment_breakdown(db: Session) -> List[EquipmentBreakdown]:
     """Get performance breakdown by equipment type"""
     
     equipment = db.query(
-        CallEvent.equipment_type,
+        CallEvent.equipment_type_id,
         func.count(CallEvent.id).label('total_calls'),
         func.avg(
             case(
@@ -169,14 +281,15 @@ def get_equipment_breakdown(db: Session) -> List[EquipmentBreakdown]:
         func.avg(CallEvent.kpi_rpm).label('avg_rpm'),
         func.avg(CallEvent.num_negotiation_rounds).label('avg_rounds')
     ).group_by(
-        CallEvent.equipment_type
+        CallEvent.equipment_type_id
     ).order_by(
         desc('total_calls')
     ).all()
+    names = equipment_dimension.names(db, [eq.equipment_type_id for eq in equipment])
     
     return [
         EquipmentBreakdown(
-            equipment_type=eq.equipment_type,
+            equipment_type=names.get(eq.equipment_type_id, ""),
             total_calls=eq.total_calls,
             success_rate=round(eq.success_rate * 100, 2),
             avg_rpm=round(eq.avg_rpm, 2) if eq.avg_rpm else 0,
@@ -185,26 +298,48 @@ def get_equipment_breakdown(db: Session) -> List[EquipmentBreakdown]:
         for eq in equipment
     ]
 
+def _touches_lane_equipment(touched: dict, lane: str = None, equipment_type: str = None) -> bool:
+    return lane in (None, touched["lane"]) and equipment_type in (None, touched["equipment_type"])
+
+@cached("rate_percentiles", List[LaneRatePercentiles], [CALL_EVENTS], affected_by=_touches_lane_equipment)
+def get_rate_percentiles(db: Session, lane: str = None, equipment_type: str = None) -> List[LaneRatePercentiles]:
+    """Get approximate p10/p50/p90 agreed rate per mile by lane and equipment type"""
+    return [LaneRatePercentiles(**entry) for entry in lane_rate_quantiles(db, lane, equipment_type)]
+
+def get_recent_calls(db: Session, limit: int = 10) -> List[dict]:
+    """Most recent call events as plain dicts (CallEventResponse fields)"""
+    calls = db.query(*schema_columns(CallEventResponse, CallEvent)).order_by(
+        CallEvent.created_at.desc()
+    ).limit(limit).all()
+    return rows_to_dicts(calls, CallEventResponse)
+
+@coalesced("carrier_breakdown", [CARRIERS])
 def get_carrier_breakdown(db: Session) -> List[CarrierBreakdown]:
     """Get performance breakdown by carrier"""
     
     carriers = db.query(Carrier).all()
     
     carrier_breakdowns = []
+    top_lanes_by_carrier = []
     for carrier in carriers:
         # Get top 3 lanes for this carrier
         top_lanes = db.query(
-            CallEvent.lane,
+            CallEvent.lane_id,
             func.count(CallEvent.id).label('lane_calls')
         ).filter(
             CallEvent.carrier_id == carrier.carrier_id
         ).group_by(
-            CallEvent.lane
+            CallEvent.lane_id
         ).order_by(
             desc('lane_calls')
         ).limit(3).all()
         
-        preferred_lanes = [lane.lane for lane in top_lanes]
+        top_lanes_by_carrier.append((carrier, [lane.lane_id for lane in top_lanes]))
+    
+    # Lane names for every carrier's top lanes in a single lookup
+    names = lane_dimension.names(db, [lane_id for _, lane_ids in top_lanes_by_carrier for lane_id in lane_ids])
+    for carrier, lane_ids in top_lanes_by_carrier:
+        preferred_lanes = [names[lane_id] for lane_id in lane_ids if lane_id in names]
         
         carrier_breakdowns.append(
             CarrierBreakdown(
@@ -221,14 +356,27 @@ def get_carrier_breakdown(db: Session) -> List[CarrierBreakdown]:
     
     return carrier_breakdowns
 
-def get_smart_matching(db: Session, request: MatchingRequest) -> MatchingResponse:
-    """Get smart carrier matching for a load"""
+def _matching_candidates(db: Session, filters: list, limit: int = None):
+    """Carriers with calls matching the filters, with their windowed and decayed stats"""
     
-    lane = f"{request.lane}"
-    equipment_type = request.equipment_type
+    lane_calls = db.query(
+        CallEvent.carrier_id.label('carrier_id'),
+        func.count(CallEvent.id).label('lane_calls')
+    ).filter(
+        *filters
+    ).group_by(
+        CallEvent.carrier_id
+    )
+    if limit:
+        lane_calls = lane_calls.order_by(desc('lane_calls')).limit(limit)
+    # A CTE, so the candidates are found once for both the join and the window filter
+    lane_calls = lane_calls.cte('lane_calls')
     
-    # Get carriers who have handled this exact lane and equipment
-    exact_matches = db.query(
+    # Rolling windows come from carrier_daily_stats, never from call_events history,
+    # and only for the candidates
+    windows = window_stats_subquery(db, select(lane_calls.c.carrier_id))
+    
+    return db.query(
         Carrier.carrier_id,
         Carrier.carrier_name,
         Carrier.success_rate,
@@ -236,82 +384,135 @@ def get_smart_matching(db: Session, request: MatchingRequest) -> MatchingRespons
         Carrier.avg_negotiation_rounds,
         Carrier.avg_loads_per_call,
         Carrier.last_call_date,
-        func.count(CallEvent.id).label('lane_calls')
+        lane_calls.c.lane_calls,
+        CarrierDecayedStats,
+        *[column for column in windows.c if column.name != 'carrier_id']
     ).join(
-        CallEvent, Carrier.carrier_id == CallEvent.carrier_id
-    ).filter(
-        and_(
-            CallEvent.lane == lane,
-            CallEvent.equipment_type == equipment_type
-        )
-    ).group_by(
-        Carrier.carrier_id, Carrier.carrier_name, Carrier.success_rate,
-        Carrier.avg_rpm, Carrier.avg_negotiation_rounds, Carrier.avg_loads_per_call,
-        Carrier.last_call_date
+        lane_calls, lane_calls.c.carrier_id == Carrier.carrier_id
+    ).outerjoin(
+        CarrierDecayedStats, CarrierDecayedStats.carrier_id == Carrier.carrier_id
+    ).outerjoin(
+        windows, windows.c.carrier_id == Carrier.carrier_id
+    ).order_by(
+        desc(lane_calls.c.lane_calls)
     ).all()
+
+def load_matching_inputs(db: Session, request: MatchingRequest) -> Dict[str, Any]:
+    """Database part of smart matching; returns plain (picklable) inputs for score_matching"""
+    
+    lane = f"{request.lane}"
+    equipment_type = request.equipment_type
+    
+    # Filter on the integer dimension keys; names never seen at ingest match nothing
+    lane_id = lane_dimension.lookup(db, lane)
+    equipment_type_id = equipment_dimension.lookup(db, equipment_type)
+    
+    # Get carriers who have handled this exact lane and equipment
+    exact_matches = []
+    if lane_id is not None and equipment_type_id is not None:
+        exact_matches = _matching_candidates(db, [
+            CallEvent.lane_id == lane_id,
+            CallEvent.equipment_type_id == equipment_type_id
+        ])
     
     # If no exact matches, get carriers with same equipment type
-    if not exact_matches:
-        exact_matches = db.query(
-            Carrier.carrier_id,
-            Carrier.carrier_name,
-            Carrier.success_rate,
-            Carrier.avg_rpm,
-            Carrier.avg_negotiation_rounds,
-            Carrier.avg_loads_per_call,
-            Carrier.last_call_date,
-            func.count(CallEvent.id).label('lane_calls')
-        ).join(
-            CallEvent, Carrier.carrier_id == CallEvent.carrier_id
-        ).filter(
-            CallEvent.equipment_type == equipment_type
-        ).group_by(
-            Carrier.carrier_id, Carrier.carrier_name, Carrier.success_rate,
-            Carrier.avg_rpm, Carrier.avg_negotiation_rounds, Carrier.avg_loads_per_call,
-            Carrier.last_call_date
-        ).order_by(
-            desc('lane_calls')
-        ).limit(10).all()
+    if not exact_matches and equipment_type_id is not None:
+        exact_matches = _matching_candidates(db, [
+            CallEvent.equipment_type_id == equipment_type_id
+        ], limit=10)
+    
+    # Rate ranges come from the lane's rate-per-mile sketches (p10-p90)
+    lane_rates = lane_rate_quantiles(db, lane, equipment_type) or lane_rate_quantiles(db, lane, by_equipment=False)
+    lane_rates = lane_rates[0] if lane_rates else None
+    carrier_rates = carrier_lane_rate_quantiles(db, lane, [carrier.carrier_id for carrier in exact_matches])
+    
+    today = date.today()
+    candidates = [
+        {
+            "carrier_id": carrier.carrier_id,
+            "carrier_name": carrier.carrier_name,
+            "lane_calls": carrier.lane_calls,
+            "last_call_date": carrier.last_call_date,
+            "success_rate": float(carrier.success_rate or 0),
+            "avg_rpm": float(carrier.avg_rpm or 0),
+            "avg_negotiation_rounds": float(carrier.avg_negotiation_rounds or 0),
+            "decayed": decayed_stats(carrier.CarrierDecayedStats, today),
+            "last_week_calls": window_stats(carrier, 7).total_calls,
+            "last_month_calls": window_stats(carrier, 30).total_calls,
+        }
+        for carrier in exact_matches
+    ]
+    return {
+        "request": request,
+        "candidates": candidates,
+        "lane_rates": lane_rates,
+        "carrier_rates": carrier_rates,
+        "today": today,
+    }
+
+def score_matching(request: MatchingRequest, candidates: List[Dict[str, Any]], lane_rates, carrier_rates, today: date) -> MatchingResponse:
+    """CPU part of smart matching: score and explain each candidate (no database access)"""
     
     recommendations = []
-    for carrier in exact_matches:
+    for carrier in candidates:
+        # Prefer recency-weighted behavior; fall back to all-time averages
+        decayed = carrier["decayed"]
+        success_rate = decayed.success_rate if decayed.success_rate is not None else carrier["success_rate"]
+        avg_rpm = decayed.avg_rpm if decayed.avg_rpm is not None else carrier["avg_rpm"]
+        avg_rounds = decayed.avg_negotiation_rounds if decayed.avg_negotiation_rounds is not None else carrier["avg_negotiation_rounds"]
+        
         # Calculate match score (0-100)
-        lane_success_score = float(carrier.success_rate or 0) * 0.30  # Max 30 points
+        lane_success_score = success_rate * 0.30  # Max 30 points
         equipment_match_score = 20  # Max 20 points (has the equipment)
-        rate_competitiveness = max(0, 20 - abs(float(carrier.avg_rpm or 0) - 2.0) * 5)  # Max 20 points
-        recent_activity = 15 if carrier.last_call_date and (date.today() - carrier.last_call_date).days <= 7 else 5  # Max 15 points
+        rate_competitiveness = max(0, 20 - abs(avg_rpm - 2.0) * 5)  # Max 20 points
+        recent_activity = 15 if carrier["last_week_calls"] else 10 if carrier["last_month_calls"] else 5  # Max 15 points
         sentiment_score = 10  # Max 10 points (assume positive if in system)
-        efficiency_score = max(0, (5 - float(carrier.avg_negotiation_rounds or 0)) * 2)  # Max 10 points
+        efficiency_score = max(0, (5 - avg_rounds) * 2)  # Max 10 points
         
         total_score = lane_success_score + equipment_match_score + rate_competitiveness + recent_activity + sentiment_score + efficiency_score
         
         # Generate reasons
         reasons = []
-        if carrier.lane_calls > 0:
-            reasons.append(f"{carrier.lane_calls} calls on this lane")
-        if carrier.success_rate and carrier.success_rate > 70:
-            reasons.append(f"{carrier.success_rate:.0f}% success rate")
-        if carrier.avg_rpm and carrier.avg_rpm < 2.5:
+        if carrier["lane_calls"] > 0:
+            reasons.append(f"{carrier['lane_calls']} calls on this lane")
+        if success_rate > 70:
+            reasons.append(f"{success_rate:.0f}% success rate")
+        if avg_rpm and avg_rpm < 2.5:
             reasons.append("Competitive rates")
-        if carrier.avg_negotiation_rounds and carrier.avg_negotiation_rounds < 2.5:
+        if avg_rounds and avg_rounds < 2.5:
             reasons.append("Quick to close deals")
-        if carrier.last_call_date and (date.today() - carrier.last_call_date).days <= 3:
+        if carrier["last_call_date"] and (today - carrier["last_call_date"]).days <= 3:
             reasons.append("Recently active")
+        elif carrier["last_month_calls"]:
+            reasons.append(f"{carrier['last_month_calls']} calls in the last 30 days")
         
-        # Calculate expected rate range
-        base_rate = request.miles * 2.0  # Base rate calculation
-        expected_min = base_rate * 0.9
-        expected_max = base_rate * 1.1
+        # Calculate expected rate range: carrier's own history on the lane, else the lane's
+        rates = carrier_rates.get(carrier["carrier_id"])
+        rate_basis = "carrier_lane"
+        if not rates or rates["count"] < MIN_CARRIER_SAMPLES:
+            rates, rate_basis = lane_rates, "lane_equipment"
+        if rates:
+            expected_min = request.miles * rates["p10"]
+            expected_max = request.miles * rates["p90"]
+            expected_median = round(request.miles * rates["p50"], 2)
+        else:
+            base_rate = request.miles * 2.0  # No agreed rates on this lane yet
+            expected_min = base_rate * 0.9
+            expected_max = base_rate * 1.1
+            expected_median = None
+            rate_basis = "default"
         
         confidence = "High" if total_score > 70 else "Medium" if total_score > 50 else "Low"
         
         recommendations.append(
             Recommendation(
-                carrier_id=carrier.carrier_id,
-                carrier_name=carrier.carrier_name,
+                carrier_id=carrier["carrier_id"],
+                carrier_name=carrier["carrier_name"],
                 match_score=round(total_score, 1),
                 expected_rate_min=round(expected_min, 2),
                 expected_rate_max=round(expected_max, 2),
+                expected_rate_median=expected_median,
+                rate_basis=rate_basis,
                 confidence=confidence,
                 reasons=reasons
             )
@@ -320,11 +521,18 @@ def get_smart_matching(db: Session, request: MatchingRequest) -> MatchingRespons
     # Sort by score and return top 5
     recommendations.sort(key=lambda x: x.match_score, reverse=True)
     return MatchingResponse(
-        lane=lane,
-        equipment_type=equipment_type,
+        lane=f"{request.lane}",
+        equipment_type=request.equipment_type,
         recommendations=recommendations[:5]
     )
 
+def get_smart_matching(db: Session, request: MatchingRequest) -> MatchingResponse:
+    """Get smart carrier matching for a load"""
+    return score_matching(**load_matching_inputs(db, request))
+
+@coalesced("rate_variance_distribution", [CALL_EVENTS])
+@olap_routed(olap_aggregations.get_rate_variance_distribution)
+@with_cold_history(cold_archive.union_rate_variance_distribution)
 def get_rate_variance_distribution(db: Session):
     """Get distribution of rate variance across buckets"""
     total = db.query(CallEvent).filter(CallEvent.kpi_rate_variance_pct.isnot(None)).count()
@@ -354,6 +562,9 @@ def get_rate_variance_distribution(db: Session):
     
     return result
 
+@coalesced("conversion_funnel", [CALL_EVENTS])
+@olap_routed(olap_aggregations.get_conversion_funnel)
+@with_cold_history(cold_archive.union_conversion_funnel)
 def get_conversion_funnel(db: Session):
     """Get conversion funnel stages"""
     total_calls = db.query(CallEvent).count()
@@ -0,0 +1,283 @@
+"""Bulk loader for CallEventRequest-shaped rows (CSV, NDJSON or Parquet)
+
+Rows are validated in vectorized pandas chunks, streamed into a temporary
+staging table with PostgreSQL COPY, merged into call_events in batches and the
+carrier / equipment / lane rollups are recomputed once at the end.
+"""
+import io
+import os
+import time
+from typing import Iterable, Iterator, Optional, Callable, Dict, Any
+import pandas as pd
+from sqlalchemy import Integer, Numeric, String, Date
+from ..database import engine, SessionLocal
+from ..models import CallEvent, Carrier, CARRIER_NAME_KEY_SQL, CARRIER_NAME_WHITESPACE
+from ..schemas import CallEventRequest
+from .rollups import refresh_rollups
+from .data_version import bump_data_version
+
+SUCCESS_OUTCOMES = ["Successful", "Unsuccessful", "Pending"]
+SENTIMENTS = ["positive", "negative", "neutral", "unknown"]
+
+# call_events columns carried by CallEventRequest, plus the carrier's MC number
+EVENT_COLUMNS = [name for name in CallEventRequest.model_fields if name in CallEvent.__table__.columns]
+STAGE_COLUMNS = EVENT_COLUMNS + ["mc_number"]
+REQUIRED_COLUMNS = [
+    name for name, field in CallEventRequest.model_fields.items()
+    if field.is_required() and name in EVENT_COLUMNS
+]
+
+def _column(name: str):
+    if name == "mc_number":
+        return Carrier.__table__.columns[name]
+    return CallEvent.__table__.columns[name]
+
+STRING_COLUMNS = {name: _column(name).type.length for name in STAGE_COLUMNS if isinstance(_column(name).type, String)}
+INTEGER_COLUMNS = [name for name in STAGE_COLUMNS if isinstance(_column(name).type, Integer)]
+NUMERIC_COLUMNS = {
+    name: 10 ** (_column(name).type.precision - _column(name).type.scale)
+    for name in STAGE_COLUMNS if isinstance(_column(name).type, Numeric)
+}
+DATE_COLUMNS = [name for name in STAGE_COLUMNS if isinstance(_column(name).type, Date)]
+
+MAX_INT = 2 ** 31
+
+# Same key as uq_carriers_name_key, so the lookups below use the index
+NORMALIZED_NAME = CARRIER_NAME_KEY_SQL
+
+CREATE_STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS call_events_stage AS
+SELECT {event_columns}, NULL::varchar(20) AS mc_number
+FROM call_events WITH NO DATA
+""".format(event_columns=", ".join(EVENT_COLUMNS))
+
+COPY_STAGE_SQL = "COPY call_events_stage ({columns}) FROM STDIN WITH (FORMAT csv)".format(
+    columns=", ".join(STAGE_COLUMNS)
+)
+
+# New carriers are deduplicated on the normalized name into their own temp table
+# first, so the checks against carriers are two anti-joins (name key through
+# uq_carriers_name_key, MC number) per distinct carrier rather than an OR of
+# expressions evaluated per staged row.
+STAGE_CARRIERS_SQL = [
+    "CREATE TEMP TABLE IF NOT EXISTS call_events_stage_carriers (name_key text PRIMARY KEY, carrier_name text, mc_number varchar(20))",
+    "TRUNCATE call_events_stage_carriers",
+    """
+    INSERT INTO call_events_stage_carriers (name_key, carrier_name, mc_number)
+    SELECT DISTINCT ON ({stage_key})
+        {stage_key}, btrim(regexp_replace(s.carrier_name, '{whitespace}', ' ', 'g')), s.mc_number
+    FROM call_events_stage s
+    ORDER BY {stage_key}, s.mc_number NULLS LAST
+    """.format(stage_key=NORMALIZED_NAME.format(column="s.carrier_name"), whitespace=CARRIER_NAME_WHITESPACE),
+]
+
+CREATE_CARRIERS_SQL = """
+INSERT INTO carriers (
+    carrier_name, mc_number, status, preferred, total_calls, successful_calls,
+    positive_sentiment_calls, negative_sentiment_calls, neutral_sentiment_calls,
+    unknown_sentiment_calls, total_loads_shown, created_at, updated_at
+)
+SELECT
+    s.carrier_name, s.mc_number, 'active', false, 0, 0,
+    0, 0, 0, 0, 0, now(), now()
+FROM call_events_stage_carriers s
+WHERE NOT EXISTS (SELECT 1 FROM carriers c WHERE {carrier_key} = s.name_key)
+  AND NOT EXISTS (SELECT 1 FROM carriers c WHERE c.mc_number = s.mc_number)
+ON CONFLICT DO NOTHING
+""".format(carrier_key=NORMALIZED_NAME.format(column="c.carrier_name"))
+
+# New lane / equipment names get their dimension ids before the merge looks them up
+CREATE_DIMENSIONS_SQL = [
+    "INSERT INTO lanes (name) SELECT DISTINCT lane FROM call_events_stage ON CONFLICT (name) DO NOTHING",
+    "INSERT INTO equipment_types (name) SELECT DISTINCT equipment_type FROM call_events_stage ON CONFLICT (name) DO NOTHING",
+]
+
+MERGE_EVENTS_SQL = """
+WITH inserted AS (
+    INSERT INTO call_events (carrier_id, lane_id, equipment_type_id, {event_columns})
+    SELECT coalesce(by_mc.carrier_id, by_name.carrier_id), l.lane_id, e.equipment_type_id, {stage_columns}
+    FROM call_events_stage s
+    LEFT JOIN carriers by_mc ON by_mc.mc_number = s.mc_number
+    LEFT JOIN carriers by_name ON {carrier_key} = {stage_key}
+    LEFT JOIN lanes l ON l.name = s.lane
+    LEFT JOIN equipment_types e ON e.name = s.equipment_type
+    ON CONFLICT (call_id) DO NOTHING
+    RETURNING carrier_id
+)
+SELECT carrier_id, count(*) FROM inserted GROUP BY carrier_id
+""".format(
+    carrier_key=NORMALIZED_NAME.format(column="by_name.carrier_name"),
+    stage_key=NORMALIZED_NAME.format(column="s.carrier_name"),
+    event_columns=", ".join(EVENT_COLUMNS),
+    stage_columns=", ".join("s." + name for name in EVENT_COLUMNS),
+)
+
+def validate_chunk(df: pd.DataFrame):
+    """Coerce a raw chunk to call_events types; returns (valid_rows, rejected_count)"""
+
+    df = df.reindex(columns=STAGE_COLUMNS)
+    # Blank strings count as missing values
+    df = df.mask(df.apply(lambda col: col.astype("string").str.strip() == "").fillna(False))
+
+    out = pd.DataFrame(index=df.index)
+    invalid = pd.Series(False, index=df.index)
+
+    for name, length in STRING_COLUMNS.items():
+        values = df[name].astype("string").str.strip()
+        invalid |= values.str.len().gt(length).fillna(False)
+        out[name] = values
+
+    for name in INTEGER_COLUMNS:
+        values = pd.to_numeric(df[name], errors="coerce")
+        invalid |= df[name].notna() & values.isna()
+        invalid |= values.notna() & ((values % 1 != 0) | (values.abs() >= MAX_INT))
+        out[name] = values.round().astype("Int64")
+
+    for name, limit in NUMERIC_COLUMNS.items():
+        values = pd.to_numeric(df[name], errors="coerce")
+        invalid |= df[name].notna() & values.isna()
+        invalid |= values.abs().round(2).ge(limit).fillna(False)
+        out[name] = values.round(2)
+
+    for name in DATE_COLUMNS:
+        values = pd.to_datetime(df[name], errors="coerce")
+        invalid |= df[name].notna() & values.isna()
+        out[name] = values.dt.strftime("%Y-%m-%d")
+
+    out["num_loads_shown"] = out["num_loads_shown"].fillna(1)
+    out["mc_number"] = out["mc_number"].str.replace(r"\D", "", regex=True).str.lstrip("0")
+    out["mc_number"] = out["mc_number"].mask(out["mc_number"] == "")
+
+    for name in REQUIRED_COLUMNS:
+        invalid |= out[name].isna()
+    invalid |= ~out["group_outcome_simple"].isin(SUCCESS_OUTCOMES).fillna(False)
+    invalid |= ~out["carrier_sentiment"].isin(SENTIMENTS).fillna(False)
+
+    return out.loc[~invalid, STAGE_COLUMNS], int(invalid.sum())
+
+def detect_format(path: str) -> str:
+    name = path.lower()
+    for suffix in (".gz", ".bz2", ".zst", ".xz"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith(".parquet") or name.endswith(".pq"):
+        return "parquet"
+    if name.endswith(".ndjson") or name.endswith(".jsonl") or name.endswith(".json"):
+        return "ndjson"
+    if name.endswith(".csv"):
+        return "csv"
+    raise ValueError(f"Cannot detect file format for {path}; pass it explicitly")
+
+def read_chunks(path: str, fmt: Optional[str] = None, chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
+    """Yield raw DataFrame chunks from a CSV, NDJSON or Parquet file"""
+
+    fmt = fmt or detect_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, dtype=str, chunksize=chunk_size)
+    elif fmt == "ndjson":
+        yield from pd.read_json(path, lines=True, dtype=False, convert_dates=False, chunksize=chunk_size)
+    elif fmt == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Loading Parquet files requires pyarrow (pip install pyarrow)")
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+def load_frames(
+    frames: Iterable[pd.DataFrame],
+    merge_every: int = 1_000_000,
+    progress: Optional[Callable[[str], None]] = print,
+) -> Dict[str, Any]:
+    """Validate, COPY and merge DataFrame chunks into call_events, then refresh rollups"""
+
+    stats = {"read": 0, "rejected": 0, "staged": 0, "inserted": 0, "carriers": 0}
+    touched_carriers = set()
+    started = time.monotonic()
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.execute(CREATE_STAGE_SQL)
+        cursor.execute("TRUNCATE call_events_stage")
+        pending = 0
+
+        def merge():
+            for statement in STAGE_CARRIERS_SQL:
+                cursor.execute(statement)
+            cursor.execute(CREATE_CARRIERS_SQL)
+            stats["carriers"] += cursor.rowcount
+            for statement in CREATE_DIMENSIONS_SQL:
+                cursor.execute(statement)
+            cursor.execute(MERGE_EVENTS_SQL)
+            for carrier_id, inserted in cursor.fetchall():
+                stats["inserted"] += inserted
+                if carrier_id is not None:
+                    touched_carriers.add(carrier_id)
+            cursor.execute("TRUNCATE call_events_stage")
+            raw.commit()
+
+        for frame in frames:
+            valid, rejected = validate_chunk(frame)
+            stats["read"] += len(frame)
+            stats["rejected"] += rejected
+
+            buffer = io.StringIO()
+            valid.to_csv(buffer, index=False, header=False, na_rep="")
+            buffer.seek(0)
+            cursor.copy_expert(COPY_STAGE_SQL, buffer)
+            stats["staged"] += len(valid)
+            pending += len(valid)
+
+            if pending >= merge_every:
+                merge()
+                pending = 0
+
+            if progress:
+                elapsed = time.monotonic() - started
+                progress(
+                    f"read {stats['read']:,} rows, rejected {stats['rejected']:,}, "
+                    f"inserted {stats['inserted']:,} ({stats['read'] / max(elapsed, 1e-9):,.0f} rows/s)"
+                )
+
+        if pending:
+            merge()
+        cursor.execute("DROP TABLE IF EXISTS call_events_stage, call_events_stage_carriers")
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    if progress:
+        progress(f"refreshing rollups for {len(touched_carriers):,} carriers")
+    db = SessionLocal()
+    try:
+        refresh_rollups(db, touched_carriers)
+        bump_data_version(db)
+    finally:
+        db.close()
+
+    stats["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    return stats
+
+def load_files(
+    paths: Iterable[str],
+    fmt: Optional[str] = None,
+    chunk_size: int = 100_000,
+    merge_every: int = 1_000_000,
+    progress: Optional[Callable[[str], None]] = print,
+) -> Dict[str, Any]:
+    """Bulk load one or more exported call event files"""
+
+    def frames():
+        for path in paths:
+            if progress:
+                progress(f"loading {os.path.basename(path)}")
+            yield from read_chunks(path, fmt, chunk_size)
+
+    return load_frames(frames(), merge_every=merge_every, progress=progress)
@@ -0,0 +1,119 @@
+"""Cross-worker cache invalidation over Postgres LISTEN/NOTIFY
+
+bump_data_version notifies CHANGES_CHANNEL in the writer's transaction, so the
+message is delivered once the change commits; ingest includes the carrier,
+lane, equipment type and call date it touched. Every worker runs run_listener
+(started in lifespan) on its own connection to the primary (notifications are
+not sent to replicas) and drops exactly the result cache entries a change
+affects. While it is connected, cached aggregates are keyed without the
+data version, so RESULT_CACHE_TTL can be long without serving stale results;
+if the connection drops, the cache is cleared and goes back to versioned keys
+until the listener reconnects. Notifications carry the committed versions, so
+results computed on a session that hasn't seen them yet (a lagging replica)
+are not stored under the unversioned keys. Call event changes also wake this
+worker's live metrics stream, whichever worker ingested them.
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import date
+from ..models import DataVersion
+from .data_version import CHANGES_CHANNEL, CALL_EVENTS
+from .result_cache import result_cache
+from .live_metrics import metrics_publisher
+
+logger = logging.getLogger(__name__)
+
+# Listen for change notifications in every worker (requires the primary to be Postgres)
+CACHE_INVALIDATION_LISTENER = os.getenv("CACHE_INVALIDATION_LISTENER", "true").lower() in ("1", "true", "yes")
+CACHE_INVALIDATION_RETRY_SECONDS = float(os.getenv("CACHE_INVALIDATION_RETRY_SECONDS", "5"))
+
+class InvalidationListener:
+    """State of this worker's LISTEN connection, for /health"""
+
+    def __init__(self):
+        self.connected = False
+        self.notifications = 0
+        self.invalidated = 0
+        self.reconnects = 0
+
+    def apply(self, payload: str):
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            # Not one of ours; treat it as touching everything
+            change = {}
+        self.notifications += 1
+        result_cache.note_versions(change.get("versions", {}))
+        self.invalidated += result_cache.invalidate(change)
+        if CALL_EVENTS in change.get("domains", [CALL_EVENTS]):
+            call_date = change.get("touched", {}).get("call_date")
+            metrics_publisher.notify_change([date.fromisoformat(str(call_date)[:10])] if call_date else [])
+
+    def stats(self) -> dict:
+        return {
+            "enabled": CACHE_INVALIDATION_LISTENER,
+            "connected": self.connected,
+            "notifications": self.notifications,
+            "invalidated": self.invalidated,
+            "reconnects": self.reconnects,
+        }
+
+invalidation_listener = InvalidationListener()
+
+def _connect(bind):
+    """A dedicated autocommit DBAPI connection (outside the pool) listening on CHANGES_CHANNEL
+
+    Returns it with the primary's versions as of right after LISTEN; later
+    bumps arrive as notifications.
+    """
+    cargs, cparams = bind.dialect.create_connect_args(bind.url)
+    # TCP keepalives notice a dead server while we only wait for messages
+    cparams.update(keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3)
+    connection = bind.dialect.connect(*cargs, **cparams)
+    connection.autocommit = True
+    cursor = connection.cursor()
+    cursor.execute(f'LISTEN "{CHANGES_CHANNEL}"')
+    cursor.execute(f"SELECT domain, version FROM {DataVersion.__tablename__}")
+    versions = dict(cursor.fetchall())
+    cursor.close()
+    return connection, versions
+
+async def run_listener(bind):
+    """Apply change notifications to the result cache until cancelled"""
+    loop = asyncio.get_running_loop()
+    while True:
+        connection = None
+        try:
+            connection, versions = await loop.run_in_executor(None, _connect, bind)
+            # Anything committed while we weren't listening was missed
+            result_cache.clear()
+            result_cache.note_versions(versions)
+            result_cache.notified = invalidation_listener.connected = True
+
+            readable = asyncio.Event()
+            fd = connection.fileno()
+            loop.add_reader(fd, readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    connection.poll()
+                    while connection.notifies:
+                        invalidation_listener.apply(connection.notifies.pop(0).payload)
+            finally:
+                loop.remove_reader(fd)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Cache invalidation listener disconnected")
+        finally:
+            result_cache.notified = invalidation_listener.connected = False
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+        invalidation_listener.reconnects += 1
+        await asyncio.sleep(CACHE_INVALIDATION_RETRY_SECONDS)
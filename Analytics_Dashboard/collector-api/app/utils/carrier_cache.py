@@ -0,0 +1,141 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Optional
+import os
+import re
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from ..models import Carrier, CARRIER_NAME_WHITESPACE, carrier_name_key
+
+CARRIER_CACHE_SIZE = int(os.getenv("CARRIER_CACHE_SIZE", "10000"))
+
+_whitespace = re.compile(CARRIER_NAME_WHITESPACE)
+_non_digits = re.compile(r"\D")
+
+def clean_carrier_name(name: str) -> str:
+    """A carrier name as stored: single-spaced and trimmed"""
+    return _whitespace.sub(" ", name).strip(" ")
+
+def normalize_carrier_name(name: str) -> str:
+    """Normalize a carrier name for lookups (same key as models.carrier_name_key in SQL)"""
+    return clean_carrier_name(name).lower()
+
+def normalize_mc_number(mc_number: Optional[str]) -> Optional[str]:
+    """Normalize an MC number to its digits ("MC-012345" -> "12345")"""
+    if not mc_number:
+        return None
+    digits = _non_digits.sub("", mc_number).lstrip("0")
+    return digits or None
+
+def normalized_name_sql(column):
+    """SQL expression matching normalize_carrier_name for a name column"""
+    return carrier_name_key(column)
+
+class CarrierResolver:
+    """Process-local LRU cache mapping carrier names / MC numbers to carrier_id"""
+
+    def __init__(self, max_size: int = CARRIER_CACHE_SIZE):
+        self.max_size = max_size
+        self._by_name = OrderedDict()
+        self._by_mc = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, store: OrderedDict, key: Optional[str]) -> Optional[int]:
+        if key is None:
+            return None
+        with self._lock:
+            carrier_id = store.get(key)
+            if carrier_id is not None:
+                store.move_to_end(key)
+            return carrier_id
+
+    def _put(self, store: OrderedDict, key: Optional[str], carrier_id: int):
+        if key is None:
+            return
+        with self._lock:
+            store[key] = carrier_id
+            store.move_to_end(key)
+            while len(store) > self.max_size:
+                store.popitem(last=False)
+
+    def remember(self, carrier_id: int, carrier_name: str, mc_number: Optional[str] = None):
+        """Record a known carrier in the cache"""
+        self._put(self._by_name, normalize_carrier_name(carrier_name), carrier_id)
+        self._put(self._by_mc, normalize_mc_number(mc_number), carrier_id)
+
+    def forget(self, carrier_name: str, mc_number: Optional[str] = None):
+        """Drop a carrier from the cache (e.g. after its insert was rolled back)"""
+        with self._lock:
+            self._by_name.pop(normalize_carrier_name(carrier_name), None)
+            mc_key = normalize_mc_number(mc_number)
+            if mc_key:
+                self._by_mc.pop(mc_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_name.clear()
+            self._by_mc.clear()
+
+    def warm(self, db: Session):
+        """Load the most recently active carriers into the cache"""
+        carriers = db.query(
+            Carrier.carrier_id,
+            Carrier.carrier_name,
+            Carrier.mc_number
+        ).order_by(
+            Carrier.last_call_date.asc().nullsfirst()
+        ).limit(self.max_size).all()
+
+        # Oldest first so the most recently active carriers end up hottest in the LRU
+        for carrier in carriers:
+            self.remember(carrier.carrier_id, carrier.carrier_name, carrier.mc_number)
+
+    def resolve(self, db: Session, carrier_name: str, mc_number: Optional[str] = None) -> int:
+        """Return the carrier_id for a carrier, creating the carrier if needed"""
+
+        name_key = normalize_carrier_name(carrier_name)
+        mc_key = normalize_mc_number(mc_number)
+
+        # MC number is the stronger identity, so prefer it when present
+        carrier_id = self._get(self._by_mc, mc_key) or self._get(self._by_name, name_key)
+        if carrier_id is not None:
+            self.hits += 1
+            return carrier_id
+
+        self.misses += 1
+        carrier_id = self._lookup(db, name_key, mc_key)
+        if carrier_id is None:
+            carrier_id = self._create(db, carrier_name, mc_key, name_key)
+
+        self._put(self._by_name, name_key, carrier_id)
+        self._put(self._by_mc, mc_key, carrier_id)
+        return carrier_id
+
+    def _lookup(self, db: Session, name_key: str, mc_key: Optional[str]) -> Optional[int]:
+        if mc_key:
+            carrier_id = db.query(Carrier.carrier_id).filter(Carrier.mc_number == mc_key).scalar()
+            if carrier_id is not None:
+                return carrier_id
+
+        return db.query(Carrier.carrier_id).filter(
+            normalized_name_sql(Carrier.carrier_name) == name_key
+        ).order_by(Carrier.carrier_id).limit(1).scalar()
+
+    def _create(self, db: Session, carrier_name: str, mc_key: Optional[str], name_key: str) -> int:
+        # A concurrent worker creating the same carrier conflicts on uq_carriers_name_key
+        # (or the MC number); no conflict target, so any of the unique indexes arbitrates
+        stmt = insert(Carrier).values(
+            carrier_name=clean_carrier_name(carrier_name),
+            mc_number=mc_key,
+            status='active'
+        ).on_conflict_do_nothing().returning(Carrier.carrier_id)
+
+        carrier_id = db.execute(stmt).scalar()
+        if carrier_id is None:
+            # Another worker won the race; read back its row
+            carrier_id = self._lookup(db, name_key, mc_key)
+        return carrier_id
+
+carrier_resolver = CarrierResolver()
@@ -0,0 +1,123 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text, func
+from datetime import date, timedelta
+from typing import Optional
+import os
+from ..models import CallEvent, CarrierDailyStats, CarrierDecayedStats
+from ..schemas import WindowStats, DecayedStats
+
+# Rolling windows (days) and half-life of the exponentially-decayed stats
+WINDOWS = (7, 30, 90)
+DECAY_HALF_LIFE_DAYS = float(os.getenv("CARRIER_DECAY_HALF_LIFE_DAYS", "14"))
+
+UPSERT_DAILY_SQL = """
+INSERT INTO carrier_daily_stats AS d (
+    carrier_id, stat_date, total_calls, successful_calls, rpm_sum, rpm_count, rounds_sum, rounds_count
+)
+VALUES (:carrier_id, :call_date, 1, :success, :rpm, :has_rpm, :rounds, :has_rounds)
+ON CONFLICT (carrier_id, stat_date) DO UPDATE SET
+    total_calls = d.total_calls + 1,
+    successful_calls = d.successful_calls + EXCLUDED.successful_calls,
+    rpm_sum = d.rpm_sum + EXCLUDED.rpm_sum,
+    rpm_count = d.rpm_count + EXCLUDED.rpm_count,
+    rounds_sum = d.rounds_sum + EXCLUDED.rounds_sum,
+    rounds_count = d.rounds_count + EXCLUDED.rounds_count
+"""
+
+# Existing sums are decayed forward to the newer date, and a late (older) event
+# is added with its own decayed weight, so events may arrive in any order.
+_STATE_DECAY = "power(0.5, greatest(EXCLUDED.as_of - d.as_of, 0) / CAST(:half_life AS float))"
+_EVENT_WEIGHT = "power(0.5, greatest(d.as_of - EXCLUDED.as_of, 0) / CAST(:half_life AS float))"
+
+UPSERT_DECAYED_SQL = """
+INSERT INTO carrier_decayed_stats AS d (
+    carrier_id, calls, successful_calls, rpm_sum, rpm_weight, rounds_sum, rounds_weight, as_of
+)
+VALUES (:carrier_id, 1, :success, :rpm, :has_rpm, :rounds, :has_rounds, :call_date)
+ON CONFLICT (carrier_id) DO UPDATE SET
+{assignments},
+    as_of = greatest(d.as_of, EXCLUDED.as_of)
+""".format(assignments=",\n".join(
+    f"    {column} = d.{column} * {_STATE_DECAY} + EXCLUDED.{column} * {_EVENT_WEIGHT}"
+    for column in ("calls", "successful_calls", "rpm_sum", "rpm_weight", "rounds_sum", "rounds_weight")
+))
+
+def record_carrier_event(db: Session, carrier_id: int, event: CallEvent):
+    """Fold one call event into the carrier's daily and decayed stats (O(1), no reads)
+
+    Runs in the caller's transaction so the stats commit together with the event.
+    """
+    rpm = float(event.kpi_rpm or 0)
+    rounds = event.num_negotiation_rounds or 0
+    params = {
+        "carrier_id": carrier_id,
+        "call_date": event.call_date,
+        "success": 1 if event.group_outcome_simple == "Successful" else 0,
+        "rpm": rpm,
+        "has_rpm": 1 if rpm else 0,
+        "rounds": rounds,
+        "has_rounds": 1 if rounds else 0,
+        "half_life": DECAY_HALF_LIFE_DAYS,
+    }
+    db.execute(text(UPSERT_DAILY_SQL), params)
+    db.execute(text(UPSERT_DECAYED_SQL), params)
+
+def window_stats_subquery(db: Session, carrier_ids=None, today: Optional[date] = None):
+    """Per-carrier sums for each rolling window, read from carrier_daily_stats only
+
+    carrier_ids (a list of ids or a single-column select) limits the sums to
+    those carriers, so callers joining a few candidates don't aggregate everyone.
+    """
+
+    today = today or date.today()
+    columns = [CarrierDailyStats.carrier_id.label("carrier_id")]
+    for days in WINDOWS:
+        in_window = CarrierDailyStats.stat_date > today - timedelta(days=days)
+        columns += [
+            func.coalesce(func.sum(CarrierDailyStats.total_calls).filter(in_window), 0).label(f"calls_{days}d"),
+            func.coalesce(func.sum(CarrierDailyStats.successful_calls).filter(in_window), 0).label(f"successes_{days}d"),
+            func.coalesce(func.sum(CarrierDailyStats.rpm_sum).filter(in_window), 0).label(f"rpm_sum_{days}d"),
+            func.coalesce(func.sum(CarrierDailyStats.rpm_count).filter(in_window), 0).label(f"rpm_count_{days}d"),
+            func.coalesce(func.sum(CarrierDailyStats.rounds_sum).filter(in_window), 0).label(f"rounds_sum_{days}d"),
+            func.coalesce(func.sum(CarrierDailyStats.rounds_count).filter(in_window), 0).label(f"rounds_count_{days}d"),
+        ]
+
+    query = db.query(*columns).filter(
+        CarrierDailyStats.stat_date > today - timedelta(days=max(WINDOWS))
+    )
+    if carrier_ids is not None:
+        query = query.filter(CarrierDailyStats.carrier_id.in_(carrier_ids))
+    return query.group_by(
+        CarrierDailyStats.carrier_id
+    ).subquery()
+
+def _ratio(numerator, denominator, scale: float = 1.0) -> Optional[float]:
+    if not denominator:
+        return None
+    return round(float(numerator or 0) / float(denominator) * scale, 2)
+
+def window_stats(row, days: int) -> WindowStats:
+    """Build a WindowStats from a row carrying window_stats_subquery columns"""
+    total_calls = int(getattr(row, f"calls_{days}d", 0) or 0)
+    return WindowStats(
+        days=days,
+        total_calls=total_calls,
+        success_rate=_ratio(getattr(row, f"successes_{days}d", 0), total_calls, 100),
+        avg_rpm=_ratio(getattr(row, f"rpm_sum_{days}d", 0), getattr(row, f"rpm_count_{days}d", 0)),
+        avg_negotiation_rounds=_ratio(getattr(row, f"rounds_sum_{days}d", 0), getattr(row, f"rounds_count_{days}d", 0)),
+    )
+
+def decayed_stats(stats: Optional[CarrierDecayedStats], today: Optional[date] = None) -> DecayedStats:
+    """Decayed averages; effective_calls is the call volume decayed to today"""
+    if stats is None:
+        return DecayedStats(half_life_days=DECAY_HALF_LIFE_DAYS, effective_calls=0)
+    today = today or date.today()
+    to_today = 0.5 ** (max((today - stats.as_of).days, 0) / DECAY_HALF_LIFE_DAYS)
+    return DecayedStats(
+        half_life_days=DECAY_HALF_LIFE_DAYS,
+        effective_calls=round(stats.calls * to_today, 3),
+        success_rate=_ratio(stats.successful_calls, stats.calls, 100),
+        avg_rpm=_ratio(stats.rpm_sum, stats.rpm_weight),
+        avg_negotiation_rounds=_ratio(stats.rounds_sum, stats.rounds_weight),
+        as_of=stats.as_of,
+    )
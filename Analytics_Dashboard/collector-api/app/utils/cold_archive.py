@@ -0,0 +1,613 @@
+"""Cold history: closed months of call_events archived to Parquet
+
+archive_month moves one month of rows out of call_events into
+ARCHIVE_DIR/call_events/month=YYYY-MM/part-NNNN.parquet (zstd by default). Next
+to each part it writes a summary of sums and counts that can be merged. Rows
+that arrive late for an archived month are moved by the next run into a new
+part. Aggregates wrapped in with_cold_history merge those summaries with the
+same sums and counts computed over the hot table whenever their range reaches
+an archived month. The DuckDB mirror reads the Parquet files directly instead.
+The summaries also keep per-carrier sums (CARRIER_SUMS) and rate sketch
+buckets, which the carrier rollups fold in when they recompute a carrier from
+the hot table (see utils/rollups.py and update_carrier_metrics).
+Writing parts requires pyarrow (pip install pyarrow); reading summaries does not.
+"""
+from datetime import date, datetime
+from functools import wraps
+from threading import Lock
+from typing import Callable, Dict, Iterable, List, Optional
+import glob
+import json
+import os
+from sqlalchemy import text, Integer, SmallInteger, BigInteger, Numeric, Float, Date, DateTime, Boolean
+from sqlalchemy.orm import Session
+from ..models import CallEvent
+from ..schemas import OverviewMetrics, TrendDataPoint, LaneBreakdown, EquipmentBreakdown
+from .dimensions import lane_dimension, equipment_dimension
+from .olap_aggregations import RATE_VARIANCE_BUCKETS
+from .rate_sketch import BUCKET_SQL, LOG_GAMMA
+
+# Root directory for archived partitions; empty disables the archive
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "")
+# Months older than this (counting back from the current month) are closed and may be archived
+ARCHIVE_AFTER_MONTHS = int(os.getenv("ARCHIVE_AFTER_MONTHS", "6"))
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "zstd")
+ARCHIVE_CHUNK_ROWS = 100_000
+
+ARCHIVE_TABLE = CallEvent.__table__
+ARCHIVE_COLUMNS = [column.name for column in ARCHIVE_TABLE.columns]
+MANIFEST_NAME = "_manifest.json"
+
+# Mergeable sums and counts behind each aggregate; {source} is call_events or the batch being archived
+TOTALS_SQL = """
+SELECT
+    count(*) AS calls,
+    count(*) FILTER (WHERE group_outcome_simple = 'Successful') AS successful,
+    count(offered_rate_initial) AS offers_made,
+    count(carrier_counter_rate) AS counter_offers,
+    count(*) FILTER (WHERE carrier_sentiment = 'positive') AS positive,
+    count(*) FILTER (WHERE carrier_sentiment = 'negative') AS negative,
+    count(*) FILTER (WHERE carrier_sentiment = 'neutral') AS neutral,
+    count(*) FILTER (WHERE carrier_sentiment = 'unknown') AS unknown,
+    sum(call_duration_seconds) AS duration_sum, count(call_duration_seconds) AS duration_n,
+    sum(num_loads_shown) AS loads_sum, count(num_loads_shown) AS loads_n,
+    sum(num_negotiation_rounds) AS rounds_sum, count(num_negotiation_rounds) AS rounds_n,
+    sum(kpi_rate_variance_pct) AS variance_sum, count(kpi_rate_variance_pct) AS variance_n,
+    sum(kpi_rpm) AS rpm_sum, count(kpi_rpm) AS rpm_n,
+    {variance_buckets}
+FROM {{source}}
+""".format(variance_buckets=",\n    ".join(
+    f"count(*) FILTER (WHERE {condition}) AS variance_bucket_{i}"
+    for i, (_, condition) in enumerate(RATE_VARIANCE_BUCKETS)
+))
+
+LANES_SQL = """
+SELECT
+    lane_id AS key,
+    count(*) AS calls,
+    count(*) FILTER (WHERE group_outcome_simple = 'Successful') AS successful,
+    sum(kpi_rpm) AS rpm_sum, count(kpi_rpm) AS rpm_n,
+    sum(loadboard_rate) AS loadboard_sum, count(loadboard_rate) AS loadboard_n,
+    sum(final_rate_agreed) AS final_sum, count(final_rate_agreed) AS final_n
+FROM {source}
+GROUP BY lane_id
+"""
+
+EQUIPMENT_SQL = """
+SELECT
+    equipment_type_id AS key,
+    count(*) AS calls,
+    count(*) FILTER (WHERE group_outcome_simple = 'Successful') AS successful,
+    sum(kpi_rpm) AS rpm_sum, count(kpi_rpm) AS rpm_n,
+    sum(num_negotiation_rounds) AS rounds_sum, count(num_negotiation_rounds) AS rounds_n
+FROM {source}
+GROUP BY equipment_type_id
+"""
+
+DAYS_SQL = """
+SELECT
+    call_date AS key,
+    count(*) AS calls,
+    count(*) FILTER (WHERE group_outcome_simple = 'Successful') AS successful,
+    sum(CASE carrier_sentiment WHEN 'positive' THEN 1 WHEN 'negative' THEN -1 ELSE 0 END) AS sentiment_sum,
+    sum(kpi_rpm) AS rpm_sum, count(kpi_rpm) AS rpm_n
+FROM {source}
+WHERE call_date >= :start_date AND call_date <= :end_date
+GROUP BY call_date
+"""
+
+def _nonzero(name: str, column: str) -> list:
+    return [
+        (f"{name}_sum", f"coalesce(sum({column}) FILTER (WHERE {column} <> 0), 0)", "numeric"),
+        (f"{name}_n", f"count(*) FILTER (WHERE {column} <> 0)", "bigint"),
+    ]
+
+_CALLS = [
+    ("calls", "count(*)", "bigint"),
+    ("successful", "count(*) FILTER (WHERE group_outcome_simple = 'Successful')", "bigint"),
+]
+_LAST_CALL = [("last_call", "max(call_date)", "date")]
+_RATED = "final_rate_agreed > 0 AND miles > 0"
+_BUCKET_COUNT = [("count", "count(*)", "bigint")]
+
+# Sums and counts behind the carrier rollups (utils/rollups.py), per grouping:
+# key columns and aggregates as (name, expression, type); averages there skip NULL/zero values.
+CARRIER_SUMS = {
+    "totals": {
+        "keys": [("carrier_id", "carrier_id", "int")],
+        "sums": _CALLS + _nonzero("rpm", "kpi_rpm") + _nonzero("rounds", "num_negotiation_rounds")
+            + _nonzero("variance", "kpi_rate_variance_pct") + _nonzero("duration", "call_duration_seconds")
+            + _nonzero("objections", "objection_count") + _nonzero("positive_words", "positive_words_count")
+            + _nonzero("negative_words", "negative_words_count") + [
+                ("loads_sum", "coalesce(sum(num_loads_shown), 0)", "bigint"),
+                ("loads_n", "count(num_loads_shown)", "bigint"),
+            ] + [
+                (sentiment, f"count(*) FILTER (WHERE carrier_sentiment = '{sentiment}')", "bigint")
+                for sentiment in ("positive", "negative", "neutral", "unknown")
+            ] + _LAST_CALL,
+    },
+    "lanes": {
+        "keys": [("carrier_id", "carrier_id", "int"), ("lane", "lane", "text")],
+        "sums": _CALLS + _nonzero("final", "final_rate_agreed") + _nonzero("loadboard", "loadboard_rate") + _LAST_CALL,
+    },
+    "equipment": {
+        "keys": [("carrier_id", "carrier_id", "int"), ("equipment_type", "equipment_type", "text")],
+        "sums": _CALLS,
+    },
+    "days": {
+        "keys": [("carrier_id", "carrier_id", "int"), ("call_date", "call_date", "date")],
+        "sums": _CALLS + _nonzero("rpm", "kpi_rpm") + _nonzero("rounds", "num_negotiation_rounds"),
+    },
+    "rate_buckets": {
+        "keys": [("carrier_id", "carrier_id", "int"), ("lane", "lane", "text"), ("bucket", BUCKET_SQL, "int")],
+        "sums": _BUCKET_COUNT,
+        "where": _RATED,
+    },
+}
+
+# lane_equipment rate sketch buckets (every call on the lane, with or without a carrier)
+LANE_RATE_BUCKETS = {
+    "keys": [("lane", "lane", "text"), ("equipment_type", "equipment_type", "text"), ("bucket", BUCKET_SQL, "int")],
+    "sums": _BUCKET_COUNT,
+    "where": _RATED,
+}
+
+def sums_sql(grouping: dict, source: str, condition: str = "") -> str:
+    """SELECT of a grouping's keys and sums over source"""
+    columns = [f"{expression} AS {name}" for name, expression, _ in grouping["keys"] + grouping["sums"]]
+    conditions = " AND ".join(filter(None, [grouping.get("where"), condition])) or "TRUE"
+    positions = ", ".join(str(i + 1) for i in range(len(grouping["keys"])))
+    return f"SELECT {', '.join(columns)} FROM {source} WHERE {conditions} GROUP BY {positions}"
+
+def archived_sql(grouping: dict, parameter: str) -> str:
+    """The same columns as sums_sql, read from archived records passed as a JSON array in :parameter"""
+    columns = grouping["keys"] + grouping["sums"]
+    names = ", ".join(name for name, _, _ in columns)
+    types = ", ".join(f"{name} {column_type}" for name, _, column_type in columns)
+    return f"SELECT {names} FROM jsonb_to_recordset(CAST(:{parameter} AS jsonb)) AS a({types})"
+
+def _number(value):
+    # Summaries are JSON, so Decimal sums become floats and dates ISO strings
+    if value is None:
+        return 0
+    if isinstance(value, date):
+        return value.isoformat()
+    return value if isinstance(value, int) else float(value)
+
+def _nested(rows, depth: int) -> Dict:
+    """{key: {key: ... {sum: value}}} from rows of `depth` key columns followed by sums"""
+    nested = {}
+    for row in rows:
+        values = list(row._mapping.items())
+        node = nested
+        for _, key in values[:depth - 1]:
+            node = node.setdefault(str(key), {})
+        node[str(values[depth - 1][1])] = {name: _number(value) for name, value in values[depth:]}
+    return nested
+
+def _flatten(nested: Dict, keys: List[str], prefix: Dict):
+    """Records of prefix + keys + sums from _nested output"""
+    if not keys:
+        yield dict(prefix, **nested)
+        return
+    for key, value in nested.items():
+        yield from _flatten(value, keys[1:], dict(prefix, **{keys[0]: key}))
+
+def _keyed(db: Session, sql: str, source: str, params: dict = None) -> Dict:
+    return {
+        row.key: {name: _number(value) for name, value in row._mapping.items() if name != "key"}
+        for row in db.execute(text(sql.format(source=source)), params or {})
+    }
+
+def summarize(db: Session, source: str = "call_events",
+              parts=("totals", "lanes", "equipment", "days", "carriers", "rate_buckets"),
+              start_date: date = date.min, end_date: date = date.max) -> dict:
+    """Sums and counts over source, in the shape stored next to each archived part"""
+    summary = {}
+    if "totals" in parts:
+        row = db.execute(text(TOTALS_SQL.format(source=source))).one()
+        summary["totals"] = {name: _number(value) for name, value in row._mapping.items()}
+    if "lanes" in parts:
+        lanes = _keyed(db, LANES_SQL, source)
+        names = lane_dimension.names(db, lanes)
+        summary["lanes"] = _merge_keyed([{names.get(lane_id, ""): values} for lane_id, values in lanes.items()])
+    if "equipment" in parts:
+        equipment = _keyed(db, EQUIPMENT_SQL, source)
+        names = equipment_dimension.names(db, equipment)
+        summary["equipment"] = _merge_keyed([{names.get(type_id, ""): values} for type_id, values in equipment.items()])
+    if "days" in parts:
+        days = _keyed(db, DAYS_SQL, source, {"start_date": start_date, "end_date": end_date})
+        summary["days"] = {day.isoformat(): values for day, values in days.items()}
+    if "carriers" in parts:
+        carriers = {}
+        for name, grouping in CARRIER_SUMS.items():
+            rows = db.execute(text(sums_sql(grouping, source, "carrier_id IS NOT NULL")), {"log_gamma": LOG_GAMMA})
+            for carrier_id, values in _nested(rows, len(grouping["keys"])).items():
+                carriers.setdefault(carrier_id, {})[name] = values
+        summary["carriers"] = carriers
+    if "rate_buckets" in parts:
+        rows = db.execute(text(sums_sql(LANE_RATE_BUCKETS, source)), {"log_gamma": LOG_GAMMA})
+        summary["rate_buckets"] = _nested(rows, len(LANE_RATE_BUCKETS["keys"]))
+    return summary
+
+def _merge_totals(totals: List[dict]) -> dict:
+    merged = {}
+    for values in totals:
+        for name, value in values.items():
+            if name == "last_call":
+                merged[name] = max(merged.get(name, value), value)
+            else:
+                merged[name] = merged.get(name, 0) + value
+    return merged
+
+def merge_sums(*groups: dict) -> dict:
+    """Merge nested summaries ({key: ... {sum: value}}) into a new dict"""
+    merged = {}
+    for group in groups:
+        for key, values in group.items():
+            if not values:
+                continue
+            if isinstance(next(iter(values.values())), dict):
+                merged[key] = merge_sums(merged.get(key, {}), values)
+            else:
+                merged[key] = _merge_totals([merged.get(key, {}), values])
+    return merged
+
+def _merge_keyed(groups: List[dict]) -> dict:
+    merged = {}
+    for group in groups:
+        for key, values in group.items():
+            merged[key] = _merge_totals([merged.get(key, {}), values])
+    return merged
+
+def _average(values: dict, name: str):
+    return values.get(f"{name}_sum", 0) / values[f"{name}_n"] if values.get(f"{name}_n") else None
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Archiving to Parquet requires pyarrow (pip install pyarrow)")
+    return pa, pq
+
+def _arrow_type(pa, column):
+    column_type = column.type
+    if isinstance(column_type, BigInteger):
+        return pa.int64()
+    if isinstance(column_type, (Integer, SmallInteger)):
+        return pa.int32()
+    if isinstance(column_type, (Numeric, Float)):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us")
+    if isinstance(column_type, Date):
+        return pa.date32()
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    return pa.string()
+
+class ColdArchive:
+    """Archived call_events partitions and their summaries under ARCHIVE_DIR"""
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = os.path.join(root, "call_events") if root else ""
+        self._lock = Lock()
+        self._manifest_mtime = None
+        self._parts: List[dict] = []
+        self._summaries: List[dict] = []
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.root)
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST_NAME)
+
+    def _load(self):
+        """Reload parts and summaries when the manifest changed (one stat per call otherwise)"""
+        if not self.enabled:
+            return
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            parts, summaries = [], []
+            if mtime is not None:
+                with open(self.manifest_path) as manifest:
+                    parts = json.load(manifest)["parts"]
+                for part in parts:
+                    with open(os.path.join(self.root, part["summary"])) as summary:
+                        summaries.append(json.load(summary))
+            self._parts, self._summaries, self._manifest_mtime = parts, summaries, mtime
+
+    def parts(self) -> List[dict]:
+        self._load()
+        return self._parts
+
+    def version(self):
+        """Changes whenever parts are added"""
+        self._load()
+        return self._manifest_mtime
+
+    def parquet_files(self) -> List[str]:
+        return [os.path.join(self.root, part["path"]) for part in self.parts()]
+
+    def covers(self, start_date: Optional[date] = None, end_date: Optional[date] = None, *args, **kwargs) -> bool:
+        """Whether any archived month falls inside the range (no range: any archived month at all)"""
+        for part in self.parts():
+            month = date.fromisoformat(part["month"] + "-01")
+            if (start_date is None or _next_month(month) > start_date) and (end_date is None or month <= end_date):
+                return True
+        return False
+
+    def summaries(self, part: str) -> List[dict]:
+        self._load()
+        return [summary[part] for summary in self._summaries]
+
+    def carrier_history(self, carrier_ids: Iterable[int]) -> Dict[int, dict]:
+        """Archived CARRIER_SUMS of these carriers, merged over every part: {carrier_id: {grouping: nested sums}}"""
+        wanted = {str(carrier_id) for carrier_id in carrier_ids}
+        history = {}
+        for carriers in self.summaries("carriers"):
+            for carrier_id in wanted.intersection(carriers):
+                history[int(carrier_id)] = merge_sums(history.get(int(carrier_id), {}), carriers[carrier_id])
+        return history
+
+    def carrier_records(self, carrier_ids: Iterable[int]) -> Dict[str, List[dict]]:
+        """carrier_history flattened into records per grouping, for archived_sql"""
+        records = {name: [] for name in CARRIER_SUMS}
+        for carrier_id, groupings in self.carrier_history(carrier_ids).items():
+            for name, nested in groupings.items():
+                keys = [key for key, _, _ in CARRIER_SUMS[name]["keys"][1:]]
+                records[name].extend(_flatten(nested, keys, {"carrier_id": carrier_id}))
+        return records
+
+    def lane_rate_records(self, lanes: Iterable[tuple]) -> List[dict]:
+        """Archived lane_equipment rate sketch buckets of these (lane, equipment_type) pairs, for archived_sql"""
+        wanted = set(lanes)
+        merged = {}
+        for rate_buckets in self.summaries("rate_buckets"):
+            merged = merge_sums(merged, {
+                lane: {equipment_type: buckets for equipment_type, buckets in by_equipment.items() if (lane, equipment_type) in wanted}
+                for lane, by_equipment in rate_buckets.items()
+            })
+        return list(_flatten(merged, [key for key, _, _ in LANE_RATE_BUCKETS["keys"]], {}))
+
+    def archived_months(self) -> List[date]:
+        return sorted({date.fromisoformat(part["month"] + "-01") for part in self.parts()})
+
+    def cold_days(self, start_date: date, end_date: date) -> List[dict]:
+        start, end = start_date.isoformat(), end_date.isoformat()
+        return [
+            {day: values for day, values in days.items() if start <= day <= end}
+            for days in self.summaries("days")
+        ]
+
+    def write_manifest(self):
+        """Rebuild the manifest from the parts on disk (a part counts once its summary is written)"""
+        parts = []
+        for summary_path in sorted(glob.glob(os.path.join(self.root, "month=*", "part-*.summary.json"))):
+            with open(summary_path) as summary:
+                rows = json.load(summary)["rows"]
+            relative = os.path.relpath(summary_path, self.root)
+            parts.append({
+                "month": relative.split(os.sep)[0][len("month="):],
+                "path": relative[:-len(".summary.json")] + ".parquet",
+                "summary": relative,
+                "rows": rows,
+            })
+        os.makedirs(self.root, exist_ok=True)
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w") as manifest:
+            json.dump({"parts": parts, "updated_at": datetime.now().isoformat()}, manifest)
+        os.replace(temporary, self.manifest_path)
+
+    def closed_months(self, db: Session, before: date) -> List[date]:
+        """Months with hot rows that end on or before `before`"""
+        rows = db.execute(text(
+            "SELECT DISTINCT date_trunc('month', call_date)::date FROM call_events WHERE call_date < :before ORDER BY 1"
+        ), {"before": _month_start(before)}).scalars().all()
+        return list(rows)
+
+    def archive_month(self, db: Session, month: date) -> int:
+        """Move one month of call_events into a new Parquet part; returns the rows archived"""
+        pa, pq = _pyarrow()
+        month = _month_start(month)
+        columns = ", ".join(ARCHIVE_COLUMNS)
+
+        db.execute(text(f"CREATE TEMP TABLE archive_batch ON COMMIT DROP AS SELECT {columns} FROM call_events WITH NO DATA"))
+        rows = db.execute(text(
+            f"WITH moved AS (DELETE FROM call_events WHERE call_date >= :start AND call_date < :end RETURNING {columns}) "
+            f"INSERT INTO archive_batch SELECT * FROM moved"
+        ), {"start": month, "end": _next_month(month)}).rowcount
+        if not rows:
+            db.rollback()
+            return 0
+
+        month_dir = os.path.join(self.root, f"month={month:%Y-%m}")
+        os.makedirs(month_dir, exist_ok=True)
+        part = len(glob.glob(os.path.join(month_dir, "part-*.parquet"))) + 1
+        parquet_path = os.path.join(month_dir, f"part-{part:04d}.parquet")
+        summary_path = os.path.join(month_dir, f"part-{part:04d}.summary.json")
+
+        schema = pa.schema([(column.name, _arrow_type(pa, column)) for column in ARCHIVE_TABLE.columns])
+        float_columns = {i for i, field in enumerate(schema) if pa.types.is_floating(field.type)}
+        try:
+            with pq.ParquetWriter(parquet_path + ".tmp", schema, compression=ARCHIVE_COMPRESSION) as writer:
+                result = db.execute(
+                    text(f"SELECT {columns} FROM archive_batch ORDER BY id"),
+                    execution_options={"yield_per": ARCHIVE_CHUNK_ROWS}
+                )
+                for chunk in result.partitions():
+                    arrays = [
+                        pa.array(
+                            [None if row[i] is None else float(row[i]) for row in chunk] if i in float_columns
+                            else [row[i] for row in chunk],
+                            type=field.type
+                        )
+                        for i, field in enumerate(schema)
+                    ]
+                    writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            os.replace(parquet_path + ".tmp", parquet_path)
+
+            summary = summarize(db, "archive_batch")
+            summary.update({"month": f"{month:%Y-%m}", "rows": rows})
+            with open(summary_path + ".tmp", "w") as summary_file:
+                json.dump(summary, summary_file)
+            os.replace(summary_path + ".tmp", summary_path)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            # The rows are back in call_events, so the part must not be counted
+            for path in (parquet_path, parquet_path + ".tmp", summary_path, summary_path + ".tmp"):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        self.write_manifest()
+        return rows
+
+    def stats(self) -> dict:
+        parts = self.parts()
+        return {
+            "enabled": self.enabled,
+            "parts": len(parts),
+            "months": len({part["month"] for part in parts}),
+            "rows": sum(part["rows"] for part in parts),
+        }
+
+cold_archive = ColdArchive()
+
+def with_cold_history(union_fn: Callable):
+    """Run `union_fn(db, *args, **kwargs)` (hot rows + archived summaries) when the query reaches archived months
+
+    Apply beneath @olap_routed; the DuckDB mirror reads the archive itself.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(db: Session, *args, **kwargs):
+            if cold_archive.enabled and cold_archive.covers(*args, **kwargs):
+                return union_fn(db, *args, **kwargs)
+            return fn(db, *args, **kwargs)
+        return wrapper
+    return decorator
+
+def _union_totals(db: Session) -> dict:
+    return _merge_totals([summarize(db, parts=("totals",))["totals"]] + cold_archive.summaries("totals"))
+
+def union_overview_metrics(db: Session) -> OverviewMetrics:
+    totals = _union_totals(db)
+    total_calls = totals["calls"]
+    if total_calls == 0:
+        return OverviewMetrics(
+            total_calls=0,
+            successful_calls=0,
+            success_rate=0.0,
+            avg_rpm=0.0,
+            avg_call_duration_seconds=0.0,
+            avg_loads_per_call=0.0,
+            avg_negotiation_rounds=0.0,
+            avg_rate_variance_pct=0.0,
+            sentiment_distribution={"positive": 0, "neutral": 0, "negative": 0, "unknown": 0}
+        )
+
+    return OverviewMetrics(
+        total_calls=total_calls,
+        successful_calls=totals["successful"],
+        success_rate=round(totals["successful"] / total_calls * 100, 2),
+        avg_rpm=round(_average(totals, "rpm") or 0, 2),
+        avg_call_duration_seconds=round(_average(totals, "duration") or 0, 0),
+        avg_loads_per_call=round(_average(totals, "loads") or 0, 2),
+        avg_negotiation_rounds=round(_average(totals, "rounds") or 0, 2),
+        avg_rate_variance_pct=round(_average(totals, "variance") or 0, 2),
+        sentiment_distribution={name: totals[name] for name in ("positive", "neutral", "negative", "unknown")}
+    )
+
+def union_trends_data(db: Session, start_date: date, end_date: date, interval: str) -> List[TrendDataPoint]:
+    hot = summarize(db, parts=("days",), start_date=start_date, end_date=end_date)["days"]
+    days = _merge_keyed([hot] + cold_archive.cold_days(start_date, end_date))
+
+    periods = {}
+    for day, values in days.items():
+        period = date.fromisoformat(day)
+        if interval == "week":
+            period = date.fromordinal(period.toordinal() - period.weekday())
+        periods[period] = _merge_totals([periods.get(period, {}), values])
+
+    trends = []
+    for period in sorted(periods):
+        values = periods[period]
+        success_rate = values["successful"] / values["calls"]
+        avg_sentiment = values["sentiment_sum"] / values["calls"]
+        avg_rpm = _average(values, "rpm")
+        trends.append(TrendDataPoint(
+            date=f"{period:%Y-%m-%d} 00:00:00",
+            success_rate=round(success_rate * 100, 2) if success_rate else 0,
+            avg_sentiment=round(avg_sentiment, 3) if avg_sentiment else 0,
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            total_calls=values["calls"]
+        ))
+    return trends
+
+def union_lane_breakdown(db: Session) -> List[LaneBreakdown]:
+    lanes = _merge_keyed([summarize(db, parts=("lanes",))["lanes"]] + cold_archive.summaries("lanes"))
+    breakdown = []
+    for lane, values in sorted(lanes.items(), key=lambda item: item[1]["calls"], reverse=True):
+        avg_rpm, avg_loadboard_rate, avg_final_rate = (_average(values, name) for name in ("rpm", "loadboard", "final"))
+        breakdown.append(LaneBreakdown(
+            lane=lane,
+            total_calls=values["calls"],
+            success_rate=round(values["successful"] / values["calls"] * 100, 2),
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            avg_loadboard_rate=round(avg_loadboard_rate, 2) if avg_loadboard_rate else 0,
+            avg_final_rate=round(avg_final_rate, 2) if avg_final_rate else 0
+        ))
+    return breakdown
+
+def union_equipment_breakdown(db: Session) -> List[EquipmentBreakdown]:
+    equipment = _merge_keyed([summarize(db, parts=("equipment",))["equipment"]] + cold_archive.summaries("equipment"))
+    breakdown = []
+    for equipment_type, values in sorted(equipment.items(), key=lambda item: item[1]["calls"], reverse=True):
+        avg_rpm, avg_rounds = _average(values, "rpm"), _average(values, "rounds")
+        breakdown.append(EquipmentBreakdown(
+            equipment_type=equipment_type,
+            total_calls=values["calls"],
+            success_rate=round(values["successful"] / values["calls"] * 100, 2),
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            avg_negotiation_rounds=round(avg_rounds, 2) if avg_rounds else 0
+        ))
+    return breakdown
+
+def union_rate_variance_distribution(db: Session):
+    totals = _union_totals(db)
+    total = totals["variance_n"]
+    return [
+        {
+            "bucket": label,
+            "count": totals[f"variance_bucket_{i}"],
+            "percentage": round((totals[f"variance_bucket_{i}"] / total * 100) if total > 0 else 0, 1)
+        }
+        for i, (label, _) in enumerate(RATE_VARIANCE_BUCKETS)
+    ]
+
+def union_conversion_funnel(db: Session):
+    totals = _union_totals(db)
+    total_calls = totals["calls"]
+    return [
+        {"stage": "Total Calls", "count": total_calls, "percentage": 100.0},
+        {"stage": "Offers Made", "count": totals["offers_made"], "percentage": round((totals["offers_made"] / total_calls * 100) if total_calls > 0 else 0, 1)},
+        {"stage": "Counter Offers", "count": totals["counter_offers"], "percentage": round((totals["counter_offers"] / total_calls * 100) if total_calls > 0 else 0, 1)},
+        {"stage": "Successful", "count": totals["successful"], "percentage": round((totals["successful"] / total_calls * 100) if total_calls > 0 else 0, 1)}
+    ]
@@ -0,0 +1,96 @@
+"""Composite dashboard pages: every panel of a page read from one database snapshot
+
+The request's session exports its snapshot (export_snapshot) and keeps that
+transaction open while each panel runs on the DB thread pool in its own
+session that imports it, so independent panels query concurrently yet all
+see the same committed data. Panels answered by the result cache or the
+DuckDB mirror are consistent by data version instead. Without a snapshot
+(not Postgres) the panels run one after another on the request's session.
+"""
+from datetime import datetime
+from typing import Any, Dict, Optional
+import asyncio
+import os
+from sqlalchemy.orm import Session
+from ..database import snapshot_session
+from ..executors import run_db
+from ..schemas import PerformanceDashboard, IntelligenceDashboard, TrendsResponse, RateVarianceDistribution, ConversionFunnel
+from .data_version import CALL_EVENTS, CARRIERS
+from .aggregations import (
+    get_overview_metrics, get_trends_data, get_lane_breakdown, get_equipment_breakdown, get_carrier_breakdown,
+    get_recent_calls, get_rate_variance_distribution, get_conversion_funnel
+)
+
+# Panels of one page that query at the same time (each holds a pooled connection)
+DASHBOARD_PANEL_CONCURRENCY = int(os.getenv("DASHBOARD_PANEL_CONCURRENCY", "4"))
+# Panels of all pages querying at once in this worker, so concurrent dashboards
+# can't take every pooled connection (keep it below the pool's size + overflow)
+DASHBOARD_MAX_PANELS = int(os.getenv("DASHBOARD_MAX_PANELS", "8"))
+panel_slots = asyncio.Semaphore(DASHBOARD_MAX_PANELS)
+
+# Data each page reads, for its ETag
+PAGE_DOMAINS = {
+    "performance": [CALL_EVENTS],
+    "intelligence": [CALL_EVENTS, CARRIERS],
+}
+
+def _run_panel(bind, snapshot_id: str, fn, args: tuple):
+    db = snapshot_session(bind, snapshot_id)
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+async def run_panels(db: Session, snapshot_id: Optional[str], panels: Dict[str, tuple]) -> Dict[str, Any]:
+    """Run each panel `(fn, *args)` as fn(session, *args) against the exported snapshot of db"""
+    if snapshot_id is None:
+        return {name: await run_db(fn, db, *args) for name, (fn, *args) in panels.items()}
+
+    bind = db.get_bind()
+    limit = asyncio.Semaphore(DASHBOARD_PANEL_CONCURRENCY)
+
+    async def run(fn, args):
+        async with limit, panel_slots:
+            return await run_db(_run_panel, bind, snapshot_id, fn, args)
+
+    # Wait for every panel before raising, so none is still importing the snapshot when db closes
+    results = await asyncio.gather(*(run(fn, args) for fn, *args in panels.values()), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return dict(zip(panels, results))
+
+async def performance_page(
+    db: Session,
+    snapshot_id: Optional[str],
+    start_date: datetime,
+    end_date: datetime,
+    interval: str,
+    recent_limit: int
+) -> PerformanceDashboard:
+    panels = await run_panels(db, snapshot_id, {
+        "overview": (get_overview_metrics,),
+        "trends": (get_trends_data, start_date, end_date, interval),
+        "lane_breakdown": (get_lane_breakdown,),
+        "equipment_breakdown": (get_equipment_breakdown,),
+        "recent_calls": (get_recent_calls, recent_limit),
+        "rate_variance": (get_rate_variance_distribution,),
+        "conversion_funnel": (get_conversion_funnel,),
+    })
+    return PerformanceDashboard(
+        overview=panels["overview"],
+        trends=TrendsResponse(data=panels["trends"], interval=interval),
+        lane_breakdown=panels["lane_breakdown"],
+        equipment_breakdown=panels["equipment_breakdown"],
+        recent_calls=panels["recent_calls"],
+        rate_variance=RateVarianceDistribution(buckets=panels["rate_variance"]),
+        conversion_funnel=ConversionFunnel(stages=panels["conversion_funnel"]),
+    )
+
+async def intelligence_page(db: Session, snapshot_id: Optional[str]) -> IntelligenceDashboard:
+    panels = await run_panels(db, snapshot_id, {
+        "carrier_breakdown": (get_carrier_breakdown,),
+        "lane_breakdown": (get_lane_breakdown,),
+        "equipment_breakdown": (get_equipment_breakdown,),
+    })
+    return IntelligenceDashboard(**panels)
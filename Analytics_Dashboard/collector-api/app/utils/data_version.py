@@ -0,0 +1,114 @@
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy import func, select
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Optional, Iterable, Tuple
+import hashlib
+import json
+import os
+from ..models import DataVersion
+
+# Data domains tracked by the watermark
+CALL_EVENTS = "call_events"  # call_events and everything aggregated from it
+CARRIERS = "carriers"  # carriers, carrier_lanes, carrier_equipment rollups
+
+# LISTEN/NOTIFY channel that announces each bump to every worker (see cache_invalidation)
+CHANGES_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "collector_changes")
+
+def bump_data_version(db: Session, domains: Iterable[str] = (CALL_EVENTS, CARRIERS), touched: Optional[dict] = None):
+    """Advance the watermark for the given domains (call after the data is committed)
+
+    Also notifies CHANGES_CHANNEL once this commits. touched describes a single
+    ingested call (carrier_id, lane_id, lane, equipment_type_id, equipment_type,
+    call_date) so listeners can drop only the cache entries it affects; without
+    it the change counts as touching everything in the domains. The new
+    versions travel with it, so listeners can tell results computed from older
+    data (a lagging replica) apart.
+    """
+    domains = list(domains)
+    change = {"domains": domains, "versions": {}}
+    if touched is not None:
+        change["touched"] = touched
+    for domain in domains:
+        now_utc = func.timezone('utc', func.now())
+        stmt = insert(DataVersion).values(domain=domain, version=1, updated_at=now_utc)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[DataVersion.domain],
+            set_={"version": DataVersion.version + 1, "updated_at": now_utc}
+        ).returning(DataVersion.version)
+        change["versions"][domain] = db.execute(stmt).scalar()
+    # Delivered to listeners when the transaction commits
+    db.execute(select(func.pg_notify(CHANGES_CHANNEL, json.dumps(change, default=str))))
+    db.commit()
+
+def data_versions(db: Session, domains: Iterable[str]) -> Dict[str, int]:
+    """Current version of each domain as seen by db (0 if never bumped)"""
+    domains = list(domains)
+    rows = dict(db.query(DataVersion.domain, DataVersion.version).filter(DataVersion.domain.in_(domains)).all())
+    return {domain: rows.get(domain, 0) for domain in domains}
+
+def get_data_version(db: Session, domains: Iterable[str]) -> Tuple[str, Optional[datetime]]:
+    """Return a version token and last-modified time covering the given domains"""
+    domains = sorted(domains)
+    rows = {
+        row.domain: row
+        for row in db.query(DataVersion).filter(DataVersion.domain.in_(domains)).all()
+    }
+    token = ".".join(f"{domain}:{rows[domain].version if domain in rows else 0}" for domain in domains)
+    modified = [row.updated_at for row in rows.values() if row.updated_at]
+    last_modified = max(modified).replace(tzinfo=timezone.utc, microsecond=0) if modified else None
+    return token, last_modified
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: ignore W/ prefixes
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in candidates
+
+def _not_modified_since(if_modified_since: str, last_modified: Optional[datetime]) -> bool:
+    if last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified <= since
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    db: Session,
+    domains: Iterable[str],
+    salt: str = ""
+) -> Optional[Response]:
+    """Set ETag/Last-Modified on the response; return a 304 if the client copy is current
+
+    The salt distinguishes responses that depend on more than the stored data
+    (for example a date window that defaults to "today").
+    """
+    token, last_modified = get_data_version(db, domains)
+    digest = hashlib.sha1(f"{request.url.path}?{request.url.query}|{salt}|{token}".encode()).hexdigest()[:20]
+    headers = {
+        "ETag": f'W/"{digest}"',
+        "Cache-Control": "private, no-cache",
+    }
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        unchanged = _etag_matches(if_none_match, headers["ETag"])
+    else:
+        unchanged = if_modified_since is not None and _not_modified_since(if_modified_since, last_modified)
+
+    if unchanged:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, Optional
+import os
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from ..models import Lane, EquipmentType
+
+DIMENSION_CACHE_SIZE = int(os.getenv("DIMENSION_CACHE_SIZE", "50000"))
+
+class DimensionCache:
+    """Process-local LRU cache mapping dimension names (lanes, equipment types) to surrogate keys
+
+    Names are stored exactly as ingested; ids are assigned by the database on
+    first sight and never change, so cached entries only need dropping when
+    their insert is rolled back.
+    """
+
+    def __init__(self, model, id_column, max_size: int = DIMENSION_CACHE_SIZE):
+        self.model = model
+        self.id_column = id_column
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, name: str) -> Optional[int]:
+        with self._lock:
+            dimension_id = self._ids.get(name)
+            if dimension_id is not None:
+                self._ids.move_to_end(name)
+            return dimension_id
+
+    def _put(self, name: str, dimension_id: int):
+        with self._lock:
+            self._ids[name] = dimension_id
+            self._ids.move_to_end(name)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def forget(self, name: Optional[str]):
+        """Drop a name from the cache (e.g. after its insert was rolled back)"""
+        if name is None:
+            return
+        with self._lock:
+            self._ids.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def warm(self, db: Session):
+        """Load dimension ids into the cache"""
+        rows = db.query(self.id_column, self.model.name).limit(self.max_size).all()
+        for dimension_id, name in rows:
+            self._put(name, dimension_id)
+
+    def lookup(self, db: Session, name: Optional[str]) -> Optional[int]:
+        """Return the id for name without creating it (None if the name has never been ingested)"""
+        if name is None:
+            return None
+        dimension_id = self._get(name)
+        if dimension_id is not None:
+            self.hits += 1
+            return dimension_id
+
+        self.misses += 1
+        dimension_id = db.query(self.id_column).filter(self.model.name == name).scalar()
+        if dimension_id is not None:
+            self._put(name, dimension_id)
+        return dimension_id
+
+    def names(self, db: Session, dimension_ids: Iterable[int]) -> Dict[int, str]:
+        """Map ids back to names (for labelling results grouped by id)"""
+        ids = list({dimension_id for dimension_id in dimension_ids if dimension_id is not None})
+        if not ids:
+            return {}
+        return dict(db.query(self.id_column, self.model.name).filter(self.id_column.in_(ids)).all())
+
+    def resolve(self, db: Session, name: str) -> int:
+        """Return the id for name, inserting it if needed"""
+        dimension_id = self.lookup(db, name)
+        if dimension_id is not None:
+            return dimension_id
+
+        # Upsert on the unique name so concurrent workers don't collide
+        stmt = insert(self.model).values(name=name).on_conflict_do_nothing().returning(self.id_column)
+        dimension_id = db.execute(stmt).scalar()
+        if dimension_id is None:
+            # Another worker won the race; read back its row
+            dimension_id = db.query(self.id_column).filter(self.model.name == name).scalar()
+
+        self._put(name, dimension_id)
+        return dimension_id
+
+    def stats(self) -> dict:
+        return {"size": len(self._ids), "hits": self.hits, "misses": self.misses}
+
+lane_dimension = DimensionCache(Lane, Lane.lane_id)
+equipment_dimension = DimensionCache(EquipmentType, EquipmentType.equipment_type_id)
@@ -0,0 +1,158 @@
+"""HyperLogLog sketches of unique carriers and lanes per day and segment
+
+Each item is hashed in Postgres (hashtextextended); the low PRECISION bits pick
+a register and the rank is the position of the first set bit in the rest.
+Registers are stored one row each and only ever raised, so ingest is a single
+upsert and any range of days merges with max(rank) per register - the cost
+of a query depends on the number of registers, not on call volume.
+"""
+import math
+import os
+from datetime import date
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import text, func, literal, cast, Date
+from ..models import DistinctSketchRegister
+
+# 2^PRECISION registers, standard error ~1.04 / sqrt(2^PRECISION) (1.6% at 12).
+# Changing it requires rebuilding the sketches (see utils/rollups.py).
+PRECISION = int(os.getenv("HLL_PRECISION", "12"))
+REGISTERS = 1 << PRECISION
+
+METRICS = ("carriers", "lanes")
+SEGMENT_TYPES = ("all", "equipment_type")
+INTERVALS = ("day", "week", "month", "total")
+
+_REGISTER_SQL = f"(h & {REGISTERS - 1})::int"
+_RANK_SQL = f"coalesce(nullif(position('1' in reverse((h >> {PRECISION})::bit({64 - PRECISION})::text)), 0), {64 - PRECISION + 1})"
+
+def _items_sql(alias: str, carrier: str, lane: str, equipment_type: str) -> str:
+    return f"""(VALUES
+        ('carriers', 'all', '', {carrier}),
+        ('carriers', 'equipment_type', {equipment_type}, {carrier}),
+        ('lanes', 'all', '', {lane}),
+        ('lanes', 'equipment_type', {equipment_type}, {lane})
+    ) AS {alias}(metric, segment_type, segment, item)"""
+
+UPSERT_REGISTERS_SQL = f"""
+INSERT INTO distinct_sketch_registers AS r (stat_date, metric, segment_type, segment, register, rank)
+SELECT CAST(:call_date AS date), v.metric, v.segment_type, v.segment, {_REGISTER_SQL}, {_RANK_SQL}
+FROM {_items_sql("v", "CAST(:carrier_id AS text)", "CAST(:lane AS text)", "CAST(:equipment_type AS text)")}
+CROSS JOIN LATERAL (SELECT hashtextextended(v.item, 0) AS h) hashed
+ON CONFLICT (stat_date, metric, segment_type, segment, register) DO UPDATE SET
+    rank = EXCLUDED.rank
+WHERE EXCLUDED.rank > r.rank
+"""
+
+# Rebuild statements used by utils/rollups.py; every day on which the given
+# carriers have calls is recomputed from all of that day's calls. Days of
+# archived months (:archived_months) keep their registers, since the archived
+# calls can't be re-read, and are only raised by the calls still in the table.
+DELETE_REGISTERS_SQL = """
+DELETE FROM distinct_sketch_registers
+WHERE stat_date IN (
+    SELECT DISTINCT call_date FROM call_events
+    WHERE carrier_id IS NOT NULL {carrier_filter}
+)
+AND date_trunc('month', stat_date)::date <> ALL(CAST(:archived_months AS date[]))
+"""
+
+REBUILD_REGISTERS_SQL = f"""
+WITH days AS (
+    SELECT DISTINCT call_date FROM call_events
+    WHERE carrier_id IS NOT NULL {{carrier_filter}}
+),
+hashed AS (
+    SELECT e.call_date, v.metric, v.segment_type, v.segment, hashtextextended(v.item, 0) AS h
+    FROM call_events e
+    JOIN days d ON d.call_date = e.call_date
+    CROSS JOIN LATERAL {_items_sql("v", "e.carrier_id::text", "e.lane", "e.equipment_type")}
+    WHERE e.carrier_id IS NOT NULL
+)
+INSERT INTO distinct_sketch_registers AS r (stat_date, metric, segment_type, segment, register, rank)
+SELECT call_date, metric, segment_type, segment, {_REGISTER_SQL}, max({_RANK_SQL})
+FROM hashed
+GROUP BY call_date, metric, segment_type, segment, {_REGISTER_SQL}
+ON CONFLICT (stat_date, metric, segment_type, segment, register) DO UPDATE SET
+    rank = EXCLUDED.rank
+WHERE EXCLUDED.rank > r.rank
+"""
+
+def record_distinct(db: Session, carrier_id: int, event):
+    """Add the event's carrier and lane to its day's sketches
+
+    Runs in the caller's transaction so the sketches commit together with the event.
+    """
+    db.execute(text(UPSERT_REGISTERS_SQL), {
+        "call_date": event.call_date,
+        "carrier_id": carrier_id,
+        "lane": event.lane,
+        "equipment_type": event.equipment_type,
+    })
+
+def estimate(filled: int, harmonic_sum: float) -> int:
+    """HyperLogLog estimate from the non-empty register count and sum(2^-rank) over them"""
+    if not filled:
+        return 0
+    m = REGISTERS
+    zeros = m - filled
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / (zeros + harmonic_sum)
+    if raw <= 2.5 * m and zeros:
+        # Small-range correction (linear counting)
+        return int(round(m * math.log(m / zeros)))
+    return int(round(raw))
+
+def distinct_counts(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    interval: str = "day",
+    segment_type: str = "all",
+) -> List[Dict]:
+    """Unique carriers and lanes per period and segment between two dates (inclusive)"""
+
+    if interval == "total":
+        period = literal(None, Date)
+    else:
+        period = cast(func.date_trunc(interval, DistinctSketchRegister.stat_date), Date)
+
+    # Merge registers over each period, then reduce each sketch to (filled, sum 2^-rank)
+    merged = db.query(
+        period.label("period"),
+        DistinctSketchRegister.metric,
+        DistinctSketchRegister.segment,
+        DistinctSketchRegister.register,
+        func.max(DistinctSketchRegister.rank).label("rank")
+    ).filter(
+        DistinctSketchRegister.stat_date >= start_date,
+        DistinctSketchRegister.stat_date <= end_date,
+        DistinctSketchRegister.segment_type == segment_type
+    ).group_by(
+        period,
+        DistinctSketchRegister.metric,
+        DistinctSketchRegister.segment,
+        DistinctSketchRegister.register
+    ).subquery()
+
+    sketches = db.query(
+        merged.c.period,
+        merged.c.metric,
+        merged.c.segment,
+        func.count().label("filled"),
+        func.sum(func.power(2.0, -merged.c.rank)).label("harmonic_sum")
+    ).group_by(
+        merged.c.period, merged.c.metric, merged.c.segment
+    ).all()
+
+    points: Dict[tuple, Dict] = {}
+    for row in sketches:
+        point = points.setdefault((row.period, row.segment), {
+            "period": row.period.isoformat() if row.period else None,
+            "segment": row.segment or None,
+            "unique_carriers": 0,
+            "unique_lanes": 0,
+        })
+        point[f"unique_{row.metric}"] = estimate(row.filled, float(row.harmonic_sum))
+
+    return [points[key] for key in sorted(points, key=lambda key: (key[0] or date.min, key[1]))]
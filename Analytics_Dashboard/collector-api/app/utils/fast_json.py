@@ -0,0 +1,31 @@
+from decimal import Decimal
+from typing import Any, Iterable, List, Optional, Sequence, Type
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+import orjson
+
+def _default(value: Any):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson (Decimal and pydantic models supported)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
+
+def schema_columns(schema: Type[BaseModel], model, fields: Optional[Sequence[str]] = None) -> list:
+    """Model columns for the fields of a response schema (all of them by default), in order"""
+    return [getattr(model, name) for name in (fields or schema.model_fields)]
+
+def rows_to_dicts(rows: Iterable, schema: Type[BaseModel], fields: Optional[Sequence[str]] = None) -> List[dict]:
+    """Turn trusted column rows (queried via schema_columns) into plain dicts
+
+    Rows come straight from our own tables, so they skip pydantic
+    re-validation; Decimal values are converted by the JSON renderer.
+    """
+    fields = list(fields or schema.model_fields)
+    return [dict(zip(fields, row)) for row in rows]
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import date, datetime
+from typing import Iterable, Optional, Set
+from fastapi import Request
+from ..database import SessionLocal
+from ..executors import run_db
+from .aggregations import get_overview_metrics, get_trends_data
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = 15
+RETRY_MILLISECONDS = 5000
+DEBOUNCE_SECONDS = 1.0
+HISTORY_SIZE = 256
+SUBSCRIBER_QUEUE_SIZE = 64
+
+class MetricsPublisher:
+    """Single in-process publisher fanning out live metric updates to SSE subscribers
+
+    Change notifications from any worker (utils/cache_invalidation.py), or
+    ingest itself while the listener is down, call notify_change(); changes are
+    debounced, the overview and the affected daily trend points are computed
+    once, and every subscriber gets the same pre-formatted message. Recent messages are kept so reconnecting
+    clients can resume from their Last-Event-ID.
+    """
+
+    def __init__(self):
+        # Event ids are "<epoch>:<seq>" so ids from a previous process are never replayed
+        self._epoch = str(int(time.time()))
+        self._seq = 0
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._dirty_dates: Set[date] = set()
+        self._latest_overview: Optional[dict] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def notify_change(self, call_dates: Iterable[date]):
+        """Record that call events for these dates changed (call from the event loop)"""
+        if not self._subscribers:
+            # Nobody listening: just make sure the next snapshot is recomputed
+            self._latest_overview = None
+            return
+        self._dirty_dates.update(call_dates)
+        self._changed.set()
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._changed = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for queue in list(self._subscribers):
+            self._close_subscriber(queue)
+
+    async def _run(self):
+        while True:
+            await self._changed.wait()
+            # Coalesce bursts of ingest into one computation
+            await asyncio.sleep(DEBOUNCE_SECONDS)
+            self._changed.clear()
+            dates, self._dirty_dates = self._dirty_dates, set()
+            if not self._subscribers:
+                self._latest_overview = None
+                continue
+            try:
+                overview, trend_points = await run_db(self._compute, dates)
+            except Exception:
+                logger.exception("Failed to compute live metrics")
+                continue
+            self._latest_overview = overview
+            self._emit("overview", overview)
+            if trend_points:
+                self._emit("trend", {"interval": "day", "data": trend_points})
+
+    def _compute(self, dates: Set[date]):
+        # The primary: a lagging replica could miss the events that triggered this
+        db = SessionLocal()
+        try:
+            overview = get_overview_metrics(db).model_dump(mode="json")
+            trend_points = []
+            if dates:
+                start = datetime.combine(min(dates), datetime.min.time())
+                end = datetime.combine(max(dates), datetime.min.time())
+                wanted = {d.strftime("%Y-%m-%d") for d in dates}
+                trend_points = [
+                    point.model_dump(mode="json")
+                    for point in get_trends_data(db, start, end, "day")
+                    if point.date[:10] in wanted
+                ]
+            return overview, trend_points
+        finally:
+            db.close()
+
+    def _format(self, seq: int, event: str, data: dict) -> str:
+        return f"id: {self._epoch}:{seq}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def _emit(self, event: str, data: dict):
+        self._seq += 1
+        message = (self._seq, self._format(self._seq, event, data))
+        self._history.append(message)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Slow consumer: end its stream; it will reconnect and resume
+                self._close_subscriber(queue)
+
+    def _close_subscriber(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    def _replay(self, last_event_id: Optional[str]):
+        """Messages after last_event_id, or None if the client must start from a snapshot"""
+        if not last_event_id:
+            return None
+        epoch, _, seq = last_event_id.partition(":")
+        if epoch != self._epoch or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if seq > self._seq:
+            return None
+        if seq < self._seq and (not self._history or self._history[0][0] > seq + 1):
+            return None
+        return [message for message in self._history if message[0] > seq]
+
+    async def stream(self, request: Request, last_event_id: Optional[str] = None):
+        """Async generator of SSE text for one subscriber"""
+        self._ensure_started()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        replay = self._replay(last_event_id)
+        self._subscribers.add(queue)
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+
+            if replay is None:
+                if self._latest_overview is None:
+                    overview, _ = await run_db(self._compute, set())
+                    self._latest_overview = overview
+                sent = self._seq
+                yield self._format(sent, "overview", self._latest_overview)
+            else:
+                sent = int(last_event_id.partition(":")[2])
+                for seq, message in replay:
+                    sent = seq
+                    yield message
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    break
+                seq, text = message
+                if seq <= sent:
+                    continue
+                sent = seq
+                yield text
+        finally:
+            self._subscribers.discard(queue)
+
+metrics_publisher = MetricsPublisher()
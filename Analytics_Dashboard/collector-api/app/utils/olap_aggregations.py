@@ -0,0 +1,221 @@
+"""DuckDB versions of the call_events aggregates, run by olap_routed on the mirror
+
+Each function returns exactly what its Postgres counterpart in aggregations.py
+returns, over the mirrored hot rows plus the cold archive (all_call_events).
+Multi-query aggregates are folded into single passes with FILTER.
+"""
+from datetime import date
+from typing import List
+from ..schemas import OverviewMetrics, TrendDataPoint, TrendSeries, LaneBreakdown, EquipmentBreakdown
+from .trend_series import build_series
+
+TRUNC_UNITS = {"hour": "hour", "day": "day", "week": "week"}
+
+# Series key column, join for its names, and the label expression, per trends group_by
+SERIES_COLUMNS = {
+    "lane": ("lane_id", "LEFT JOIN lanes d ON d.lane_id = t.key", "d.name"),
+    "equipment": ("equipment_type_id", "LEFT JOIN equipment_types d ON d.equipment_type_id = t.key", "d.name"),
+    "carrier": ("carrier_id", "", "t.carrier_name"),
+}
+
+RATE_VARIANCE_BUCKETS = [
+    ("< -10%", "kpi_rate_variance_pct < -10"),
+    ("-10% to -5%", "kpi_rate_variance_pct >= -10 AND kpi_rate_variance_pct < -5"),
+    ("-5% to 0%", "kpi_rate_variance_pct >= -5 AND kpi_rate_variance_pct < 0"),
+    ("0% to 5%", "kpi_rate_variance_pct >= 0 AND kpi_rate_variance_pct < 5"),
+    ("5% to 10%", "kpi_rate_variance_pct >= 5 AND kpi_rate_variance_pct < 10"),
+    ("> 10%", "kpi_rate_variance_pct >= 10"),
+]
+
+def _fetch(mirror, sql: str, params=None):
+    cursor = mirror.cursor()
+    try:
+        return cursor.execute(sql, params or []).fetchall()
+    finally:
+        cursor.close()
+
+def get_overview_metrics(mirror) -> OverviewMetrics:
+    (total_calls, successful_calls, avg_duration, avg_loads, avg_rounds, avg_variance, avg_rpm,
+     positive, negative, neutral, unknown) = _fetch(mirror, """
+        SELECT
+            count(*),
+            count(*) FILTER (WHERE group_outcome_simple = 'Successful'),
+            avg(call_duration_seconds),
+            avg(num_loads_shown),
+            avg(num_negotiation_rounds),
+            avg(kpi_rate_variance_pct),
+            avg(kpi_rpm),
+            count(*) FILTER (WHERE carrier_sentiment = 'positive'),
+            count(*) FILTER (WHERE carrier_sentiment = 'negative'),
+            count(*) FILTER (WHERE carrier_sentiment = 'neutral'),
+            count(*) FILTER (WHERE carrier_sentiment = 'unknown')
+        FROM all_call_events
+    """)[0]
+
+    if total_calls == 0:
+        return OverviewMetrics(
+            total_calls=0,
+            successful_calls=0,
+            success_rate=0.0,
+            avg_rpm=0.0,
+            avg_call_duration_seconds=0.0,
+            avg_loads_per_call=0.0,
+            avg_negotiation_rounds=0.0,
+            avg_rate_variance_pct=0.0,
+            sentiment_distribution={"positive": 0, "neutral": 0, "negative": 0, "unknown": 0}
+        )
+
+    return OverviewMetrics(
+        total_calls=total_calls,
+        successful_calls=successful_calls,
+        success_rate=round(successful_calls / total_calls * 100, 2),
+        avg_rpm=round(avg_rpm or 0, 2),
+        avg_call_duration_seconds=round(avg_duration or 0, 0),
+        avg_loads_per_call=round(avg_loads or 0, 2),
+        avg_negotiation_rounds=round(avg_rounds or 0, 2),
+        avg_rate_variance_pct=round(avg_variance or 0, 2),
+        sentiment_distribution={"positive": positive, "neutral": neutral, "negative": negative, "unknown": unknown}
+    )
+
+def get_trends_data(mirror, start_date: date, end_date: date, interval: str) -> List[TrendDataPoint]:
+    unit = TRUNC_UNITS.get(interval, "day")
+    trends = _fetch(mirror, f"""
+        SELECT
+            CAST(date_trunc('{unit}', call_date) AS TIMESTAMP) AS period,
+            count(*),
+            avg(CASE WHEN group_outcome_simple = 'Successful' THEN 1 ELSE 0 END),
+            avg(CASE carrier_sentiment WHEN 'positive' THEN 1 WHEN 'negative' THEN -1 ELSE 0 END),
+            avg(kpi_rpm)
+        FROM all_call_events
+        WHERE call_date >= ? AND call_date <= ?
+        GROUP BY period
+        ORDER BY period
+    """, [start_date, end_date])
+
+    return [
+        TrendDataPoint(
+            date=period.strftime("%Y-%m-%d %H:%M:%S"),
+            success_rate=round(success_rate * 100, 2) if success_rate else 0,
+            avg_sentiment=round(avg_sentiment, 3) if avg_sentiment else 0,
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            total_calls=total_calls
+        )
+        for period, total_calls, success_rate, avg_sentiment, avg_rpm in trends
+    ]
+
+def get_trend_series(mirror, start_date: date, end_date: date, interval: str, group_by: str, top: int) -> List[TrendSeries]:
+    unit = TRUNC_UNITS.get(interval, "day")
+    column, join, label = SERIES_COLUMNS[group_by]
+    rows = _fetch(mirror, f"""
+        WITH top_keys AS (
+            SELECT {column} AS key, max(carrier_name) AS carrier_name, count(*) AS calls
+            FROM all_call_events
+            WHERE call_date >= ? AND call_date <= ? AND {column} IS NOT NULL
+            GROUP BY {column}
+            ORDER BY calls DESC, key
+            LIMIT ?
+        )
+        SELECT
+            t.key,
+            {label},
+            CAST(date_trunc('{unit}', e.call_date) AS TIMESTAMP) AS period,
+            count(*),
+            avg(CASE WHEN e.group_outcome_simple = 'Successful' THEN 1 ELSE 0 END),
+            avg(CASE e.carrier_sentiment WHEN 'positive' THEN 1 WHEN 'negative' THEN -1 ELSE 0 END),
+            avg(e.kpi_rpm)
+        FROM all_call_events e
+        JOIN top_keys t ON e.{column} = t.key
+        {join}
+        WHERE e.call_date >= ? AND e.call_date <= ?
+        GROUP BY t.key, {label}, period
+    """, [start_date, end_date, top, start_date, end_date])
+
+    labels = {row[0]: row[1] for row in rows}
+    return build_series([(row[0],) + tuple(row[2:]) for row in rows], labels, start_date, end_date, interval)
+
+def get_lane_breakdown(mirror) -> List[LaneBreakdown]:
+    # Aggregate on the integer key, then join lane names onto the grouped rows
+    lanes = _fetch(mirror, """
+        SELECT coalesce(l.name, ''), s.total_calls, s.success_rate, s.avg_rpm, s.avg_loadboard_rate, s.avg_final_rate
+        FROM (
+            SELECT
+                lane_id,
+                count(*) AS total_calls,
+                avg(CASE WHEN group_outcome_simple = 'Successful' THEN 1 ELSE 0 END) AS success_rate,
+                avg(kpi_rpm) AS avg_rpm,
+                avg(loadboard_rate) AS avg_loadboard_rate,
+                avg(final_rate_agreed) AS avg_final_rate
+            FROM all_call_events
+            GROUP BY lane_id
+        ) s
+        LEFT JOIN lanes l ON l.lane_id = s.lane_id
+        ORDER BY s.total_calls DESC
+    """)
+
+    return [
+        LaneBreakdown(
+            lane=lane,
+            total_calls=total_calls,
+            success_rate=round(success_rate * 100, 2),
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            avg_loadboard_rate=round(avg_loadboard_rate, 2) if avg_loadboard_rate else 0,
+            avg_final_rate=round(avg_final_rate, 2) if avg_final_rate else 0
+        )
+        for lane, total_calls, success_rate, avg_rpm, avg_loadboard_rate, avg_final_rate in lanes
+    ]
+
+def get_equipment_breakdown(mirror) -> List[EquipmentBreakdown]:
+    equipment = _fetch(mirror, """
+        SELECT coalesce(e.name, ''), s.total_calls, s.success_rate, s.avg_rpm, s.avg_rounds
+        FROM (
+            SELECT
+                equipment_type_id,
+                count(*) AS total_calls,
+                avg(CASE WHEN group_outcome_simple = 'Successful' THEN 1 ELSE 0 END) AS success_rate,
+                avg(kpi_rpm) AS avg_rpm,
+                avg(num_negotiation_rounds) AS avg_rounds
+            FROM all_call_events
+            GROUP BY equipment_type_id
+        ) s
+        LEFT JOIN equipment_types e ON e.equipment_type_id = s.equipment_type_id
+        ORDER BY s.total_calls DESC
+    """)
+
+    return [
+        EquipmentBreakdown(
+            equipment_type=equipment_type,
+            total_calls=total_calls,
+            success_rate=round(success_rate * 100, 2),
+            avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+            avg_negotiation_rounds=round(avg_rounds, 2) if avg_rounds else 0
+        )
+        for equipment_type, total_calls, success_rate, avg_rpm, avg_rounds in equipment
+    ]
+
+def get_rate_variance_distribution(mirror):
+    counts = _fetch(mirror, "SELECT count(kpi_rate_variance_pct), {buckets} FROM all_call_events".format(
+        buckets=", ".join(f"count(*) FILTER (WHERE {condition})" for _, condition in RATE_VARIANCE_BUCKETS)
+    ))[0]
+    total = counts[0]
+
+    return [
+        {"bucket": label, "count": count, "percentage": round((count / total * 100) if total > 0 else 0, 1)}
+        for (label, _), count in zip(RATE_VARIANCE_BUCKETS, counts[1:])
+    ]
+
+def get_conversion_funnel(mirror):
+    total_calls, offers_made, counter_offers, successful = _fetch(mirror, """
+        SELECT
+            count(*),
+            count(offered_rate_initial),
+            count(carrier_counter_rate),
+            count(*) FILTER (WHERE group_outcome_simple = 'Successful')
+        FROM all_call_events
+    """)[0]
+
+    return [
+        {"stage": "Total Calls", "count": total_calls, "percentage": 100.0},
+        {"stage": "Offers Made", "count": offers_made, "percentage": round((offers_made / total_calls * 100) if total_calls > 0 else 0, 1)},
+        {"stage": "Counter Offers", "count": counter_offers, "percentage": round((counter_offers / total_calls * 100) if total_calls > 0 else 0, 1)},
+        {"stage": "Successful", "count": successful, "percentage": round((successful / total_calls * 100) if total_calls > 0 else 0, 1)}
+    ]
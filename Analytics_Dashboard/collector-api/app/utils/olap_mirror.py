@@ -0,0 +1,261 @@
+"""Optional DuckDB mirror of call_events for OLAP-shaped aggregate queries
+
+A background tailer copies new call_events rows (and the lane / equipment
+dimensions) from Postgres into an embedded DuckDB database, keyed on the
+monotonic id. Rows whose transaction committed after a higher id was already
+copied are picked up by re-reading the last OLAP_MIRROR_SETTLE_SECONDS of
+created_at, and re-read rows replace their mirrored copies. Each sync records
+the call_events data version it started from. With AGGREGATE_ENGINE=duckdb,
+functions wrapped in olap_routed run on the mirror only while it has copied
+everything up to the version the request's session sees (so the body matches
+the ETag computed from that version); otherwise they stay on Postgres. Queries
+read the all_call_events view, which adds the cold Parquet archive (if any) to
+the mirrored hot rows. Requires the duckdb package (pip install duckdb).
+"""
+from functools import wraps
+from threading import Lock
+from typing import Callable
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import text, Integer, SmallInteger, BigInteger, Numeric, Float, Date, DateTime, Boolean
+from sqlalchemy.orm import Session
+from ..models import CallEvent, Lane, EquipmentType
+from .cold_archive import cold_archive
+from .data_version import data_versions, CALL_EVENTS
+
+logger = logging.getLogger(__name__)
+
+# DuckDB file ("{pid}" is replaced so each worker gets its own) or ":memory:"; empty disables the mirror
+OLAP_MIRROR_PATH = os.getenv("OLAP_MIRROR_PATH", "")
+# "postgres" (default) or "duckdb" to run the aggregates on the mirror
+AGGREGATE_ENGINE = os.getenv("AGGREGATE_ENGINE", "postgres")
+OLAP_MIRROR_SYNC_SECONDS = float(os.getenv("OLAP_MIRROR_SYNC_SECONDS", "5"))
+OLAP_MIRROR_BATCH_ROWS = int(os.getenv("OLAP_MIRROR_BATCH_ROWS", "100000"))
+OLAP_MIRROR_SETTLE_SECONDS = int(os.getenv("OLAP_MIRROR_SETTLE_SECONDS", "60"))
+
+# Mirrored tables; call_events is tailed, the small dimension tables are recopied when they grow
+TAILED_TABLE = CallEvent.__table__
+DIMENSION_TABLES = [Lane.__table__, EquipmentType.__table__]
+
+def _duckdb_type(column) -> str:
+    column_type = column.type
+    if isinstance(column_type, (Integer, SmallInteger)) and not isinstance(column_type, BigInteger):
+        return "INTEGER"
+    if isinstance(column_type, BigInteger):
+        return "BIGINT"
+    # Columnar copies of rates and KPIs are plain doubles
+    if isinstance(column_type, (Numeric, Float)):
+        return "DOUBLE"
+    if isinstance(column_type, DateTime):
+        return "TIMESTAMP"
+    if isinstance(column_type, Date):
+        return "DATE"
+    if isinstance(column_type, Boolean):
+        return "BOOLEAN"
+    return "VARCHAR"
+
+def create_table_sql(table) -> str:
+    columns = [
+        f"{column.name} {_duckdb_type(column)}{' PRIMARY KEY' if column.primary_key else ''}"
+        for column in table.columns
+    ]
+    return f"CREATE TABLE IF NOT EXISTS {table.name} ({', '.join(columns)})"
+
+def _primary_key(table) -> str:
+    return list(table.primary_key.columns)[0].name
+
+class OlapMirror:
+    """DuckDB copy of call_events and its dimensions, plus the routing switch"""
+
+    def __init__(self, path: str = OLAP_MIRROR_PATH, engine_name: str = AGGREGATE_ENGINE):
+        self.path = path.replace("{pid}", str(os.getpid()))
+        self.engine_name = engine_name
+        self._connection = None
+        self._archive_version = object()
+        self._lock = Lock()
+        self.caught_up = False
+        # call_events data version of the last finished sync
+        self.synced_version = None
+        self.rows = 0
+        self.syncs = 0
+        self.last_sync_seconds = None
+        self.last_synced_at = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def serving(self) -> bool:
+        """Whether routed aggregates should run on the mirror right now"""
+        return self.engine_name == "duckdb" and self.enabled and self.caught_up
+
+    def current(self, db: Session) -> bool:
+        """Whether the mirror holds every call committed up to the data version db sees"""
+        if self.synced_version is None:
+            return False
+        return data_versions(db, [CALL_EVENTS])[CALL_EVENTS] <= self.synced_version
+
+    def _connect(self):
+        if self._connection is None:
+            import duckdb
+            connection = duckdb.connect(self.path)
+            for table in [TAILED_TABLE] + DIMENSION_TABLES:
+                connection.execute(create_table_sql(table))
+            self._refresh_archive(connection)
+            self._connection = connection
+        return self._connection
+
+    def _refresh_archive(self, connection):
+        """Point all_call_events at the current archive parts and drop mirrored rows they now hold"""
+        version = cold_archive.version() if cold_archive.enabled else None
+        if version == self._archive_version:
+            return
+        columns = ", ".join(column.name for column in TAILED_TABLE.columns)
+        files = cold_archive.parquet_files() if cold_archive.enabled else []
+        if files:
+            parquet = f"read_parquet([{', '.join(repr(path) for path in files)}])"
+            # Rows archived after the tailer copied them are in both places
+            connection.execute(f"DELETE FROM {TAILED_TABLE.name} WHERE id IN (SELECT id FROM {parquet})")
+            connection.execute(
+                f"CREATE OR REPLACE VIEW all_call_events AS "
+                f"SELECT {columns} FROM {TAILED_TABLE.name} UNION ALL SELECT {columns} FROM {parquet}"
+            )
+        else:
+            connection.execute(f"CREATE OR REPLACE VIEW all_call_events AS SELECT {columns} FROM {TAILED_TABLE.name}")
+        self._archive_version = version
+
+    def cursor(self):
+        """A DuckDB cursor for the calling thread (close it when done)"""
+        return self._connect().cursor()
+
+    def _insert(self, connection, table, rows) -> int:
+        import pandas as pd
+
+        frame = pd.DataFrame.from_records(rows, columns=[column.name for column in table.columns])
+        for column in table.columns:
+            duckdb_type = _duckdb_type(column)
+            if duckdb_type in ("INTEGER", "BIGINT"):
+                frame[column.name] = pd.to_numeric(frame[column.name]).astype("Int64")
+            elif duckdb_type == "DOUBLE":
+                frame[column.name] = pd.to_numeric(frame[column.name]).astype("float64")
+            elif duckdb_type in ("DATE", "TIMESTAMP"):
+                frame[column.name] = pd.to_datetime(frame[column.name])
+        before = connection.execute(f"SELECT count(*) FROM {table.name}").fetchone()[0]
+        connection.register("mirror_batch", frame)
+        try:
+            # Rows read again (the settle window) replace their copies, picking up updates
+            connection.execute(f"INSERT OR REPLACE INTO {table.name} SELECT * FROM mirror_batch")
+        finally:
+            connection.unregister("mirror_batch")
+        return connection.execute(f"SELECT count(*) FROM {table.name}").fetchone()[0] - before
+
+    def _sync_dimensions(self, db: Session, connection):
+        for table in DIMENSION_TABLES:
+            mirrored = connection.execute(f"SELECT count(*) FROM {table.name}").fetchone()[0]
+            if db.execute(text(f"SELECT count(*) FROM {table.name}")).scalar() != mirrored:
+                rows = db.execute(text(f"SELECT * FROM {table.name}")).fetchall()
+                self._insert(connection, table, rows)
+
+    def sync(self, db: Session) -> int:
+        """Copy call_events rows the mirror hasn't seen yet; returns the number of new rows"""
+        with self._lock:
+            started = time.monotonic()
+            connection = self._connect()
+            table = TAILED_TABLE
+            key = _primary_key(table)
+            columns = ", ".join(column.name for column in table.columns)
+            inserted = 0
+            # Read first: every call behind this version has committed, so the reads below see it
+            version = data_versions(db, [CALL_EVENTS])[CALL_EVENTS]
+
+            self._sync_dimensions(db, connection)
+            self._refresh_archive(connection)
+
+            last_id = connection.execute(f"SELECT coalesce(max({key}), 0) FROM {table.name}").fetchone()[0]
+            while True:
+                rows = db.execute(
+                    text(f"SELECT {columns} FROM {table.name} WHERE {key} > :last_id ORDER BY {key} LIMIT :batch"),
+                    {"last_id": last_id, "batch": OLAP_MIRROR_BATCH_ROWS}
+                ).fetchall()
+                if rows:
+                    inserted += self._insert(connection, table, rows)
+                    last_id = rows[-1][0]
+                if len(rows) < OLAP_MIRROR_BATCH_ROWS:
+                    break
+
+            # Rows from transactions that committed after a higher id was copied
+            late = db.execute(
+                text(
+                    f"SELECT {columns} FROM {table.name} "
+                    f"WHERE created_at >= now() - :settle * interval '1 second' AND {key} <= :last_id"
+                ),
+                {"settle": OLAP_MIRROR_SETTLE_SECONDS, "last_id": last_id}
+            ).fetchall()
+            if late:
+                inserted += self._insert(connection, table, late)
+
+            self.rows = connection.execute(f"SELECT count(*) FROM {table.name}").fetchone()[0]
+            self.caught_up = True
+            self.synced_version = version
+            self.syncs += 1
+            self.last_sync_seconds = round(time.monotonic() - started, 3)
+            self.last_synced_at = time.time()
+        return inserted
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "engine": self.engine_name,
+            "serving": self.serving(),
+            "synced_version": self.synced_version,
+            "rows": self.rows,
+            "syncs": self.syncs,
+            "last_sync_seconds": self.last_sync_seconds,
+            "lag_seconds": round(time.time() - self.last_synced_at, 1) if self.last_synced_at else None,
+        }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                self._archive_version = object()
+                self.caught_up = False
+                self.synced_version = None
+
+olap_mirror = OlapMirror()
+
+def olap_routed(olap_fn: Callable):
+    """Run `olap_fn(mirror, *args, **kwargs)` instead of the wrapped `fn(db, ...)` while the mirror is serving
+
+    and has synced up to db's data version. Apply beneath @cached / @coalesced
+    so mirror results are cached the same way.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(db: Session, *args, **kwargs):
+            if olap_mirror.serving() and olap_mirror.current(db):
+                return olap_fn(olap_mirror, *args, **kwargs)
+            return fn(db, *args, **kwargs)
+        return wrapper
+    return decorator
+
+async def run_tailer(session_factory: Callable[[], Session], run_db: Callable):
+    """Keep the mirror in sync until cancelled"""
+    def sync_once():
+        db = session_factory()
+        try:
+            return olap_mirror.sync(db)
+        finally:
+            db.close()
+
+    while True:
+        try:
+            await run_db(sync_once)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Failed to sync the OLAP mirror")
+        await asyncio.sleep(OLAP_MIRROR_SYNC_SECONDS)
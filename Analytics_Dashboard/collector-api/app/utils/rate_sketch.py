@@ -0,0 +1,222 @@
+"""Mergeable quantile sketches of agreed rate per mile (DDSketch)
+
+Each value v > 0 is counted in bucket ceil(log_gamma(v)), gamma = (1 + a) / (1 - a),
+so any quantile read back is within relative accuracy a of the true value.
+A sketch is just its bucket counts: adding an event is a single counter upsert,
+and sketches merge by summing counts per bucket (plain GROUP BY in SQL).
+
+Two scopes are kept in rate_sketch_buckets:
+    lane_equipment  (lane, equipment_type), carrier_id = 0
+    carrier_lane    (carrier_id, lane),     equipment_type = ''
+"""
+import math
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import text, func
+from ..models import CallEvent, RateSketchBucket
+
+RELATIVE_ACCURACY = float(os.getenv("RATE_SKETCH_ACCURACY", "0.01"))
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+LOG_GAMMA = math.log(GAMMA)
+
+LANE_EQUIPMENT = "lane_equipment"
+CARRIER_LANE = "carrier_lane"
+
+# Fewer samples than this and a carrier's own sketch is not trusted over the lane's
+MIN_CARRIER_SAMPLES = int(os.getenv("RATE_SKETCH_MIN_CARRIER_SAMPLES", "5"))
+
+DEFAULT_QUANTILES = (0.1, 0.5, 0.9)
+
+# Rate per mile of a call event, or NULL when there is no agreed rate
+RPM_SQL = "final_rate_agreed / nullif(miles, 0)"
+BUCKET_SQL = f"ceil(ln({RPM_SQL}) / CAST(:log_gamma AS float))::int"
+
+UPSERT_BUCKET_SQL = """
+INSERT INTO rate_sketch_buckets AS b (scope, lane, equipment_type, carrier_id, bucket, count)
+VALUES
+    ('lane_equipment', :lane, :equipment_type, 0, :bucket, 1),
+    ('carrier_lane', :lane, '', :carrier_id, :bucket, 1)
+ON CONFLICT (scope, lane, equipment_type, carrier_id, bucket) DO UPDATE SET
+    count = b.count + 1
+"""
+
+# Rebuild statements used by utils/rollups.py; {carrier_filter} limits the rebuild
+# to the given carriers' carrier_lane sketches and the lane_equipment sketches they touch.
+DELETE_SKETCHES_SQL = """
+DELETE FROM rate_sketch_buckets b
+USING (
+    SELECT DISTINCT carrier_id, lane, equipment_type
+    FROM call_events
+    WHERE carrier_id IS NOT NULL {carrier_filter}
+) k
+WHERE (b.scope = 'carrier_lane' AND b.carrier_id = k.carrier_id AND b.lane = k.lane)
+   OR (b.scope = 'lane_equipment' AND b.lane = k.lane AND b.equipment_type = k.equipment_type)
+"""
+
+# Archived buckets of the refreshed sketches (utils/cold_archive.py) are passed as
+# :archived_lane_rate_buckets and :archived_rate_buckets and added back in.
+REBUILD_SKETCHES_SQL = f"""
+WITH touched AS (
+    SELECT DISTINCT lane, equipment_type
+    FROM call_events
+    WHERE carrier_id IS NOT NULL {{carrier_filter}}
+),
+touched_carriers AS (
+    SELECT DISTINCT carrier_id, lane
+    FROM call_events
+    WHERE carrier_id IS NOT NULL {{carrier_filter}}
+),
+rated AS (
+    -- Every event of the refreshed carriers is on a touched lane, so this covers both scopes
+    SELECT e.carrier_id, e.lane, e.equipment_type, {BUCKET_SQL} AS bucket
+    FROM call_events e
+    JOIN touched t ON t.lane = e.lane AND t.equipment_type = e.equipment_type
+    WHERE e.final_rate_agreed > 0 AND e.miles > 0
+),
+lane_buckets AS (
+    SELECT lane, equipment_type, bucket, count(*) AS count
+    FROM rated
+    GROUP BY lane, equipment_type, bucket
+    UNION ALL
+    SELECT lane, equipment_type, bucket, count
+    FROM jsonb_to_recordset(CAST(:archived_lane_rate_buckets AS jsonb)) AS a(lane text, equipment_type text, bucket int, count bigint)
+),
+carrier_buckets AS (
+    SELECT carrier_id, lane, bucket, count(*) AS count
+    FROM rated
+    WHERE carrier_id IS NOT NULL {{carrier_filter}}
+    GROUP BY carrier_id, lane, bucket
+    UNION ALL
+    SELECT a.carrier_id, a.lane, a.bucket, a.count
+    FROM jsonb_to_recordset(CAST(:archived_rate_buckets AS jsonb)) AS a(carrier_id int, lane text, bucket int, count bigint)
+    JOIN touched_carriers k ON k.carrier_id = a.carrier_id AND k.lane = a.lane
+)
+INSERT INTO rate_sketch_buckets (scope, lane, equipment_type, carrier_id, bucket, count)
+SELECT 'lane_equipment', lane, equipment_type, 0, bucket, sum(count)
+FROM lane_buckets
+GROUP BY lane, equipment_type, bucket
+UNION ALL
+SELECT 'carrier_lane', lane, '', carrier_id, bucket, sum(count)
+FROM carrier_buckets
+GROUP BY carrier_id, lane, bucket
+ON CONFLICT (scope, lane, equipment_type, carrier_id, bucket) DO UPDATE SET
+    count = EXCLUDED.count
+"""
+
+def bucket_index(value: float) -> int:
+    return int(math.ceil(math.log(value) / LOG_GAMMA))
+
+def bucket_value(index: int) -> float:
+    """Representative value of a bucket (within RELATIVE_ACCURACY of anything in it)"""
+    return 2 * GAMMA ** index / (GAMMA + 1)
+
+def event_rpm(event: CallEvent) -> Optional[float]:
+    if not event.final_rate_agreed or not event.miles or event.final_rate_agreed <= 0 or event.miles <= 0:
+        return None
+    return float(event.final_rate_agreed) / event.miles
+
+def record_rate(db: Session, carrier_id: int, event: CallEvent):
+    """Add the event's agreed rate per mile to its lane and carrier sketches
+
+    Runs in the caller's transaction so the sketches commit together with the event.
+    """
+    rpm = event_rpm(event)
+    if rpm is None:
+        return
+    db.execute(text(UPSERT_BUCKET_SQL), {
+        "lane": event.lane,
+        "equipment_type": event.equipment_type,
+        "carrier_id": carrier_id,
+        "bucket": bucket_index(rpm),
+    })
+
+def quantiles(buckets: Iterable[Tuple[int, int]], qs: Sequence[float] = DEFAULT_QUANTILES) -> Optional[Dict[str, float]]:
+    """Quantiles from (bucket, count) pairs; buckets may repeat (merged sketches)"""
+    counts: Dict[int, int] = {}
+    for bucket, count in buckets:
+        counts[bucket] = counts.get(bucket, 0) + int(count)
+    total = sum(counts.values())
+    if not total:
+        return None
+
+    ordered = sorted(counts.items())
+    result = {"count": total}
+    for q in qs:
+        rank = q * (total - 1)
+        seen = 0
+        for bucket, count in ordered:
+            seen += count
+            if seen > rank:
+                result[f"p{round(q * 100):d}"] = round(bucket_value(bucket), 4)
+                break
+    return result
+
+def _bucket_counts(db: Session, filters: list, group_by: list = ()):
+    return db.query(
+        *group_by,
+        RateSketchBucket.bucket,
+        func.sum(RateSketchBucket.count)
+    ).filter(
+        *filters
+    ).group_by(
+        *group_by, RateSketchBucket.bucket
+    ).all()
+
+def lane_rate_quantiles(
+    db: Session,
+    lane: Optional[str] = None,
+    equipment_type: Optional[str] = None,
+    qs: Sequence[float] = DEFAULT_QUANTILES,
+    by_equipment: bool = True,
+) -> List[Dict]:
+    """Rate-per-mile quantiles per lane x equipment matching the filters
+
+    With by_equipment=False (and no equipment_type) each lane's sketches are
+    merged across equipment types.
+    """
+
+    filters = [RateSketchBucket.scope == LANE_EQUIPMENT]
+    group_by = []
+    if lane is not None:
+        filters.append(RateSketchBucket.lane == lane)
+    else:
+        group_by.append(RateSketchBucket.lane)
+    if equipment_type is not None:
+        filters.append(RateSketchBucket.equipment_type == equipment_type)
+    elif by_equipment:
+        group_by.append(RateSketchBucket.equipment_type)
+
+    sketches: Dict[tuple, List[Tuple[int, int]]] = {}
+    for row in _bucket_counts(db, filters, group_by):
+        key = tuple(row[:len(group_by)])
+        sketches.setdefault(key, []).append((row[-2], row[-1]))
+
+    result = []
+    for key, buckets in sketches.items():
+        values = dict(zip([column.key for column in group_by], key))
+        entry = {"lane": values.get("lane", lane), "equipment_type": values.get("equipment_type", equipment_type)}
+        entry.update(quantiles(buckets, qs))
+        result.append(entry)
+    result.sort(key=lambda entry: entry["count"], reverse=True)
+    return result
+
+def carrier_lane_rate_quantiles(
+    db: Session,
+    lane: str,
+    carrier_ids: Iterable[int],
+    qs: Sequence[float] = DEFAULT_QUANTILES,
+) -> Dict[int, Dict[str, float]]:
+    """Rate-per-mile quantiles for each carrier's own history on a lane"""
+
+    carrier_ids = list(carrier_ids)
+    if not carrier_ids:
+        return {}
+    sketches: Dict[int, List[Tuple[int, int]]] = {}
+    for carrier_id, bucket, count in _bucket_counts(db, [
+        RateSketchBucket.scope == CARRIER_LANE,
+        RateSketchBucket.lane == lane,
+        RateSketchBucket.carrier_id.in_(carrier_ids),
+    ], [RateSketchBucket.carrier_id]):
+        sketches.setdefault(carrier_id, []).append((bucket, count))
+    return {carrier_id: quantiles(buckets, qs) for carrier_id, buckets in sketches.items()}
@@ -0,0 +1,285 @@
+"""Two-tier cache for aggregation results
+
+Tier 1 is a per-process LRU; tier 2 is an optional shared store speaking the
+Redis protocol (REDIS_URL, requires the redis package). Keys combine the
+function, its normalized arguments and the data version watermark, so every
+ingest commit (which bumps the watermark) moves readers to fresh keys and old
+entries simply age out. Concurrent misses for the same key are coalesced: one
+caller computes, the others wait for its result.
+
+While a change listener (cache_invalidation) is connected, local entries are
+keyed without the watermark and instead dropped when a change notification
+says they are affected, so hits skip the version lookup. A result is only
+stored that way if the versions it reflects (those the session had seen when
+computing it, or those in its shared-tier key) include every version
+announced so far; one read from a lagging replica is returned but not kept.
+"""
+from collections import OrderedDict
+from functools import wraps
+from threading import Lock
+from typing import Any, Callable, Iterable, Optional
+from functools import partial
+import logging
+import os
+import time
+from pydantic import TypeAdapter
+from sqlalchemy.orm import Session
+from .data_version import data_versions
+from .single_flight import single_flight, normalize_args
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "512"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "300"))
+REDIS_URL = os.getenv("REDIS_URL")
+# Longest a worker waits for another worker's computation of the same key
+SHARED_LOCK_SECONDS = float(os.getenv("RESULT_CACHE_LOCK_SECONDS", "10"))
+
+def _shared_client():
+    if not REDIS_URL:
+        return None
+    try:
+        import redis
+    except ImportError:
+        logger.warning("REDIS_URL is set but the redis package is not installed; using the in-process cache only")
+        return None
+    return redis.Redis.from_url(REDIS_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+class ResultCache:
+    """In-process LRU in front of an optional shared Redis-protocol store"""
+
+    def __init__(self, max_size: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL, shared=None, shared_factory=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._shared = shared
+        self._shared_factory = shared_factory
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        # Set while a listener applies change notifications to this cache
+        self.notified = False
+        # Highest version of each domain announced to the listener
+        self.notified_versions = {}
+        self.invalidations = 0
+        self.invalidated = 0
+        self.stale = 0
+
+    @property
+    def shared(self):
+        # Import redis and connect on first use rather than at app import
+        if self._shared_factory is not None:
+            self._shared, self._shared_factory = self._shared_factory(), None
+        return self._shared
+
+    def _get_local(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires = entry[0]
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_local(self, key: str, value: Any, depends: Optional[Callable[[dict], bool]] = None, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self.invalidations:
+                # A change arrived while this was computed; the value may predate it
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value, depends)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def _get_shared(self, key: str) -> Optional[bytes]:
+        if self.shared is None:
+            return None
+        try:
+            return self.shared.get(key)
+        except Exception:
+            logger.warning("Shared result cache unavailable", exc_info=True)
+            return None
+
+    def _put_shared(self, key: str, payload: bytes):
+        if self.shared is None:
+            return
+        try:
+            self.shared.set(key, payload, px=int(self.ttl * 1000))
+        except Exception:
+            logger.warning("Shared result cache unavailable", exc_info=True)
+
+    def _wait_for_shared(self, key: str) -> Optional[bytes]:
+        """If another worker holds the computation lock for key, wait for its result"""
+        if self.shared is None:
+            return None
+        lock_key = f"{key}:lock"
+        try:
+            if self.shared.set(lock_key, b"1", nx=True, px=int(SHARED_LOCK_SECONDS * 1000)):
+                return None
+            deadline = time.monotonic() + SHARED_LOCK_SECONDS
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                payload = self.shared.get(key)
+                if payload is not None:
+                    return payload
+                if not self.shared.exists(lock_key):
+                    return None
+        except Exception:
+            logger.warning("Shared result cache unavailable", exc_info=True)
+        return None
+
+    def _release_shared(self, key: str):
+        if self.shared is None:
+            return
+        try:
+            self.shared.delete(f"{key}:lock")
+        except Exception:
+            pass
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        adapter: TypeAdapter,
+        name: str = "default",
+        depends: Optional[Callable[[dict], bool]] = None,
+        shared_key: Optional[Callable[[], str]] = None,
+        fresh: Optional[Callable[[], bool]] = None
+    ):
+        """Cached value for key, computing it on a miss
+
+        depends(change) tells whether a change notification affects the entry
+        (None: every change does); shared_key builds the key used in the shared
+        tier when it differs from key; fresh(), called after compute, tells
+        whether the computed value may be stored locally.
+        """
+        entry = self._get_local(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+        # Concurrent misses in this process share one lookup / computation
+        return single_flight.do(key, lambda: self._fill(key, compute, adapter, depends, shared_key, fresh), name)
+
+    def _fill(self, key: str, compute: Callable[[], Any], adapter: TypeAdapter, depends=None, shared_key=None, fresh=None):
+        entry = self._get_local(key)
+        if entry is not None:
+            self.hits += 1
+            return entry[1]
+
+        generation = self.invalidations
+        remote_key = shared_key() if shared_key is not None and self.shared is not None else key
+        payload = self._get_shared(remote_key)
+        if payload is None:
+            payload = self._wait_for_shared(remote_key)
+        if payload is not None:
+            self.shared_hits += 1
+            value = adapter.validate_json(payload)
+        else:
+            self.misses += 1
+            try:
+                value = compute()
+                if self.shared is not None:
+                    self._put_shared(remote_key, adapter.dump_json(value))
+            finally:
+                self._release_shared(remote_key)
+        # A shared entry is as old as the versions in its key, so it gets the same check
+        if fresh is not None and not fresh():
+            self.stale += 1
+            return value
+        self._put_local(key, value, depends, generation)
+        return value
+
+    def note_versions(self, versions: dict):
+        """Record versions announced by a change notification"""
+        with self._lock:
+            for domain, version in versions.items():
+                self.notified_versions[domain] = max(self.notified_versions.get(domain, 0), version)
+
+    def is_current(self, versions: dict) -> bool:
+        """Whether data at these versions includes every change announced so far"""
+        return all(version >= self.notified_versions.get(domain, 0) for domain, version in versions.items())
+
+    def invalidate(self, change: dict) -> int:
+        """Drop the local entries a change notification affects; returns how many"""
+        with self._lock:
+            self.invalidations += 1
+            stale = [
+                key for key, (_, _, depends) in self._entries.items()
+                if depends is None or depends(change)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidated += len(stale)
+            return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += 1
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "stale": self.stale,
+            "shared": self._shared is not None,
+        }
+
+result_cache = ResultCache(shared_factory=_shared_client)
+
+def _affected(domains: list, affected_by: Optional[Callable], args: tuple, kwargs: dict, change: dict) -> bool:
+    if not set(change.get("domains", domains)) & set(domains):
+        return False
+    touched = change.get("touched")
+    if touched is None or affected_by is None:
+        return True
+    return affected_by(touched, *args, **kwargs)
+
+def cached(name: str, return_type, domains: Iterable[str], affected_by: Optional[Callable[..., bool]] = None):
+    """Cache an aggregation `fn(db, *args, **kwargs)` keyed on its arguments and data version
+
+    The result is (de)serialized for the shared tier with a TypeAdapter of return_type;
+    cached values are shared between callers and must not be mutated. Changes to the
+    domains invalidate the entry; affected_by(touched, *args, **kwargs) narrows that
+    to the ingested calls (see bump_data_version) that can change this result.
+    """
+    adapter = TypeAdapter(return_type)
+    domains = list(domains)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(db: Session, *args, **kwargs):
+            arguments = normalize_args(*args, **kwargs)
+            depends = partial(_affected, domains, affected_by, args, kwargs)
+
+            def versioned_key(seen: Optional[dict] = None) -> str:
+                versions = data_versions(db, domains)
+                if seen is not None:
+                    # A shared entry under this key reflects exactly these versions
+                    seen.update(versions)
+                token = ".".join(f"{domain}:{versions[domain]}" for domain in sorted(versions))
+                return f"agg:{name}:{token}:{arguments}"
+
+            if result_cache.notified:
+                # Kept current by change notifications; only the shared tier needs the watermark
+                seen = {}
+
+                def compute():
+                    # Read before computing: the result reflects at least these versions
+                    seen.update(data_versions(db, domains))
+                    return fn(db, *args, **kwargs)
+
+                return result_cache.get_or_compute(
+                    f"agg:{name}:{arguments}", compute, adapter, name, depends, partial(versioned_key, seen),
+                    fresh=lambda: result_cache.is_current(seen)
+                )
+            return result_cache.get_or_compute(versioned_key(), lambda: fn(db, *args, **kwargs), adapter, name, depends)
+        return wrapper
+    return decorator
@@ -0,0 +1,353 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Optional, Iterable
+import json
+import os
+from .carrier_stats import DECAY_HALF_LIFE_DAYS
+from .rate_sketch import DELETE_SKETCHES_SQL, REBUILD_SKETCHES_SQL, LOG_GAMMA
+from .distinct_sketch import DELETE_REGISTERS_SQL, REBUILD_REGISTERS_SQL
+from .cold_archive import cold_archive, CARRIER_SUMS, sums_sql, archived_sql
+
+# Advisory lock keys (namespace, key) serialize rollup work per carrier: key is the
+# carrier_id, ALL_CARRIERS guards refreshes that cover every carrier and
+# SHARED_SKETCHES the lane-level sketches and day-level registers, which span carriers
+ROLLUP_LOCK_NAMESPACE = int.from_bytes(b"roll", "big")
+ALL_CARRIERS = 0
+SHARED_SKETCHES = -1
+# Range refreshes (the parallel rebuild) lock blocks of ROLLUP_LOCK_RANGE carrier ids in their own namespace
+ROLLUP_RANGE_LOCK_NAMESPACE = int.from_bytes(b"rolr", "big")
+ROLLUP_LOCK_RANGE = int(os.getenv("ROLLUP_LOCK_RANGE", "1000"))
+# More carriers than this in one refresh take the all-carriers lock instead of one lock each
+# (advisory locks share the server's lock table, sized by max_locks_per_transaction)
+ROLLUP_LOCK_MAX_KEYS = int(os.getenv("ROLLUP_LOCK_MAX_KEYS", "64"))
+
+def _advisory_lock(db: Session, namespace: int, key: int, shared: bool = False):
+    function = "pg_advisory_xact_lock_shared" if shared else "pg_advisory_xact_lock"
+    db.execute(text(f"SELECT {function}(:namespace, :key)"), {"namespace": namespace, "key": key})
+
+def lock_carriers(db: Session, carrier_ids: Optional[Iterable[int]] = None):
+    """Hold the rollup locks of these carriers (all carriers by default) until db's transaction ends
+
+    Rollups for different carriers run in parallel; rollups for one carrier
+    (from any worker or process) are applied one after another, each reading
+    the events committed before it.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    carrier_ids = sorted(set(carrier_ids)) if carrier_ids is not None else None
+    if carrier_ids is None or len(carrier_ids) > ROLLUP_LOCK_MAX_KEYS:
+        _advisory_lock(db, ROLLUP_LOCK_NAMESPACE, ALL_CARRIERS)
+        return
+
+    # Always in the same order (all, ranges, carriers by id), so concurrent refreshes can't deadlock
+    _advisory_lock(db, ROLLUP_LOCK_NAMESPACE, ALL_CARRIERS, shared=True)
+    for block in sorted({carrier_id // ROLLUP_LOCK_RANGE for carrier_id in carrier_ids}):
+        _advisory_lock(db, ROLLUP_RANGE_LOCK_NAMESPACE, block, shared=True)
+    for carrier_id in carrier_ids:
+        _advisory_lock(db, ROLLUP_LOCK_NAMESPACE, carrier_id)
+
+def lock_carrier_range(db: Session, first_carrier_id: int, last_carrier_id: int):
+    """Hold the rollup locks of every carrier id in [first, last] until db's transaction ends"""
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    _advisory_lock(db, ROLLUP_LOCK_NAMESPACE, ALL_CARRIERS, shared=True)
+    for block in range(first_carrier_id // ROLLUP_LOCK_RANGE, last_carrier_id // ROLLUP_LOCK_RANGE + 1):
+        _advisory_lock(db, ROLLUP_RANGE_LOCK_NAMESPACE, block)
+
+def lock_shared_sketches(db: Session, shared: bool = False):
+    """Hold the lock on the lane-level rate sketches and distinct-count registers until db's transaction ends
+
+    Ingest's incremental upserts commute, so they take it shared; rebuilds take it exclusive.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    _advisory_lock(db, ROLLUP_LOCK_NAMESPACE, SHARED_SKETCHES, shared=shared)
+
+# Set-based equivalents of the per-carrier rollups in routes/ingest.py.
+# Averages skip NULL/zero values, matching the Python implementation. Each
+# rollup adds the carrier's archived sums (utils/cold_archive.py, passed as
+# :archived_<grouping>) to the sums over the hot table, so carriers keep the
+# history of archived months.
+
+def _merged_sums(name: str) -> str:
+    """Hot plus archived sums of a CARRIER_SUMS grouping, per key"""
+    grouping = CARRIER_SUMS[name]
+    keys = [key for key, _, _ in grouping["keys"]]
+    sums = [f"max({column}) AS {column}" if column == "last_call" else f"sum({column}) AS {column}"
+            for column, _, _ in grouping["sums"]]
+    hot = sums_sql(grouping, "call_events", "carrier_id IS NOT NULL {carrier_filter}")
+    return (f"SELECT {', '.join(keys + sums)} FROM ({hot} UNION ALL {archived_sql(grouping, 'archived_' + name)}) parts "
+            f"GROUP BY {', '.join(keys)}")
+
+def _average(name: str) -> str:
+    return f"coalesce(s.{name}_sum / nullif(s.{name}_n, 0), 0)"
+
+CARRIER_ROLLUP_SQL = f"""
+UPDATE carriers c SET
+    total_calls = s.calls,
+    successful_calls = s.successful,
+    success_rate = 100.0 * s.successful / s.calls,
+    avg_rpm = {_average("rpm")},
+    avg_negotiation_rounds = {_average("rounds")},
+    avg_rate_variance_pct = {_average("variance")},
+    avg_call_duration_seconds = trunc({_average("duration")})::int,
+    avg_objections = trunc({_average("objections")})::int,
+    avg_positive_words = trunc({_average("positive_words")})::int,
+    avg_negative_words = trunc({_average("negative_words")})::int,
+    total_loads_shown = s.loads_sum,
+    avg_loads_per_call = s.loads_sum / nullif(s.loads_n, 0),
+    positive_sentiment_calls = s.positive,
+    negative_sentiment_calls = s.negative,
+    neutral_sentiment_calls = s.neutral,
+    unknown_sentiment_calls = s.unknown,
+    last_call_date = s.last_call,
+    updated_at = now()
+FROM ({_merged_sums("totals")}) s
+WHERE c.carrier_id = s.carrier_id
+"""
+
+EQUIPMENT_ROLLUP_SQL = f"""
+WITH s AS ({_merged_sums("equipment")}),
+updated AS (
+    UPDATE carrier_equipment e SET
+        call_count = s.calls,
+        success_count = s.successful,
+        success_rate = 100.0 * s.successful / s.calls
+    FROM s
+    WHERE e.carrier_id = s.carrier_id AND e.equipment_type = s.equipment_type
+    RETURNING e.carrier_id, e.equipment_type
+)
+INSERT INTO carrier_equipment (carrier_id, equipment_type, call_count, success_count, success_rate)
+SELECT s.carrier_id, s.equipment_type, s.calls, s.successful, 100.0 * s.successful / s.calls
+FROM s
+WHERE NOT EXISTS (
+    SELECT 1 FROM updated u
+    WHERE u.carrier_id = s.carrier_id AND u.equipment_type = s.equipment_type
+)
+"""
+
+LANE_ROLLUP_SQL = f"""
+WITH s AS (
+    SELECT m.*, d.lane_id, d.miles
+    FROM ({_merged_sums("lanes")}) m
+    LEFT JOIN (
+        SELECT carrier_id, lane, max(lane_id) AS lane_id, (array_agg(miles ORDER BY id))[1] AS miles
+        FROM call_events
+        WHERE carrier_id IS NOT NULL {{carrier_filter}}
+        GROUP BY carrier_id, lane
+    ) d ON d.carrier_id = m.carrier_id AND d.lane = m.lane
+),
+updated AS (
+    UPDATE carrier_lanes l SET
+        total_calls = s.calls,
+        successful_calls = s.successful,
+        success_rate = 100.0 * s.successful / s.calls,
+        avg_rpm = {_average("final")},
+        avg_loadboard_rate = {_average("loadboard")},
+        avg_final_rate = {_average("final")} * coalesce(s.miles, l.miles, 0),
+        last_call_date = s.last_call,
+        lane_id = coalesce(l.lane_id, s.lane_id)
+    FROM s
+    WHERE l.carrier_id = s.carrier_id AND l.lane = s.lane
+    RETURNING l.carrier_id, l.lane
+)
+INSERT INTO carrier_lanes (
+    carrier_id, lane, lane_id, miles, total_calls, successful_calls, success_rate,
+    avg_rpm, avg_loadboard_rate, avg_final_rate, last_call_date
+)
+SELECT
+    s.carrier_id, s.lane, s.lane_id, s.miles, s.calls, s.successful,
+    100.0 * s.successful / s.calls,
+    {_average("final")}, {_average("loadboard")}, {_average("final")} * coalesce(s.miles, 0), s.last_call
+FROM s
+WHERE NOT EXISTS (
+    SELECT 1 FROM updated u
+    WHERE u.carrier_id = s.carrier_id AND u.lane = s.lane
+)
+"""
+
+DAILY_STATS_ROLLUP_SQL = f"""
+INSERT INTO carrier_daily_stats (
+    carrier_id, stat_date, total_calls, successful_calls, rpm_sum, rpm_count, rounds_sum, rounds_count
+)
+SELECT carrier_id, call_date, calls, successful, rpm_sum, rpm_n, rounds_sum, rounds_n
+FROM ({_merged_sums("days")}) s
+ON CONFLICT (carrier_id, stat_date) DO UPDATE SET
+    total_calls = EXCLUDED.total_calls,
+    successful_calls = EXCLUDED.successful_calls,
+    rpm_sum = EXCLUDED.rpm_sum,
+    rpm_count = EXCLUDED.rpm_count,
+    rounds_sum = EXCLUDED.rounds_sum,
+    rounds_count = EXCLUDED.rounds_count
+"""
+
+DECAYED_STATS_ROLLUP_SQL = f"""
+WITH days AS ({_merged_sums("days")}),
+latest AS (
+    SELECT carrier_id, max(call_date) AS as_of
+    FROM days
+    GROUP BY carrier_id
+),
+weighted AS (
+    SELECT d.*, l.as_of, power(0.5, (l.as_of - d.call_date) / CAST(:half_life AS float)) AS w
+    FROM days d
+    JOIN latest l ON l.carrier_id = d.carrier_id
+)
+INSERT INTO carrier_decayed_stats (
+    carrier_id, calls, successful_calls, rpm_sum, rpm_weight, rounds_sum, rounds_weight, as_of
+)
+SELECT
+    carrier_id,
+    sum(w * calls),
+    sum(w * successful),
+    sum(w * rpm_sum),
+    sum(w * rpm_n),
+    sum(w * rounds_sum),
+    sum(w * rounds_n),
+    as_of
+FROM weighted
+GROUP BY carrier_id, as_of
+ON CONFLICT (carrier_id) DO UPDATE SET
+    calls = EXCLUDED.calls,
+    successful_calls = EXCLUDED.successful_calls,
+    rpm_sum = EXCLUDED.rpm_sum,
+    rpm_weight = EXCLUDED.rpm_weight,
+    rounds_sum = EXCLUDED.rounds_sum,
+    rounds_weight = EXCLUDED.rounds_weight,
+    as_of = EXCLUDED.as_of
+"""
+
+# A range rebuild also clears what no longer has events behind it (carriers whose
+# events were all deleted, lanes / equipment / days a carrier no longer has);
+# rebuilds refuse to run once months are archived, so events are the whole history
+PRUNE_RANGE_STATEMENTS = [
+    """
+    UPDATE carriers c SET
+        total_calls = 0, successful_calls = 0, success_rate = NULL, avg_rpm = NULL,
+        avg_negotiation_rounds = NULL, avg_rate_variance_pct = NULL, avg_call_duration_seconds = NULL,
+        avg_objections = NULL, avg_positive_words = NULL, avg_negative_words = NULL,
+        total_loads_shown = 0, avg_loads_per_call = NULL, positive_sentiment_calls = 0,
+        negative_sentiment_calls = 0, neutral_sentiment_calls = 0, unknown_sentiment_calls = 0,
+        last_call_date = NULL, updated_at = now()
+    WHERE c.carrier_id BETWEEN :first_carrier_id AND :last_carrier_id
+      AND (c.total_calls <> 0 OR c.last_call_date IS NOT NULL)
+      AND NOT EXISTS (SELECT 1 FROM call_events e WHERE e.carrier_id = c.carrier_id)
+    """,
+    """
+    DELETE FROM carrier_equipment x
+    WHERE x.carrier_id BETWEEN :first_carrier_id AND :last_carrier_id
+      AND NOT EXISTS (SELECT 1 FROM call_events e WHERE e.carrier_id = x.carrier_id AND e.equipment_type = x.equipment_type)
+    """,
+    """
+    DELETE FROM carrier_lanes x
+    WHERE x.carrier_id BETWEEN :first_carrier_id AND :last_carrier_id
+      AND NOT EXISTS (SELECT 1 FROM call_events e WHERE e.carrier_id = x.carrier_id AND e.lane = x.lane)
+    """,
+    """
+    DELETE FROM carrier_daily_stats x
+    WHERE x.carrier_id BETWEEN :first_carrier_id AND :last_carrier_id
+      AND NOT EXISTS (SELECT 1 FROM call_events e WHERE e.carrier_id = x.carrier_id AND e.call_date = x.stat_date)
+    """,
+    """
+    DELETE FROM carrier_decayed_stats x
+    WHERE x.carrier_id BETWEEN :first_carrier_id AND :last_carrier_id
+      AND NOT EXISTS (SELECT 1 FROM call_events e WHERE e.carrier_id = x.carrier_id)
+    """,
+]
+
+# Per-carrier rollups, which can be refreshed for disjoint carrier sets in parallel
+CARRIER_ROLLUP_STATEMENTS = [
+    CARRIER_ROLLUP_SQL,
+    EQUIPMENT_ROLLUP_SQL,
+    LANE_ROLLUP_SQL,
+    DAILY_STATS_ROLLUP_SQL,
+    DECAYED_STATS_ROLLUP_SQL,
+]
+
+# Lane / equipment rate sketches and per-day distinct-count registers, shared by many carriers
+SHARED_ROLLUP_STATEMENTS = [
+    DELETE_SKETCHES_SQL,
+    REBUILD_SKETCHES_SQL,
+    DELETE_REGISTERS_SQL,
+    REBUILD_REGISTERS_SQL,
+]
+
+ROLLUP_STATEMENTS = CARRIER_ROLLUP_STATEMENTS + SHARED_ROLLUP_STATEMENTS
+
+TOUCHED_LANES_SQL = """
+SELECT DISTINCT lane, equipment_type FROM call_events
+WHERE carrier_id IS NOT NULL {carrier_filter}
+"""
+
+def _params(**extra) -> dict:
+    params = {"half_life": DECAY_HALF_LIFE_DAYS, "log_gamma": LOG_GAMMA, "archived_lane_rate_buckets": "[]"}
+    params.update({f"archived_{name}": "[]" for name in CARRIER_SUMS})
+    params["archived_months"] = cold_archive.archived_months()
+    params.update(extra)
+    return params
+
+def _add_archived(db: Session, params: dict, carrier_filter: str):
+    """Pass the refreshed carriers' archived sums and their lanes' archived sketch buckets"""
+    for name, records in cold_archive.carrier_records(params["carrier_ids"]).items():
+        params[f"archived_{name}"] = json.dumps(records)
+    lanes = db.execute(text(TOUCHED_LANES_SQL.format(carrier_filter=carrier_filter)), params).fetchall()
+    params["archived_lane_rate_buckets"] = json.dumps(cold_archive.lane_rate_records(tuple(lane) for lane in lanes))
+
+def _require_no_archive():
+    """Full rebuilds can't re-read archived rows; refreshing given carriers folds in their summaries instead"""
+    if cold_archive.parts():
+        raise RuntimeError(
+            f"Rebuilding every rollup from call_events would drop the months archived under {cold_archive.root}; "
+            "only refreshes of specific carriers are supported while an archive exists"
+        )
+
+def refresh_rollups(db: Session, carrier_ids: Optional[Iterable[int]] = None):
+    """Recompute carrier, equipment, lane, stats and rate sketch rollups with set-based SQL
+
+    Pass carrier_ids to limit the refresh to those carriers; by default every
+    carrier with call events is recomputed (not allowed once months have been
+    archived). Runs under lock_carriers.
+    """
+    params = _params()
+    carrier_filter = ""
+    if carrier_ids is not None:
+        params["carrier_ids"] = list(carrier_ids)
+        if not params["carrier_ids"]:
+            return
+        carrier_filter = "AND carrier_id = ANY(:carrier_ids)"
+    else:
+        _require_no_archive()
+
+    lock_carriers(db, params.get("carrier_ids"))
+    lock_shared_sketches(db)
+    if carrier_ids is not None and cold_archive.enabled:
+        _add_archived(db, params, carrier_filter)
+    for statement in ROLLUP_STATEMENTS:
+        db.execute(text(statement.format(carrier_filter=carrier_filter)), params)
+    db.commit()
+
+def refresh_carrier_range(db: Session, first_carrier_id: int, last_carrier_id: int):
+    """Recompute the per-carrier rollups of carrier ids in [first, last] in one transaction
+
+    Leaves the shared sketches alone (see refresh_shared_rollups), so disjoint
+    ranges can be refreshed in parallel. Rollup rows without events are reset
+    or removed. Part of the full rebuild, so not allowed once months have been
+    archived.
+    """
+    _require_no_archive()
+    lock_carrier_range(db, first_carrier_id, last_carrier_id)
+    params = _params(first_carrier_id=first_carrier_id, last_carrier_id=last_carrier_id)
+    carrier_filter = "AND carrier_id BETWEEN :first_carrier_id AND :last_carrier_id"
+    for statement in PRUNE_RANGE_STATEMENTS:
+        db.execute(text(statement), params)
+    for statement in CARRIER_ROLLUP_STATEMENTS:
+        db.execute(text(statement.format(carrier_filter=carrier_filter)), params)
+    db.commit()
+
+def refresh_shared_rollups(db: Session):
+    """Rebuild every lane / equipment rate sketch and distinct-count register in one transaction"""
+    _require_no_archive()
+    lock_shared_sketches(db)
+    for statement in SHARED_ROLLUP_STATEMENTS:
+        db.execute(text(statement.format(carrier_filter="")), _params())
+    db.commit()
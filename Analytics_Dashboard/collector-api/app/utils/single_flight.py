@@ -0,0 +1,101 @@
+"""Request coalescing: concurrent identical calls share one in-flight computation"""
+from collections import defaultdict
+from functools import wraps
+from threading import Lock, Event
+from typing import Any, Callable, Dict, Iterable
+import hashlib
+import orjson
+from .data_version import get_data_version
+
+class _Call:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Runs fn once per key at a time; callers arriving meanwhile get the same result
+
+    Nothing is kept after the call finishes, so this only deduplicates overlapping
+    calls (use result_cache to reuse results over time). Counters are per name.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._lock = Lock()
+        self._counters = defaultdict(lambda: {"calls": 0, "executions": 0, "deduplicated": 0})
+
+    def do(self, key: str, fn: Callable[[], Any], name: str = "default"):
+        with self._lock:
+            counters = self._counters[name]
+            counters["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                counters["executions"] += 1
+            else:
+                counters["deduplicated"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+single_flight = SingleFlight()
+
+def normalize_args(*args, **kwargs) -> str:
+    """Stable digest of call arguments (dates by ISO format, other values by str)"""
+
+    def normalize(value):
+        if isinstance(value, (list, tuple, set)):
+            return [normalize(item) for item in value]
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        if hasattr(value, "model_dump"):
+            return value.model_dump(mode="json")
+        return value
+
+    payload = orjson.dumps(
+        [normalize(list(args)), {key: normalize(value) for key, value in sorted(kwargs.items())}],
+        default=str
+    )
+    return hashlib.sha1(payload).hexdigest()
+
+def coalesced(name: str, domains: Iterable[str]):
+    """Coalesce concurrent identical calls of an aggregation `fn(db, *args, **kwargs)`
+
+    Only calls against the same engine at the same data version of domains
+    share a result, so a caller on the primary never gets a lagging replica's
+    answer. Calls on a snapshot session (database.snapshot_session) run on
+    their own: they must see exactly their snapshot, not whatever another
+    caller reads.
+    """
+    domains = list(domains)
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(db, *args, **kwargs):
+            if db.info.get("snapshot_id"):
+                return fn(db, *args, **kwargs)
+            token, _ = get_data_version(db, domains)
+            key = f"{name}:{id(db.get_bind())}:{token}:{normalize_args(*args, **kwargs)}"
+            return single_flight.do(key, lambda: fn(db, *args, **kwargs), name)
+        return wrapper
+    return decorator
@@ -0,0 +1,73 @@
+"""Shared pieces of the multi-series trends (one series per lane, equipment type or carrier)
+
+Both the Postgres and the DuckDB versions return rows of
+(key, period, total_calls, success_rate, avg_sentiment, avg_rpm) for the top
+keys in the window; build_series turns them into series over every period of
+the window, filling periods without calls with zeros.
+"""
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List
+import os
+from ..schemas import TrendDataPoint, TrendSeries
+
+# Dimensions a trend can be split by
+SERIES_GROUPS = ("lane", "equipment", "carrier")
+# Most series one request may ask for (each is a full line on the chart and a block of the payload)
+TREND_SERIES_MAX = int(os.getenv("TREND_SERIES_MAX", "20"))
+# Most periods in one request's window (every series is gap-filled over all of them)
+TREND_SERIES_MAX_PERIODS = int(os.getenv("TREND_SERIES_MAX_PERIODS", "366"))
+
+def _first_period(start_date: date, interval: str):
+    if interval == "week":
+        # date_trunc('week') starts weeks on Monday
+        return start_date - timedelta(days=start_date.weekday()), timedelta(days=7)
+    # call_date has day resolution, so hourly buckets only ever land on midnight
+    return start_date, timedelta(days=1)
+
+def period_count(start_date: date, end_date: date, interval: str) -> int:
+    """Number of periods trend_periods returns, without building them"""
+    period, step = _first_period(start_date, interval)
+    return max(0, (end_date - period).days // step.days + 1)
+
+def trend_periods(start_date: date, end_date: date, interval: str) -> List[date]:
+    """Start of every period in the window, as date_trunc labels them"""
+    period, step = _first_period(start_date, interval)
+
+    periods = []
+    while period <= end_date:
+        periods.append(period)
+        period += step
+    return periods
+
+def _period_date(period) -> date:
+    return period.date() if isinstance(period, datetime) else period
+
+def build_series(rows: Iterable, labels: Dict[int, str], start_date: date, end_date: date, interval: str) -> List[TrendSeries]:
+    """Gap-filled series from grouped rows, busiest first"""
+    points = defaultdict(dict)
+    for key, period, total_calls, success_rate, avg_sentiment, avg_rpm in rows:
+        points[key][_period_date(period)] = (total_calls, success_rate, avg_sentiment, avg_rpm)
+
+    periods = trend_periods(start_date, end_date, interval)
+    series = []
+    for key, by_period in points.items():
+        data = []
+        for period in periods:
+            total_calls, success_rate, avg_sentiment, avg_rpm = by_period.get(period, (0, None, None, None))
+            data.append(TrendDataPoint(
+                date=f"{period:%Y-%m-%d} 00:00:00",
+                success_rate=round(success_rate * 100, 2) if success_rate else 0,
+                avg_sentiment=round(avg_sentiment, 3) if avg_sentiment else 0,
+                avg_rpm=round(avg_rpm, 2) if avg_rpm else 0,
+                total_calls=total_calls
+            ))
+        series.append(TrendSeries(
+            key=key,
+            label=labels.get(key) or "",
+            total_calls=sum(point.total_calls for point in data),
+            data=data
+        ))
+
+    series.sort(key=lambda item: (-item.total_calls, item.key))
+    return series
@@ -0,0 +1,196 @@
+"""Baseline schema (everything the app previously created with create_all)
+
+The schema is written out table by table so that later model changes don't
+leak into this revision. Tables that already exist are skipped, which keeps
+it safe on databases that were created by create_all. Derived tables it adds
+to such a database start empty; scripts/rebuild_rollups.py fills them.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import logging
+import sqlalchemy as sa
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger("alembic")
+
+# Filled from call_events, not by this migration
+DERIVED_TABLES = {"carrier_daily_stats", "carrier_decayed_stats", "rate_sketch_buckets", "distinct_sketch_registers"}
+
+def _tables():
+    return [
+        ("carriers", [
+            sa.Column("carrier_id", sa.Integer(), primary_key=True),
+            sa.Column("carrier_name", sa.String(100), nullable=False, unique=True),
+            sa.Column("mc_number", sa.String(20), unique=True),
+            sa.Column("total_calls", sa.Integer()),
+            sa.Column("successful_calls", sa.Integer()),
+            sa.Column("success_rate", sa.Numeric(5, 2)),
+            sa.Column("avg_rpm", sa.Numeric(6, 2)),
+            sa.Column("avg_negotiation_rounds", sa.Numeric(4, 2)),
+            sa.Column("avg_rate_variance_pct", sa.Numeric(6, 2)),
+            sa.Column("avg_call_duration_seconds", sa.Integer()),
+            sa.Column("avg_objections", sa.Integer()),
+            sa.Column("avg_positive_words", sa.Integer()),
+            sa.Column("avg_negative_words", sa.Integer()),
+            sa.Column("positive_sentiment_calls", sa.Integer()),
+            sa.Column("negative_sentiment_calls", sa.Integer()),
+            sa.Column("neutral_sentiment_calls", sa.Integer()),
+            sa.Column("unknown_sentiment_calls", sa.Integer()),
+            sa.Column("total_loads_shown", sa.Integer()),
+            sa.Column("avg_loads_per_call", sa.Numeric(4, 2)),
+            sa.Column("status", sa.String(20)),
+            sa.Column("preferred", sa.Boolean()),
+            sa.Column("last_call_date", sa.Date()),
+            sa.Column("created_at", sa.DateTime()),
+            sa.Column("updated_at", sa.DateTime()),
+            sa.CheckConstraint("status IN ('active', 'inactive', 'watch_list')"),
+        ], [
+            ("ix_carriers_carrier_id", ["carrier_id"]),
+            ("idx_carriers_success_rate", ["success_rate"]),
+            ("idx_carriers_avg_rpm", ["avg_rpm"]),
+        ]),
+        ("data_versions", [
+            sa.Column("domain", sa.String(50), primary_key=True),
+            sa.Column("version", sa.BigInteger(), nullable=False),
+            sa.Column("updated_at", sa.DateTime()),
+        ], []),
+        ("distinct_sketch_registers", [
+            sa.Column("stat_date", sa.Date(), primary_key=True),
+            sa.Column("metric", sa.String(20), primary_key=True),
+            sa.Column("segment_type", sa.String(20), primary_key=True),
+            sa.Column("segment", sa.String(50), primary_key=True),
+            sa.Column("register", sa.Integer(), primary_key=True),
+            sa.Column("rank", sa.Integer(), nullable=False),
+            sa.CheckConstraint("metric IN ('carriers', 'lanes')"),
+            sa.CheckConstraint("segment_type IN ('all', 'equipment_type')"),
+        ], []),
+        ("rate_sketch_buckets", [
+            sa.Column("scope", sa.String(20), primary_key=True),
+            sa.Column("lane", sa.String(200), primary_key=True),
+            sa.Column("equipment_type", sa.String(50), primary_key=True),
+            sa.Column("carrier_id", sa.Integer(), primary_key=True),
+            sa.Column("bucket", sa.Integer(), primary_key=True),
+            sa.Column("count", sa.BigInteger(), nullable=False),
+            sa.CheckConstraint("scope IN ('lane_equipment', 'carrier_lane')"),
+        ], []),
+        ("call_events", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("call_id", sa.String(50), nullable=False, unique=True),
+            sa.Column("carrier_id", sa.Integer(), sa.ForeignKey("carriers.carrier_id")),
+            sa.Column("carrier_name", sa.String(100), nullable=False),
+            sa.Column("lane", sa.String(200), nullable=False),
+            sa.Column("miles", sa.Integer(), nullable=False),
+            sa.Column("equipment_type", sa.String(50), nullable=False),
+            sa.Column("commodity_type", sa.String(100)),
+            sa.Column("weight", sa.Integer()),
+            sa.Column("loadboard_rate", sa.Numeric(10, 2), nullable=False),
+            sa.Column("offered_rate_initial", sa.Numeric(10, 2)),
+            sa.Column("carrier_counter_rate", sa.Numeric(10, 2)),
+            sa.Column("final_rate_agreed", sa.Numeric(10, 2)),
+            sa.Column("kpi_rpm", sa.Numeric(6, 2)),
+            sa.Column("kpi_rate_variance_pct", sa.Numeric(6, 2)),
+            sa.Column("num_negotiation_rounds", sa.Integer()),
+            sa.Column("num_loads_shown", sa.Integer()),
+            sa.Column("outcome", sa.String(50)),
+            sa.Column("group_outcome_simple", sa.String(20)),
+            sa.Column("rate_band", sa.String(20)),
+            sa.Column("carrier_sentiment", sa.String(20)),
+            sa.Column("group_sentiment_outcome", sa.String(50)),
+            sa.Column("call_duration_seconds", sa.Integer()),
+            sa.Column("objection_count", sa.Integer()),
+            sa.Column("positive_words_count", sa.Integer()),
+            sa.Column("negative_words_count", sa.Integer()),
+            sa.Column("call_date", sa.Date(), nullable=False),
+            sa.Column("created_at", sa.DateTime()),
+            sa.CheckConstraint("group_outcome_simple IN ('Successful', 'Unsuccessful', 'Pending')"),
+            sa.CheckConstraint("carrier_sentiment IN ('positive', 'negative', 'neutral', 'unknown')"),
+        ], [
+            ("ix_call_events_id", ["id"]),
+            ("idx_call_events_carrier_name", ["carrier_name"]),
+            ("idx_call_events_lane", ["lane"]),
+            ("idx_call_events_equipment_type", ["equipment_type"]),
+            ("idx_call_events_outcome", ["group_outcome_simple"]),
+            ("idx_call_events_carrier_id", ["carrier_id"]),
+            ("idx_call_events_created_at", ["created_at"]),
+        ]),
+        ("carrier_daily_stats", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("carrier_id", sa.Integer(), sa.ForeignKey("carriers.carrier_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("stat_date", sa.Date(), nullable=False),
+            sa.Column("total_calls", sa.Integer(), nullable=False),
+            sa.Column("successful_calls", sa.Integer(), nullable=False),
+            sa.Column("rpm_sum", sa.Float(), nullable=False),
+            sa.Column("rpm_count", sa.Integer(), nullable=False),
+            sa.Column("rounds_sum", sa.Integer(), nullable=False),
+            sa.Column("rounds_count", sa.Integer(), nullable=False),
+            sa.UniqueConstraint("carrier_id", "stat_date", name="uq_carrier_daily_stats_carrier_date"),
+        ], [
+            ("ix_carrier_daily_stats_id", ["id"]),
+            ("idx_carrier_daily_stats_stat_date", ["stat_date"]),
+        ]),
+        ("carrier_decayed_stats", [
+            sa.Column("carrier_id", sa.Integer(), sa.ForeignKey("carriers.carrier_id", ondelete="CASCADE"), primary_key=True),
+            sa.Column("calls", sa.Float(), nullable=False),
+            sa.Column("successful_calls", sa.Float(), nullable=False),
+            sa.Column("rpm_sum", sa.Float(), nullable=False),
+            sa.Column("rpm_weight", sa.Float(), nullable=False),
+            sa.Column("rounds_sum", sa.Float(), nullable=False),
+            sa.Column("rounds_weight", sa.Float(), nullable=False),
+            sa.Column("as_of", sa.Date(), nullable=False),
+        ], []),
+        ("carrier_equipment", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("carrier_id", sa.Integer(), sa.ForeignKey("carriers.carrier_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("equipment_type", sa.String(50), nullable=False),
+            sa.Column("call_count", sa.Integer()),
+            sa.Column("success_count", sa.Integer()),
+            sa.Column("success_rate", sa.Numeric(5, 2)),
+        ], [
+            ("ix_carrier_equipment_id", ["id"]),
+            ("idx_carrier_equipment_carrier_id", ["carrier_id"]),
+            ("idx_carrier_equipment_type", ["equipment_type"]),
+        ]),
+        ("carrier_lanes", [
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("carrier_id", sa.Integer(), sa.ForeignKey("carriers.carrier_id", ondelete="CASCADE"), nullable=False),
+            sa.Column("lane", sa.String(200), nullable=False),
+            sa.Column("miles", sa.Integer()),
+            sa.Column("total_calls", sa.Integer()),
+            sa.Column("successful_calls", sa.Integer()),
+            sa.Column("success_rate", sa.Numeric(5, 2)),
+            sa.Column("avg_rpm", sa.Numeric(6, 2)),
+            sa.Column("avg_loadboard_rate", sa.Numeric(10, 2)),
+            sa.Column("avg_final_rate", sa.Numeric(10, 2)),
+            sa.Column("last_call_date", sa.Date()),
+        ], [
+            ("ix_carrier_lanes_id", ["id"]),
+            ("idx_carrier_lanes_lane", ["lane"]),
+            ("idx_carrier_lanes_carrier_id", ["carrier_id"]),
+        ]),
+    ]
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    created = []
+    for name, columns, indexes in _tables():
+        # Skipping existing tables keeps this safe on databases that were created by create_all
+        if name in existing:
+            continue
+        op.create_table(name, *columns)
+        for index_name, index_columns in indexes:
+            op.create_index(index_name, name, index_columns)
+        created.append(name)
+    backfill = sorted(DERIVED_TABLES.intersection(created))
+    if "call_events" in existing and backfill:
+        logger.warning("Created %s empty; run `python scripts/rebuild_rollups.py` after the upgrade", ", ".join(backfill))
+
+def downgrade():
+    for name, _, _ in reversed(_tables()):
+        op.drop_table(name)
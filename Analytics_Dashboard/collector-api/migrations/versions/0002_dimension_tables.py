@@ -0,0 +1,50 @@
+"""Dictionary-encoded lane and equipment type dimensions
+
+Adds the lanes / equipment_types tables and integer lane_id /
+equipment_type_id keys on call_events and carrier_lanes, backfilled from the
+existing string columns.
+
+Revision ID: 0002_dimension_tables
+Revises: 0001_baseline
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0002_dimension_tables"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # IF NOT EXISTS: databases created by create_all from later models already have these
+    op.execute("CREATE TABLE IF NOT EXISTS lanes (lane_id serial PRIMARY KEY, name varchar(200) NOT NULL UNIQUE)")
+    op.execute("CREATE TABLE IF NOT EXISTS equipment_types (equipment_type_id smallserial PRIMARY KEY, name varchar(50) NOT NULL UNIQUE)")
+
+    op.execute("ALTER TABLE call_events ADD COLUMN IF NOT EXISTS lane_id integer REFERENCES lanes (lane_id)")
+    op.execute("ALTER TABLE call_events ADD COLUMN IF NOT EXISTS equipment_type_id smallint REFERENCES equipment_types (equipment_type_id)")
+    op.execute("ALTER TABLE carrier_lanes ADD COLUMN IF NOT EXISTS lane_id integer REFERENCES lanes (lane_id)")
+
+    op.execute("INSERT INTO lanes (name) SELECT DISTINCT lane FROM call_events ON CONFLICT (name) DO NOTHING")
+    op.execute("INSERT INTO lanes (name) SELECT DISTINCT lane FROM carrier_lanes ON CONFLICT (name) DO NOTHING")
+    op.execute("INSERT INTO equipment_types (name) SELECT DISTINCT equipment_type FROM call_events ON CONFLICT (name) DO NOTHING")
+
+    op.execute("UPDATE call_events e SET lane_id = l.lane_id FROM lanes l WHERE l.name = e.lane AND e.lane_id IS NULL")
+    op.execute(
+        "UPDATE call_events e SET equipment_type_id = t.equipment_type_id FROM equipment_types t "
+        "WHERE t.name = e.equipment_type AND e.equipment_type_id IS NULL"
+    )
+    op.execute("UPDATE carrier_lanes c SET lane_id = l.lane_id FROM lanes l WHERE l.name = c.lane AND c.lane_id IS NULL")
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_call_events_lane_id ON call_events (lane_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_call_events_equipment_type_id ON call_events (equipment_type_id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_carrier_lanes_lane_id ON carrier_lanes (lane_id)")
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_carrier_lanes_lane_id")
+    op.execute("DROP INDEX IF EXISTS idx_call_events_equipment_type_id")
+    op.execute("DROP INDEX IF EXISTS idx_call_events_lane_id")
+    op.execute("ALTER TABLE carrier_lanes DROP COLUMN IF EXISTS lane_id")
+    op.execute("ALTER TABLE call_events DROP COLUMN IF EXISTS equipment_type_id")
+    op.execute("ALTER TABLE call_events DROP COLUMN IF EXISTS lane_id")
+    op.execute("DROP TABLE IF EXISTS equipment_types")
+    op.execute("DROP TABLE IF EXISTS lanes")
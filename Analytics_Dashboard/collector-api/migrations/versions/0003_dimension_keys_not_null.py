@@ -0,0 +1,34 @@
+"""Require lane_id / equipment_type_id on call_events
+
+Backfills any events written without the keys (e.g. by workers still on the
+old code during a rolling deploy of 0002) and makes the columns NOT NULL, so
+breakdowns grouping on the keys never lump events into a nameless group.
+
+Revision ID: 0003_dimension_keys_not_null
+Revises: 0002_dimension_tables
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0003_dimension_keys_not_null"
+down_revision = "0002_dimension_tables"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.execute("INSERT INTO lanes (name) SELECT DISTINCT lane FROM call_events WHERE lane_id IS NULL ON CONFLICT (name) DO NOTHING")
+    op.execute(
+        "INSERT INTO equipment_types (name) SELECT DISTINCT equipment_type FROM call_events "
+        "WHERE equipment_type_id IS NULL ON CONFLICT (name) DO NOTHING"
+    )
+    op.execute("UPDATE call_events e SET lane_id = l.lane_id FROM lanes l WHERE l.name = e.lane AND e.lane_id IS NULL")
+    op.execute(
+        "UPDATE call_events e SET equipment_type_id = t.equipment_type_id FROM equipment_types t "
+        "WHERE t.name = e.equipment_type AND e.equipment_type_id IS NULL"
+    )
+    op.execute("ALTER TABLE call_events ALTER COLUMN lane_id SET NOT NULL")
+    op.execute("ALTER TABLE call_events ALTER COLUMN equipment_type_id SET NOT NULL")
+
+def downgrade():
+    op.execute("ALTER TABLE call_events ALTER COLUMN equipment_type_id DROP NOT NULL")
+    op.execute("ALTER TABLE call_events ALTER COLUMN lane_id DROP NOT NULL")
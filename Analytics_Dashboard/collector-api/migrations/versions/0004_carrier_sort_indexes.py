@@ -0,0 +1,36 @@
+"""Composite indexes for the GET /carriers sort orders
+
+One (column DESC NULLS LAST, carrier_id DESC) index per sort column serves
+both directions of the ORDER BY (read backward for ascending sorts), replacing
+the single-column success_rate / avg_rpm indexes that couldn't.
+
+Revision ID: 0004_carrier_sort_indexes
+Revises: 0003_dimension_keys_not_null
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+revision = "0004_carrier_sort_indexes"
+down_revision = "0003_dimension_keys_not_null"
+branch_labels = None
+depends_on = None
+
+SORT_COLUMNS = ("success_rate", "avg_rpm", "total_calls", "last_call_date")
+
+def upgrade():
+    # CONCURRENTLY keeps ingest writing to carriers while the indexes build
+    with op.get_context().autocommit_block():
+        for name in SORT_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carriers_{name}_sort "
+                f"ON carriers ({name} DESC NULLS LAST, carrier_id DESC)"
+            )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_carriers_success_rate")
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_carriers_avg_rpm")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carriers_success_rate ON carriers (success_rate)")
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_carriers_avg_rpm ON carriers (avg_rpm)")
+        for name in SORT_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS idx_carriers_{name}_sort")
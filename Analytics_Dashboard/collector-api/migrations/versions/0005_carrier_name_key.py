@@ -0,0 +1,36 @@
+"""Unique index on the normalized carrier name
+
+Ingest and the bulk loader resolve carriers by name with whitespace runs
+collapsed, trimmed and lowercased; the unique index makes that key the
+arbiter when workers race to create the same carrier, and serves the lookups.
+
+Revision ID: 0005_carrier_name_key
+Revises: 0004_carrier_sort_indexes
+Create Date: 2026-10-19
+"""
+from alembic import op
+from sqlalchemy import text
+
+revision = "0005_carrier_name_key"
+down_revision = "0004_carrier_sort_indexes"
+branch_labels = None
+depends_on = None
+
+# Same expression as models.CARRIER_NAME_KEY_SQL, frozen at this revision
+NAME_KEY = "lower(btrim(regexp_replace(carrier_name, '[ \\t\\n\\r\\f\\v]+', ' ', 'g')))"
+
+def upgrade():
+    duplicates = op.get_bind().execute(text(
+        f"SELECT {NAME_KEY} AS name_key, array_agg(carrier_id ORDER BY carrier_id) "
+        f"FROM carriers GROUP BY {NAME_KEY} HAVING count(*) > 1 ORDER BY 1 LIMIT 20"
+    )).fetchall()
+    if duplicates:
+        # Merging carriers moves their events and rollups; that's a decision for an operator
+        listed = "; ".join(f"{name_key!r}: {carrier_ids}" for name_key, carrier_ids in duplicates)
+        raise RuntimeError(f"Carriers share a normalized name; merge them before upgrading: {listed}")
+    with op.get_context().autocommit_block():
+        op.execute(f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_carriers_name_key ON carriers ({NAME_KEY})")
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS uq_carriers_name_key")
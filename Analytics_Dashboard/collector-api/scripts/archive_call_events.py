@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+from datetime import date
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.database import SessionLocal
+from app.utils.cold_archive import cold_archive, ARCHIVE_AFTER_MONTHS
+from app.utils.data_version import bump_data_version
+
+def default_cutoff() -> date:
+    """First day of the oldest month that is still kept hot"""
+    today = date.today()
+    months = today.year * 12 + today.month - 1 - ARCHIVE_AFTER_MONTHS
+    return date(months // 12, months % 12 + 1, 1)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move closed months of call_events into the Parquet archive (ARCHIVE_DIR)"
+    )
+    parser.add_argument("--before", type=date.fromisoformat, default=None,
+                        help=f"Archive months before this date (default: older than {ARCHIVE_AFTER_MONTHS} months)")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+    args = parser.parse_args()
+
+    if not cold_archive.enabled:
+        parser.error("ARCHIVE_DIR is not set")
+
+    cutoff = args.before or default_cutoff()
+    db = SessionLocal()
+    try:
+        months = cold_archive.closed_months(db, cutoff)
+        if not months:
+            print(f"No call events before {cutoff:%Y-%m} to archive")
+            return
+        if args.dry_run:
+            print("Would archive: " + ", ".join(f"{month:%Y-%m}" for month in months))
+            return
+
+        total = 0
+        for month in months:
+            started = time.monotonic()
+            rows = cold_archive.archive_month(db, month)
+            total += rows
+            print(f"archived {month:%Y-%m}: {rows:,} rows in {time.monotonic() - started:.1f}s")
+
+        # Cached aggregates must be recomputed against the smaller hot table
+        bump_data_version(db)
+        print(f"Archived {total:,} call events from {len(months)} months to {cold_archive.root}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import time
+import argparse
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("READ_API_KEY", "read-key-xyz789")
+os.environ.setdefault("INGEST_API_KEY", "ingest-key-abc123")
+
+from fastapi.security import HTTPAuthorizationCredentials
+from starlette.requests import Request
+from app.auth import require_read_key
+
+def make_request(api_key: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/v1/metrics/overview",
+        "headers": [(b"x-api-key", api_key.encode())],
+        "query_string": b"",
+    })
+
+def env_lookup_read_key(request: Request, credentials=None):
+    """The previous require_read_key: os.getenv and != on every request"""
+    api_key = credentials.credentials if credentials else request.headers.get("x-api-key")
+    if not api_key:
+        raise ValueError("missing")
+    read_key = os.getenv("READ_API_KEY")
+    if not read_key:
+        raise ValueError("not configured")
+    if api_key != read_key:
+        raise ValueError("invalid")
+    return api_key
+
+def per_call(fn, args, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - started) / iterations
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark of the API key dependency per request")
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+
+    api_key = os.environ["READ_API_KEY"].split(",")[0]
+    header_request = make_request(api_key)
+    bearer = HTTPAuthorizationCredentials(scheme="Bearer", credentials=api_key)
+
+    rows = [
+        ("previous (getenv + !=), header", per_call(env_lookup_read_key, (header_request,), args.iterations)),
+        ("key ring (cached), header", per_call(require_read_key, (header_request, None), args.iterations)),
+        ("key ring (cached), bearer", per_call(require_read_key, (header_request, bearer), args.iterations)),
+    ]
+    print(f"{args.iterations:,} calls each")
+    print(f"{'dependency':<34}{'ns/call':>10}")
+    for label, seconds in rows:
+        print(f"{label:<34}{seconds * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main()
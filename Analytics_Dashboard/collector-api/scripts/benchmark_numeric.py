@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import random
+import argparse
+from decimal import Decimal
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# NUMERIC columns read per call event by the rollups and breakdowns
+NUMERIC_COLUMNS = ["loadboard_rate", "final_rate_agreed", "kpi_rpm", "kpi_rate_variance_pct"]
+
+def generate_wire_values(rows: int):
+    """NUMERIC values as the driver receives them (text), one tuple per row"""
+    return [
+        (
+            f"{random.uniform(500, 5000):.2f}",
+            f"{random.uniform(500, 5000):.2f}",
+            f"{random.uniform(1.5, 3.5):.2f}",
+            f"{random.uniform(-15, 15):.2f}",
+        )
+        for _ in range(rows)
+    ]
+
+def parse(wire, cast):
+    return [tuple(cast(value) for value in row) for row in wire]
+
+def rollup(rows):
+    """The update_carrier_metrics / breakdown pattern: float() each value, then average and round"""
+    totals = [0.0] * len(NUMERIC_COLUMNS)
+    for row in rows:
+        for i, value in enumerate(row):
+            totals[i] += float(value or 0)
+    return [round(total / len(rows), 2) for total in totals]
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def database_rows(limit: int, repeat: int):
+    """Time fetching NUMERIC columns from call_events with Decimal vs float parsing"""
+    import psycopg2
+    import psycopg2.extensions
+    from app.database import DATABASE_URL, _parse_float
+
+    query = f"SELECT {', '.join(NUMERIC_COLUMNS)} FROM call_events LIMIT %s"
+    float_numeric = psycopg2.extensions.new_type(psycopg2.extensions.DECIMAL.values, "FLOAT_NUMERIC", _parse_float)
+    results = {}
+    for label, register in (("Decimal (driver default)", False), ("float (FLOAT_NUMERICS)", True)):
+        connection = psycopg2.connect(DATABASE_URL)
+        try:
+            if register:
+                psycopg2.extensions.register_type(float_numeric, connection)
+            cursor = connection.cursor()
+
+            def fetch():
+                cursor.execute(query, (limit,))
+                rollup(cursor.fetchall() or [(0,) * len(NUMERIC_COLUMNS)])
+
+            results[label] = best_of(fetch, repeat)
+            cursor.execute("SELECT count(*) FROM (" + query + ") t", (limit,))
+            fetched = cursor.fetchone()[0]
+        finally:
+            connection.close()
+    return fetched, results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Decimal vs float handling of NUMERIC columns")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--database", action="store_true", help="Also fetch from call_events at DATABASE_URL")
+    args = parser.parse_args()
+
+    wire = generate_wire_values(args.rows)
+    decimals = parse(wire, Decimal)
+    floats = parse(wire, float)
+
+    timings = [
+        ("driver parse -> Decimal", best_of(lambda: parse(wire, Decimal), args.repeat)),
+        ("driver parse -> float", best_of(lambda: parse(wire, float), args.repeat)),
+        ("rollup over Decimal rows", best_of(lambda: rollup(decimals), args.repeat)),
+        ("rollup over float rows", best_of(lambda: rollup(floats), args.repeat)),
+    ]
+    print(f"{args.rows:,} rows x {len(NUMERIC_COLUMNS)} NUMERIC columns, best of {args.repeat}")
+    print(f"{'step':<28}{'ms':>10}{'ns/row':>10}")
+    for label, seconds in timings:
+        print(f"{label:<28}{seconds * 1000:>10.1f}{seconds / args.rows * 1e9:>10.0f}")
+
+    before = timings[0][1] + timings[2][1]
+    after = timings[1][1] + timings[3][1]
+    print(f"\nparse + rollup: {before / args.rows * 1e9:.0f} -> {after / args.rows * 1e9:.0f} ns/row "
+          f"({(1 - after / before) * 100:.0f}% less)")
+
+    if args.database:
+        fetched, results = database_rows(args.rows, args.repeat)
+        print(f"\ncall_events fetch + rollup ({fetched:,} rows):")
+        for label, seconds in results.items():
+            print(f"{label:<28}{seconds * 1000:>10.1f}{seconds / max(fetched, 1) * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main()
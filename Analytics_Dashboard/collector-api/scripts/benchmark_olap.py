@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import inspect
+import argparse
+import statistics
+from datetime import date, timedelta
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.utils import aggregations, olap_aggregations
+from app.utils.olap_mirror import OlapMirror
+
+BENCH_PREFIX = "bench-"
+
+SEED_DIMENSIONS_SQL = [
+    "INSERT INTO lanes (name) SELECT 'Bench Lane ' || n FROM generate_series(0, 499) n ON CONFLICT (name) DO NOTHING",
+    "INSERT INTO equipment_types (name) VALUES ('Dry Van'), ('Reefer'), ('Flatbed') ON CONFLICT (name) DO NOTHING",
+]
+
+SEED_EVENTS_SQL = """
+INSERT INTO call_events (
+    call_id, carrier_name, lane, lane_id, miles, equipment_type, equipment_type_id,
+    loadboard_rate, offered_rate_initial, carrier_counter_rate, final_rate_agreed, kpi_rpm,
+    kpi_rate_variance_pct, num_negotiation_rounds, num_loads_shown, group_outcome_simple,
+    carrier_sentiment, call_duration_seconds, call_date, created_at
+)
+SELECT
+    :prefix || :run || '-' || g,
+    'Bench Carrier ' || (g % 5000),
+    l.name, l.lane_id, 100 + g % 2000, e.name, e.equipment_type_id,
+    round((500 + random() * 4500)::numeric, 2),
+    CASE WHEN g % 3 > 0 THEN round((500 + random() * 4500)::numeric, 2) END,
+    CASE WHEN g % 4 = 0 THEN round((500 + random() * 4500)::numeric, 2) END,
+    CASE WHEN g % 2 = 0 THEN round((500 + random() * 4500)::numeric, 2) END,
+    round((1.5 + random() * 2)::numeric, 2),
+    round((random() * 40 - 20)::numeric, 2),
+    g % 5,
+    1 + g % 4,
+    (ARRAY['Successful', 'Unsuccessful', 'Pending'])[1 + g % 3],
+    (ARRAY['positive', 'negative', 'neutral', 'unknown'])[1 + g % 4],
+    60 + g % 900,
+    current_date - (g % 365),
+    now()
+FROM generate_series(1, :rows) g
+JOIN lanes l ON l.name = 'Bench Lane ' || (g % 500)
+JOIN equipment_types e ON e.name = (ARRAY['Dry Van', 'Reefer', 'Flatbed'])[1 + g % 3]
+"""
+
+def seed(rows: int):
+    db = SessionLocal()
+    try:
+        for statement in SEED_DIMENSIONS_SQL:
+            db.execute(text(statement))
+        db.execute(text(SEED_EVENTS_SQL), {"prefix": BENCH_PREFIX, "run": str(int(time.time())), "rows": rows})
+        db.commit()
+        db.execute(text("ANALYZE call_events"))
+        db.commit()
+    finally:
+        db.close()
+
+def cleanup():
+    db = SessionLocal()
+    try:
+        deleted = db.execute(text("DELETE FROM call_events WHERE call_id LIKE :prefix"), {"prefix": BENCH_PREFIX + "%"}).rowcount
+        db.commit()
+        return deleted
+    finally:
+        db.close()
+
+def median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare aggregate latency on Postgres vs the DuckDB mirror")
+    parser.add_argument("--seed", type=int, default=0, help="Insert N synthetic call events first (e.g. 10000000)")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic call events afterwards")
+    parser.add_argument("--mirror-path", default=":memory:", help="DuckDB file for the mirror")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.seed:
+        started = time.perf_counter()
+        seed(args.seed)
+        print(f"seeded {args.seed:,} call events in {time.perf_counter() - started:.1f}s")
+
+    mirror = OlapMirror(args.mirror_path, "duckdb")
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        mirror.sync(db)
+        elapsed = time.perf_counter() - started
+        print(f"mirror initial sync: {mirror.rows:,} rows in {elapsed:.1f}s ({mirror.rows / max(elapsed, 1e-9):,.0f} rows/s)")
+
+        end = date.today()
+        start = end - timedelta(days=90)
+        cases = [
+            ("overview", "get_overview_metrics", ()),
+            ("trends (90 days)", "get_trends_data", (start, end, "day")),
+            ("lane breakdown", "get_lane_breakdown", ()),
+            ("equipment breakdown", "get_equipment_breakdown", ()),
+            ("rate variance", "get_rate_variance_distribution", ()),
+            ("conversion funnel", "get_conversion_funnel", ()),
+        ]
+
+        print(f"\n{'aggregate':<22}{'postgres ms':>13}{'duckdb ms':>11}{'speedup':>9}")
+        for label, name, call_args in cases:
+            postgres_fn = aggregations._get_trends_data if name == "get_trends_data" else getattr(aggregations, name)
+            # Bypass the result cache, coalescing and routing to time the query itself
+            postgres_fn = inspect.unwrap(postgres_fn)
+            duckdb_fn = getattr(olap_aggregations, name)
+
+            postgres_ms = median_ms(lambda: postgres_fn(db, *call_args), args.repeat)
+            duckdb_ms = median_ms(lambda: duckdb_fn(mirror, *call_args), args.repeat)
+            print(f"{label:<22}{postgres_ms:>13.1f}{duckdb_ms:>11.1f}{postgres_ms / max(duckdb_ms, 1e-9):>8.1f}x")
+    finally:
+        db.close()
+        mirror.close()
+
+    if args.cleanup:
+        print(f"\ndeleted {cleanup():,} synthetic call events")
+
+if __name__ == "__main__":
+    main()
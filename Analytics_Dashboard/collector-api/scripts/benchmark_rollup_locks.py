@@ -0,0 +1,58 @@
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.routes.ingest import update_carrier_metrics
+
+def busiest_carriers(count: int) -> list:
+    db = SessionLocal()
+    try:
+        rows = db.execute(text(
+            "SELECT carrier_id FROM call_events WHERE carrier_id IS NOT NULL "
+            "GROUP BY carrier_id ORDER BY count(*) DESC LIMIT :count"
+        ), {"count": count}).fetchall()
+        return [row[0] for row in rows]
+    finally:
+        db.close()
+
+def rollup(carrier_id: int):
+    db = SessionLocal()
+    try:
+        update_carrier_metrics(db, carrier_id)
+    finally:
+        db.close()
+
+def rollups_per_second(carrier_ids: list, threads: int, rollups: int) -> float:
+    work = [carrier_ids[i % len(carrier_ids)] for i in range(rollups)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(rollup, work))
+    return rollups / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Carrier rollup throughput under the per-carrier locks: one hot carrier vs many"
+    )
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rollups", type=int, default=200, help="Rollups per measurement")
+    args = parser.parse_args()
+
+    carriers = busiest_carriers(max(args.threads))
+    if not carriers:
+        parser.error("no carriers with call events (run scripts/seed_mock_data.py first)")
+
+    print(f"{'threads':>8}{'same carrier/s':>16}{'distinct carriers/s':>21}")
+    for threads in args.threads:
+        same = rollups_per_second(carriers[:1], threads, args.rollups)
+        distinct = rollups_per_second(carriers[:threads], threads, args.rollups)
+        print(f"{threads:>8}{same:>16.1f}{distinct:>21.1f}")
+
+if __name__ == "__main__":
+    main()
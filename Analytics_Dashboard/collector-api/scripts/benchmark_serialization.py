@@ -0,0 +1,108 @@
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+from datetime import datetime, date, timedelta
+from decimal import Decimal
+from typing import List
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from app.schemas import CarrierResponse
+from app.utils.fast_json import FastJSONResponse, rows_to_dicts
+
+def generate_carrier_rows(count: int):
+    """Rows shaped like db.query(*schema_columns(CarrierResponse, Carrier)) results"""
+    rows = []
+    for i in range(count):
+        total = random.randint(1, 500)
+        successful = random.randint(0, total)
+        rows.append((
+            i + 1,
+            f"Carrier {i + 1:05d} Logistics LLC",
+            str(100000 + i),
+            total,
+            successful,
+            Decimal(f"{successful / total * 100:.2f}"),
+            Decimal(f"{random.uniform(1.5, 3.5):.2f}"),
+            Decimal(f"{random.uniform(1, 5):.2f}"),
+            Decimal(f"{random.uniform(-15, 15):.2f}"),
+            random.randint(120, 900),
+            random.randint(0, 5),
+            random.randint(0, 10),
+            random.randint(0, 5),
+            random.randint(0, total),
+            random.randint(0, total),
+            random.randint(0, total),
+            random.randint(0, total),
+            total * 2,
+            Decimal(f"{random.uniform(1, 4):.2f}"),
+            "active",
+            random.random() > 0.7,
+            date.today() - timedelta(days=random.randint(0, 90)),
+            datetime.now() - timedelta(days=random.randint(90, 400)),
+            datetime.now(),
+        ))
+    return rows
+
+class Row:
+    """Stand-in for an ORM instance (attribute access, as from_attributes uses)"""
+    def __init__(self, fields, values):
+        self.__dict__.update(zip(fields, values))
+
+def time_it(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /carriers serialization paths")
+    parser.add_argument("--carriers", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    random.seed(42)
+    fields = list(CarrierResponse.model_fields)
+    rows = generate_carrier_rows(args.carriers)
+    orm_objects = [Row(fields, row) for row in rows]
+    adapter = TypeAdapter(List[CarrierResponse])
+
+    def default_path():
+        # What FastAPI does for response_model=List[CarrierResponse] with ORM objects
+        validated = adapter.validate_python(orm_objects, from_attributes=True)
+        content = jsonable_encoder(validated)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def fast_path():
+        return FastJSONResponse(rows_to_dicts(rows, CarrierResponse)).body
+
+    default_seconds, default_body = time_it(default_path, args.repeat)
+    fast_seconds, fast_body = time_it(fast_path, args.repeat)
+
+    print(f"{args.carriers:,} carriers, best of {args.repeat}")
+    print(f"{'path':<28}{'time (ms)':>12}{'bytes':>14}")
+    print(f"{'pydantic + json (default)':<28}{default_seconds * 1000:>12.1f}{len(default_body):>14,}")
+    print(f"{'orjson, no re-validation':<28}{fast_seconds * 1000:>12.1f}{len(fast_body):>14,}")
+    print(f"speedup: {default_seconds / fast_seconds:.1f}x")
+
+    gzip_seconds, gzipped = time_it(lambda: gzip.compress(fast_body, compresslevel=6), args.repeat)
+    print(f"{'gzip (level 6)':<28}{gzip_seconds * 1000:>12.1f}{len(gzipped):>14,}")
+    try:
+        import brotli
+        brotli_seconds, brotlied = time_it(lambda: brotli.compress(fast_body, quality=4), args.repeat)
+        print(f"{'brotli (quality 4)':<28}{brotli_seconds * 1000:>12.1f}{len(brotlied):>14,}")
+    except ImportError:
+        print("brotli not installed; skipping")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import statistics
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "redis", "brotli", "duckdb"]
+
+# Run in a fresh interpreter per sample so nothing is already imported
+IMPORT_SNIPPET = """
+import sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+print("import", imported - started)
+print("heavy", ",".join(name for name in {heavy!r} if name in sys.modules))
+if {boot}:
+    import asyncio
+    async def boot():
+        async with app.main.app.router.lifespan_context(app.main.app):
+            pass
+    asyncio.run(boot())
+    print("boot", time.perf_counter() - imported)
+"""
+
+def sample(boot: bool, schema_mode: str):
+    env = dict(os.environ, SCHEMA_MODE=schema_mode)
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(heavy=HEAVY_MODULES, boot=boot)],
+        cwd=API_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = {}
+    for line in output.splitlines():
+        name, _, value = line.partition(" ")
+        result[name] = value
+    return result
+
+def slowest_imports(count: int):
+    """Top modules by cumulative import time, from python -X importtime"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=API_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, module = line.split(":", 1)[1].split("|")
+        rows.append((int(cumulative_us), module.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app import and boot (lifespan startup) time")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--boot", action="store_true", help="Also run the lifespan startup (needs DATABASE_URL reachable)")
+    parser.add_argument("--schema-mode", default="migrations", choices=["migrations", "create_all"])
+    parser.add_argument("--top", type=int, default=10, help="Show the N slowest imports")
+    args = parser.parse_args()
+
+    samples = [sample(args.boot, args.schema_mode) for _ in range(args.repeat)]
+    imports = [float(s["import"]) * 1000 for s in samples]
+    print(f"import app.main: median {statistics.median(imports):.0f} ms, best {min(imports):.0f} ms ({args.repeat} runs)")
+    if args.boot:
+        boots = [float(s["boot"]) * 1000 for s in samples]
+        print(f"lifespan startup (SCHEMA_MODE={args.schema_mode}): median {statistics.median(boots):.0f} ms, best {min(boots):.0f} ms")
+    heavy = samples[-1].get("heavy")
+    print(f"heavy modules loaded at import: {heavy or 'none'}")
+
+    print("\nslowest imports (cumulative):")
+    for cumulative_us, module in slowest_imports(args.top):
+        print(f"{cumulative_us / 1000:>10.1f} ms  {module}")
+
+if __name__ == "__main__":
+    main()
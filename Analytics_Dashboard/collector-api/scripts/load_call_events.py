@@ -0,0 +1,36 @@
+import os
+import sys
+import argparse
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.bulk_loader import load_files
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Bulk load CallEventRequest-shaped rows from CSV, NDJSON or Parquet files"
+    )
+    parser.add_argument("paths", nargs="+", help="Files to load")
+    parser.add_argument("--format", choices=["csv", "ndjson", "parquet"], help="Input format (default: from file extension)")
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Rows validated and copied per chunk")
+    parser.add_argument("--merge-every", type=int, default=1_000_000, help="Rows staged before merging into call_events")
+    parser.add_argument("--quiet", action="store_true", help="Only print the final summary")
+    args = parser.parse_args()
+
+    stats = load_files(
+        args.paths,
+        fmt=args.format,
+        chunk_size=args.chunk_size,
+        merge_every=args.merge_every,
+        progress=None if args.quiet else print
+    )
+
+    print(
+        f"Loaded {stats['inserted']:,} call events ({stats['read']:,} read, "
+        f"{stats['rejected']:,} rejected, {stats['staged'] - stats['inserted']:,} duplicates, "
+        f"{stats['carriers']:,} new carriers) in {stats['elapsed_seconds']}s"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Add the parent directory to the path so we can import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from app.database import SessionLocal
+from app.utils.rollups import refresh_carrier_range, refresh_shared_rollups, ROLLUP_LOCK_RANGE
+from app.utils.data_version import bump_data_version
+from app.utils.cold_archive import cold_archive
+
+def carrier_ranges(first_id: int, last_id: int, chunk_size: int) -> list:
+    """[first, last] carrier id ranges, aligned to the rollup lock blocks"""
+    chunk_size = max(ROLLUP_LOCK_RANGE, chunk_size // ROLLUP_LOCK_RANGE * ROLLUP_LOCK_RANGE)
+    start = first_id // chunk_size * chunk_size
+    return [(low, low + chunk_size - 1) for low in range(start, last_id + 1, chunk_size)]
+
+def load_state(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(path: str, state: dict):
+    # Replace atomically so an interrupted run never leaves a truncated file
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(state, f)
+    os.replace(temporary, path)
+
+def rebuild_range(first_id: int, last_id: int):
+    db = SessionLocal()
+    try:
+        refresh_carrier_range(db, first_id, last_id)
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Recompute every carrier, lane and equipment rollup with set-based SQL, in parallel carrier id ranges"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Ranges rebuilt at the same time (one connection each)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Carrier ids per range")
+    parser.add_argument("--state", default="rebuild_rollups.state.json", help="Progress file used by --resume")
+    parser.add_argument("--resume", action="store_true", help="Skip the ranges a previous run already finished")
+    parser.add_argument("--skip-sketches", action="store_true", help="Don't rebuild the shared rate sketches and distinct counts")
+    args = parser.parse_args()
+
+    if cold_archive.parts():
+        parser.error(f"months have been archived under {cold_archive.root}; rebuilding from call_events would drop them")
+
+    started = time.monotonic()
+    db = SessionLocal()
+    try:
+        first_id, last_id = db.execute(text("SELECT min(carrier_id), max(carrier_id) FROM carriers")).one()
+    finally:
+        db.close()
+
+    if args.resume and os.path.exists(args.state):
+        state = load_state(args.state)
+        # Carriers created since the interrupted run get ranges of their own (same chunking)
+        known = {tuple(r) for r in state["ranges"]}
+        chunk_size = state.get("chunk_size", args.chunk_size)
+        added = [list(r) for r in carrier_ranges(first_id, last_id, chunk_size) if r not in known] if first_id is not None else []
+        state["ranges"] += added
+        save_state(args.state, state)
+        print(f"resuming: {len(state['done'])} of {len(state['ranges'])} ranges already rebuilt, {len(added)} new")
+    else:
+        if first_id is None:
+            print("No carriers to rebuild")
+            return
+        state = {
+            "ranges": carrier_ranges(first_id, last_id, args.chunk_size),
+            "chunk_size": args.chunk_size,
+            "done": [],
+            "shared_done": False,
+        }
+        save_state(args.state, state)
+
+    done = {tuple(r) for r in state["done"]}
+    pending = [tuple(r) for r in state["ranges"] if tuple(r) not in done]
+    total = len(state["ranges"])
+
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(rebuild_range, low, high): (low, high) for low, high in pending}
+        for future in as_completed(futures):
+            future.result()
+            state["done"].append(list(futures[future]))
+            save_state(args.state, state)
+
+            finished = len(state["done"])
+            elapsed = time.monotonic() - started
+            rate = (finished - (total - len(pending))) / max(elapsed, 1e-9)
+            eta = (total - finished) / rate if rate else 0
+            low, high = futures[future]
+            print(f"carriers {low}-{high} done: {finished}/{total} ranges, {elapsed:.0f}s elapsed, ~{eta:.0f}s left")
+
+    if not args.skip_sketches and not state["shared_done"]:
+        print("rebuilding rate sketches and distinct counts")
+        db = SessionLocal()
+        try:
+            refresh_shared_rollups(db)
+        finally:
+            db.close()
+        state["shared_done"] = True
+        save_state(args.state, state)
+
+    db = SessionLocal()
+    try:
+        # Cached breakdowns and carrier lists were computed from the old rollups
+        bump_data_version(db)
+    finally:
+        db.close()
+
+    os.remove(args.state)
+    print(f"Rebuilt rollups for {total} carrier ranges in {time.monotonic() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
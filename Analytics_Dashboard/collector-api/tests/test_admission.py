@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from app import admission
+from app.admission import AdmissionMiddleware, AdmissionState, TokenBucket, route_class, INGEST, READ, HEAVY_READ
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission.time, "monotonic", lambda: now[0])
+    return now
+
+def test_burst_then_limited(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+def test_refill_at_rate(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.take()
+    clock[0] += 0.25
+    assert bucket.take() == pytest.approx(0.25)
+    clock[0] += 0.25
+    assert bucket.take() == 0.0
+    assert bucket.take() == pytest.approx(0.5)
+
+def test_refill_is_capped_at_burst(clock):
+    bucket = TokenBucket(rate=2, burst=3)
+    bucket.take()
+    clock[0] += 60
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() > 0
+
+def test_route_classes():
+    assert route_class("/api/v1/events/call") == INGEST
+    assert route_class("/api/v1/dashboard/performance") == HEAVY_READ
+    assert route_class("/api/v1/metrics/trends/series") == HEAVY_READ
+    assert route_class("/api/v1/metrics/overview") == READ
+    assert route_class("/health") is None
+
+def _scope(path, client="10.0.0.1", headers=()):
+    return {
+        "type": "http", "method": "GET", "path": path, "query_string": b"",
+        "headers": [(key.encode(), value.encode()) for key, value in headers],
+        "client": (client, 1234),
+    }
+
+def _call(middleware, scope):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = next(message for message in sent if message["type"] == "http.response.start")
+    return start["status"], dict(start["headers"])
+
+async def _ok(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+@pytest.fixture
+def unlimited(monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMITS", {INGEST: (0, 0), READ: (0, 0), HEAVY_READ: (0, 0)})
+    monkeypatch.setattr(admission, "MAX_IN_FLIGHT", 10)
+
+@pytest.mark.parametrize("path, admitted_below", [
+    ("/api/v1/dashboard/performance", 5),
+    ("/api/v1/metrics/overview", 8),
+    ("/api/v1/events/call", 10),
+])
+def test_shed_thresholds_by_class(unlimited, path, admitted_below):
+    state = AdmissionState()
+    middleware = AdmissionMiddleware(_ok, state)
+    state.in_flight = admitted_below - 1
+    assert _call(middleware, _scope(path))[0] == 200
+    state.in_flight = admitted_below
+    status, headers = _call(middleware, _scope(path))
+    assert status == 503
+    assert headers[b"retry-after"] == b"1"
+
+def test_in_flight_released_after_request(unlimited):
+    state = AdmissionState()
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(state.in_flight)
+        await _ok(scope, receive, send)
+
+    _call(AdmissionMiddleware(app, state), _scope("/api/v1/metrics/overview"))
+    assert seen == [1]
+    assert state.in_flight == 0
+    assert state.counters[READ]["admitted"] == 1
+
+def test_streams_are_not_in_flight_work(unlimited):
+    state = AdmissionState()
+    state.in_flight = 10
+    assert _call(AdmissionMiddleware(_ok, state), _scope("/api/v1/metrics/stream"))[0] == 200
+    assert state.in_flight == 10
+
+def test_rate_limited_per_client(clock, monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMITS", {INGEST: (1, 2), READ: (1, 2), HEAVY_READ: (1, 2)})
+    state = AdmissionState()
+    middleware = AdmissionMiddleware(_ok, state)
+    # Heavy and normal reads share one budget
+    assert _call(middleware, _scope("/api/v1/metrics/overview"))[0] == 200
+    assert _call(middleware, _scope("/api/v1/carriers"))[0] == 200
+    status, headers = _call(middleware, _scope("/api/v1/metrics/overview"))
+    assert (status, headers[b"retry-after"]) == (429, b"1")
+    # Other clients and ingest have their own buckets
+    assert _call(middleware, _scope("/api/v1/metrics/overview", client="10.0.0.2"))[0] == 200
+    assert _call(middleware, _scope("/api/v1/events/call"))[0] == 200
+    clock[0] += 1
+    assert _call(middleware, _scope("/api/v1/metrics/overview"))[0] == 200
+    assert state.counters[READ]["rate_limited"] == 1
+
+def test_unknown_keys_share_the_address_bucket(clock, monkeypatch):
+    monkeypatch.setattr(admission, "RATE_LIMITS", {INGEST: (1, 1), READ: (1, 1), HEAVY_READ: (1, 1)})
+    middleware = AdmissionMiddleware(_ok, AdmissionState())
+    assert _call(middleware, _scope("/api/v1/metrics/overview", headers=[("x-api-key", "made-up-1")]))[0] == 200
+    assert _call(middleware, _scope("/api/v1/metrics/overview", headers=[("x-api-key", "made-up-2")]))[0] == 429
+
+def test_configured_keys_get_their_own_bucket(clock, monkeypatch):
+    from app.auth import KeyRing
+    monkeypatch.setenv("READ_API_KEYS", "key-a,key-b")
+    monkeypatch.setattr(admission, "key_ring", KeyRing())
+    monkeypatch.setattr(admission, "RATE_LIMITS", {INGEST: (1, 1), READ: (1, 1), HEAVY_READ: (1, 1)})
+    middleware = AdmissionMiddleware(_ok, AdmissionState())
+    assert _call(middleware, _scope("/api/v1/metrics/overview", headers=[("x-api-key", "key-a")]))[0] == 200
+    assert _call(middleware, _scope("/api/v1/metrics/overview", headers=[("authorization", "Bearer key-b")]))[0] == 200
+    assert _call(middleware, _scope("/api/v1/metrics/overview", headers=[("x-api-key", "key-a")]))[0] == 429
@@ -0,0 +1,103 @@
+import hashlib
+import pytest
+from app import auth
+from app.auth import KeyRing, READ_SCOPE, INGEST_SCOPE, issue_stream_token, verify_stream_token
+
+@pytest.fixture
+def keys(monkeypatch):
+    for variables in auth.SCOPE_KEY_VARIABLES.values():
+        for variable in variables:
+            monkeypatch.delenv(variable, raising=False)
+    return monkeypatch
+
+def test_plain_and_hashed_entries(keys):
+    digest = hashlib.sha256(b"hashed-key").hexdigest()
+    keys.setenv("READ_API_KEYS", f"plain-key, sha256:{digest}")
+    ring = KeyRing()
+    assert ring.scopes("plain-key") == {READ_SCOPE}
+    assert ring.scopes("hashed-key") == {READ_SCOPE}
+    # The digest itself is not a key
+    assert ring.scopes(f"sha256:{digest}") == frozenset()
+    assert ring.scopes(digest) == frozenset()
+
+def test_key_in_several_scopes(keys):
+    keys.setenv("READ_API_KEY", "shared")
+    keys.setenv("INGEST_API_KEYS", "shared,ingest-only")
+    ring = KeyRing()
+    assert ring.scopes("shared") == {READ_SCOPE, INGEST_SCOPE}
+    assert ring.scopes("ingest-only") == {INGEST_SCOPE}
+    assert ring.is_configured(READ_SCOPE) and ring.is_configured(INGEST_SCOPE)
+
+def test_unconfigured_scope(keys):
+    keys.setenv("INGEST_API_KEY", "ingest")
+    ring = KeyRing()
+    assert not ring.is_configured(READ_SCOPE)
+    assert ring.is_configured()
+
+def test_only_accepted_keys_are_cached(keys):
+    keys.setenv("READ_API_KEYS", "good")
+    ring = KeyRing(max_cached=2)
+    ring.scopes("good")
+    for attempt in range(10):
+        assert ring.scopes(f"bad-{attempt}") == frozenset()
+    assert list(ring._cache) == ["good"]
+
+def test_cache_is_bounded(keys):
+    keys.setenv("READ_API_KEYS", "a,b,c")
+    ring = KeyRing(max_cached=2)
+    for key in ("a", "b", "a", "c"):
+        ring.scopes(key)
+    assert list(ring._cache) == ["a", "c"]
+
+def test_reload_drops_retired_keys(keys):
+    keys.setenv("READ_API_KEYS", "old,current")
+    ring = KeyRing()
+    assert ring.scopes("old") == {READ_SCOPE}
+    keys.setenv("READ_API_KEYS", "current,new")
+    ring.reload()
+    assert not ring._cache
+    assert ring.scopes("old") == frozenset()
+    assert ring.scopes("new") == {READ_SCOPE}
+
+@pytest.fixture
+def stream_keys(keys):
+    keys.setenv("READ_API_KEYS", "reader")
+    keys.setattr(auth, "key_ring", KeyRing())
+    keys.setattr(auth, "STREAM_TOKEN_SECRET", "")
+    now = [1_800_000_000.0]
+    keys.setattr(auth.time, "time", lambda: now[0])
+    return now
+
+def test_stream_token_round_trip(stream_keys):
+    issued = issue_stream_token()
+    assert issued["expires_at"] == int(stream_keys[0]) + auth.STREAM_TOKEN_TTL_SECONDS
+    assert verify_stream_token(issued["token"])
+
+def test_stream_token_expires(stream_keys):
+    token = issue_stream_token()["token"]
+    stream_keys[0] += auth.STREAM_TOKEN_TTL_SECONDS
+    assert verify_stream_token(token)
+    stream_keys[0] += 1
+    assert not verify_stream_token(token)
+
+def test_stream_token_signature_checked(stream_keys):
+    expires, _, signature = issue_stream_token()["token"].partition(".")
+    # Extending the expiry invalidates the signature
+    assert not verify_stream_token(f"{int(expires) + 3600}.{signature}")
+    assert not verify_stream_token(f"{expires}.{'0' * len(signature)}")
+    assert not verify_stream_token(f"{expires}.")
+    assert not verify_stream_token("not-a-token")
+    assert not verify_stream_token("")
+
+def test_stream_tokens_die_with_rotated_read_keys(stream_keys, monkeypatch):
+    token = issue_stream_token()["token"]
+    monkeypatch.setenv("READ_API_KEYS", "rotated")
+    auth.key_ring.reload()
+    assert not verify_stream_token(token)
+
+def test_stream_token_secret(stream_keys, monkeypatch):
+    monkeypatch.setattr(auth, "STREAM_TOKEN_SECRET", "worker-secret")
+    token = issue_stream_token()["token"]
+    assert verify_stream_token(token)
+    monkeypatch.setattr(auth, "STREAM_TOKEN_SECRET", "other-secret")
+    assert not verify_stream_token(token)
@@ -0,0 +1,78 @@
+from datetime import date
+import hashlib
+import math
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.models import DistinctSketchRegister
+from app.utils.distinct_sketch import PRECISION, REGISTERS, estimate, distinct_counts
+
+# Standard error of the estimate at this precision
+ERROR = 1.04 / math.sqrt(REGISTERS)
+
+def _registers(items):
+    """Registers as the SQL fills them: low PRECISION bits pick one, rank = first set bit of the rest"""
+    registers = {}
+    for item in items:
+        h = int.from_bytes(hashlib.blake2b(str(item).encode(), digest_size=8).digest(), "big")
+        rest = h >> PRECISION
+        rank = (rest & -rest).bit_length() if rest else 64 - PRECISION + 1
+        register = h & (REGISTERS - 1)
+        registers[register] = max(registers.get(register, 0), rank)
+    return registers
+
+def _estimate(registers):
+    return estimate(len(registers), sum(2.0 ** -rank for rank in registers.values()))
+
+def _merge(*sketches):
+    merged = {}
+    for registers in sketches:
+        for register, rank in registers.items():
+            merged[register] = max(merged.get(register, 0), rank)
+    return merged
+
+def test_empty_sketch():
+    assert estimate(0, 0.0) == 0
+
+def test_small_range_uses_linear_counting():
+    for n in (1, 10, 100, 1000):
+        assert abs(_estimate(_registers(range(n))) - n) <= max(1, 3 * ERROR * n)
+
+def test_linear_counting_is_exact_for_one_item():
+    assert _estimate(_registers(["carrier-1"])) == 1
+
+def test_large_range_estimate():
+    n = 200000
+    assert abs(_estimate(_registers(range(n))) - n) <= 3 * ERROR * n
+
+def test_merged_days_count_repeat_items_once():
+    monday = _registers(range(0, 6000))
+    tuesday = _registers(range(4000, 10000))
+    merged = _estimate(_merge(monday, tuesday))
+    assert abs(merged - 10000) <= 3 * ERROR * 10000
+    assert _estimate(_merge(monday, monday)) == _estimate(monday)
+
+def test_distinct_counts_merges_days_per_segment():
+    engine = create_engine("sqlite://")
+    DistinctSketchRegister.__table__.create(engine)
+    days = {
+        date(2026, 3, 2): {"Dry Van": range(0, 300), "Reefer": range(0, 50)},
+        date(2026, 3, 3): {"Dry Van": range(200, 500), "Reefer": range(1000, 1100)},
+    }
+    with Session(engine) as db:
+        for day, segments in days.items():
+            for segment, carriers in segments.items():
+                for register, rank in _registers(carriers).items():
+                    db.add(DistinctSketchRegister(
+                        stat_date=day, metric="carriers", segment_type="equipment_type",
+                        segment=segment, register=register, rank=rank
+                    ))
+        db.commit()
+
+        points = distinct_counts(db, date(2026, 3, 1), date(2026, 3, 31), "total", "equipment_type")
+        counts = {point["segment"]: point["unique_carriers"] for point in points}
+        assert abs(counts["Dry Van"] - 500) <= 3 * ERROR * 500
+        assert abs(counts["Reefer"] - 150) <= 3 * ERROR * 150
+        assert all(point["unique_lanes"] == 0 and point["period"] is None for point in points)
+
+        outside = distinct_counts(db, date(2026, 4, 1), date(2026, 4, 30), "total", "equipment_type")
+        assert outside == []
@@ -0,0 +1,54 @@
+from collections import Counter
+import random
+from app.utils.rate_sketch import RELATIVE_ACCURACY, bucket_index, bucket_value, quantiles
+
+def _sketch(values):
+    return Counter(bucket_index(value) for value in values).items()
+
+def _exact(values, q):
+    # Same rank rule as quantiles(): the value at index floor(q * (n - 1))
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def _close(estimate, exact):
+    # quantiles() rounds to 4 decimals on top of the sketch's relative error
+    return abs(estimate - exact) <= RELATIVE_ACCURACY * exact + 5e-5
+
+def test_bucket_value_within_relative_accuracy():
+    for value in [0.01, 0.5, 1.0, 1.99, 2.0, 2.37, 3.14159, 10.0, 250.0]:
+        assert abs(bucket_value(bucket_index(value)) - value) <= RELATIVE_ACCURACY * value
+
+def test_bucket_index_is_monotonic():
+    values = [0.1 * i for i in range(1, 200)]
+    indexes = [bucket_index(value) for value in values]
+    assert indexes == sorted(indexes)
+
+def test_quantiles_match_exact_percentiles():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(0.8, 0.35) for _ in range(20000)]
+    qs = (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99)
+    result = quantiles(_sketch(values), qs)
+    assert result["count"] == len(values)
+    for q in qs:
+        assert _close(result[f"p{round(q * 100)}"], _exact(values, q)), q
+
+def test_merged_sketches_match_the_union():
+    rng = random.Random(11)
+    lane_a = [rng.uniform(1.5, 2.5) for _ in range(3000)]
+    lane_b = [rng.uniform(2.0, 4.0) for _ in range(5000)]
+    # Buckets may repeat across sketches, as when the SQL merges carriers or days
+    merged = list(_sketch(lane_a)) + list(_sketch(lane_b))
+    result = quantiles(merged)
+    assert result["count"] == 8000
+    for q in (0.1, 0.5, 0.9):
+        assert _close(result[f"p{round(q * 100)}"], _exact(lane_a + lane_b, q))
+
+def test_empty_sketch():
+    assert quantiles([]) is None
+    assert quantiles([(bucket_index(2.0), 0)]) is None
+
+def test_single_sample():
+    result = quantiles(_sketch([2.25]))
+    assert result["count"] == 1
+    assert result["p10"] == result["p50"] == result["p90"]
+    assert _close(result["p50"], 2.25)
@@ -0,0 +1,91 @@
+from sqlalchemy import create_engine, text
+from starlette.requests import Request
+from fastapi import Response
+import time
+from app import database
+from app.database import ReadRouter, mark_write, wrote_recently, LAST_WRITE_HEADER, LAST_WRITE_COOKIE
+
+def _engine(tmp_path, name):
+    return create_engine(f"sqlite:///{tmp_path / name}")
+
+def _unreachable():
+    return create_engine("sqlite:////nonexistent-dir/replica.db")
+
+def _url(db):
+    return str(db.get_bind().url)
+
+def _request(headers=None):
+    raw = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+def test_round_robin_over_replicas(tmp_path):
+    replicas = [_engine(tmp_path, "a.db"), _engine(tmp_path, "b.db")]
+    router = ReadRouter(_engine(tmp_path, "primary.db"), replicas)
+    urls = []
+    for _ in range(4):
+        db = router.session()
+        urls.append(_url(db))
+        db.close()
+    assert urls == [str(replicas[0].url), str(replicas[1].url)] * 2
+    assert [engine["reads"] for engine in router.stats()["engines"]] == [0, 2, 2]
+
+def test_failed_replica_is_skipped(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_RETRY_SECONDS", 60)
+    healthy = _engine(tmp_path, "healthy.db")
+    router = ReadRouter(_engine(tmp_path, "primary.db"), [_unreachable(), healthy])
+    for _ in range(3):
+        db = router.session()
+        assert _url(db) == str(healthy.url)
+        db.execute(text("SELECT 1"))
+        db.close()
+    stats = router.stats()
+    assert stats["failovers"] == 1
+    down, up = stats["engines"][1], stats["engines"][2]
+    assert (down["healthy"], down["failures"], down["reads"]) == (False, 1, 0)
+    assert (up["healthy"], up["reads"]) == (True, 3)
+
+def test_falls_back_to_primary(tmp_path):
+    primary = _engine(tmp_path, "primary.db")
+    router = ReadRouter(primary, [_unreachable()])
+    db = router.session()
+    assert _url(db) == str(primary.url)
+    db.close()
+    assert router.stats()["engines"][0]["reads"] == 1
+
+def test_replica_retried_after_backoff(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, "REPLICA_RETRY_SECONDS", 0)
+    replica = _engine(tmp_path, "replica.db")
+    router = ReadRouter(_engine(tmp_path, "primary.db"), [replica])
+    router._replicas[0]["down_until"] = time.monotonic() - 1
+    db = router.session()
+    assert _url(db) == str(replica.url)
+    db.close()
+
+def test_primary_requested(tmp_path):
+    primary = _engine(tmp_path, "primary.db")
+    router = ReadRouter(primary, [_engine(tmp_path, "replica.db")])
+    db = router.session(primary=True)
+    assert _url(db) == str(primary.url)
+    db.close()
+
+def test_read_your_writes_disabled(monkeypatch):
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 0)
+    response = Response()
+    mark_write(response)
+    assert LAST_WRITE_HEADER not in response.headers
+    assert not wrote_recently(_request({LAST_WRITE_HEADER: f"{time.time():.3f}"}))
+
+def test_mark_write_round_trip(monkeypatch):
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 5)
+    response = Response()
+    mark_write(response)
+    written = response.headers[LAST_WRITE_HEADER]
+    assert f"{LAST_WRITE_COOKIE}={written}" in response.headers["set-cookie"]
+    assert wrote_recently(_request({LAST_WRITE_HEADER: written}))
+    assert wrote_recently(_request({"Cookie": f"{LAST_WRITE_COOKIE}={written}"}))
+
+def test_only_the_writing_client_reads_the_primary(monkeypatch):
+    monkeypatch.setattr(database, "READ_YOUR_WRITES_SECONDS", 5)
+    assert not wrote_recently(_request())
+    assert not wrote_recently(_request({LAST_WRITE_HEADER: f"{time.time() - 10:.3f}"}))
+    assert not wrote_recently(_request({LAST_WRITE_HEADER: "garbage"}))
@@ -0,0 +1,229 @@
+from pydantic import TypeAdapter
+from threading import Lock, Thread
+import time
+from app.utils import result_cache as result_cache_module
+from app.utils.result_cache import ResultCache
+
+INT = TypeAdapter(int)
+
+class FakeShared:
+    """Enough of the Redis client API for ResultCache (get / set nx px / exists / delete)"""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            return self.values.get(key)
+
+    def set(self, key, value, nx=False, px=None):
+        with self.lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value
+            return True
+
+    def exists(self, key):
+        with self.lock:
+            return int(key in self.values)
+
+    def delete(self, key):
+        with self.lock:
+            return int(self.values.pop(key, None) is not None)
+
+class BrokenShared:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("shared cache down")
+        return fail
+
+def _counting(value):
+    calls = []
+    def compute():
+        calls.append(1)
+        return value
+    return compute, calls
+
+def test_local_hit_skips_compute():
+    cache = ResultCache(max_size=4, ttl=60)
+    compute, calls = _counting(7)
+    assert cache.get_or_compute("k", compute, INT) == 7
+    assert cache.get_or_compute("k", compute, INT) == 7
+    assert len(calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.get_or_compute("a", lambda: 1, INT)
+    cache.get_or_compute("b", lambda: 2, INT)
+    cache.get_or_compute("a", lambda: 1, INT)
+    cache.get_or_compute("c", lambda: 3, INT)
+    assert list(cache._entries) == ["a", "c"]
+    compute, calls = _counting(2)
+    cache.get_or_compute("b", compute, INT)
+    assert len(calls) == 1
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_size=4, ttl=10)
+    compute, calls = _counting(5)
+    cache.get_or_compute("k", compute, INT)
+    now[0] += 9
+    cache.get_or_compute("k", compute, INT)
+    assert len(calls) == 1
+    now[0] += 2
+    cache.get_or_compute("k", compute, INT)
+    assert len(calls) == 2
+
+def test_shared_hit_fills_local_tier():
+    shared = FakeShared()
+    shared.values["k"] = b"42"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    compute, calls = _counting(0)
+    assert cache.get_or_compute("k", compute, INT) == 42
+    assert cache.get_or_compute("k", compute, INT) == 42
+    assert not calls
+    assert (cache.shared_hits, cache.hits) == (1, 1)
+
+def test_miss_stores_shared_and_releases_lock():
+    shared = FakeShared()
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    assert cache.get_or_compute("k", lambda: 9, INT) == 9
+    assert shared.values == {"k": b"9"}
+
+def test_waits_for_another_worker_holding_the_lock(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "SHARED_LOCK_SECONDS", 5)
+    shared = FakeShared()
+    shared.values["k:lock"] = b"1"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+
+    def other_worker():
+        time.sleep(0.2)
+        shared.set("k", b"11")
+        shared.delete("k:lock")
+
+    worker = Thread(target=other_worker)
+    worker.start()
+    compute, calls = _counting(0)
+    assert cache.get_or_compute("k", compute, INT) == 11
+    worker.join()
+    assert not calls
+    assert cache.shared_hits == 1
+
+def test_computes_when_lock_holder_gives_up(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "SHARED_LOCK_SECONDS", 5)
+    shared = FakeShared()
+    shared.values["k:lock"] = b"1"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+
+    def other_worker():
+        time.sleep(0.2)
+        shared.delete("k:lock")
+
+    worker = Thread(target=other_worker)
+    worker.start()
+    compute, calls = _counting(3)
+    assert cache.get_or_compute("k", compute, INT) == 3
+    worker.join()
+    assert len(calls) == 1
+
+def test_lock_wait_is_bounded(monkeypatch):
+    monkeypatch.setattr(result_cache_module, "SHARED_LOCK_SECONDS", 0.2)
+    shared = FakeShared()
+    shared.values["k:lock"] = b"1"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    started = time.monotonic()
+    assert cache.get_or_compute("k", lambda: 4, INT) == 4
+    assert time.monotonic() - started < 2
+
+def test_concurrent_misses_compute_once():
+    cache = ResultCache(max_size=4, ttl=60, shared=FakeShared())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 8
+
+    results = []
+    threads = [Thread(target=lambda: results.append(cache.get_or_compute("k", compute, INT))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [8] * 5
+    assert len(calls) == 1
+
+def test_shared_outage_falls_back_to_compute():
+    cache = ResultCache(max_size=4, ttl=60, shared=BrokenShared())
+    assert cache.get_or_compute("k", lambda: 6, INT) == 6
+    assert cache.get_or_compute("k", lambda: 0, INT) == 6
+
+def test_invalidate_drops_affected_entries():
+    cache = ResultCache(max_size=4, ttl=60)
+    cache.get_or_compute("lanes", lambda: 1, INT, depends=lambda change: "lanes" in change["domains"])
+    cache.get_or_compute("other", lambda: 2, INT, depends=lambda change: False)
+    assert cache.invalidate({"domains": ["lanes"]}) == 1
+    assert list(cache._entries) == ["other"]
+
+def test_stale_shared_hit_is_not_kept_locally():
+    shared = FakeShared()
+    shared.values["agg:x:call_events:5:()"] = b"5"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    cache.note_versions({"call_events": 6})
+    seen = {}
+
+    def shared_key():
+        # As result_cache.cached does on a lagging replica still at version 5
+        seen.update({"call_events": 5})
+        return "agg:x:call_events:5:()"
+
+    compute, calls = _counting(0)
+    fresh = lambda: cache.is_current(seen)
+    assert cache.get_or_compute("agg:x:()", compute, INT, shared_key=shared_key, fresh=fresh) == 5
+    assert not calls
+    assert "agg:x:()" not in cache._entries
+    assert (cache.shared_hits, cache.stale) == (1, 1)
+
+def test_current_shared_hit_is_kept_locally():
+    shared = FakeShared()
+    shared.values["agg:x:call_events:6:()"] = b"6"
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    cache.note_versions({"call_events": 6})
+    seen = {}
+
+    def shared_key():
+        seen.update({"call_events": 6})
+        return "agg:x:call_events:6:()"
+
+    fresh = lambda: cache.is_current(seen)
+    assert cache.get_or_compute("agg:x:()", lambda: 0, INT, shared_key=shared_key, fresh=fresh) == 6
+    assert "agg:x:()" in cache._entries
+
+def test_cached_on_lagging_replica_does_not_pin_old_shared_entry(monkeypatch):
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import Session
+    from app.models import DataVersion
+    from app.utils.result_cache import cached
+
+    engine = create_engine("sqlite://")
+    DataVersion.__table__.create(engine)
+    shared = FakeShared()
+    cache = ResultCache(max_size=4, ttl=60, shared=shared)
+    monkeypatch.setattr(result_cache_module, "result_cache", cache)
+    cache.notified = True
+    cache.note_versions({"call_events": 6})
+
+    @cached("x", int, ["call_events"])
+    def aggregate(db):
+        return 0
+
+    with Session(engine) as replica:
+        replica.add(DataVersion(domain="call_events", version=5))
+        replica.commit()
+        shared.values["agg:x:call_events:5:" + result_cache_module.normalize_args()] = b"5"
+        assert aggregate(replica) == 5
+    assert not cache._entries
+    assert cache.stale == 1
@@ -0,0 +1,112 @@
+from threading import Barrier, Lock, Thread
+import time
+import pytest
+from app.utils import single_flight as single_flight_module
+from app.utils.single_flight import SingleFlight, coalesced
+
+class FakeSession:
+    """What coalesced reads from a session: its bind, info and (via get_data_version) its data version"""
+
+    def __init__(self, bind="primary", version=1, snapshot_id=None):
+        self.bind = bind
+        self.version = version
+        self.info = {"snapshot_id": snapshot_id} if snapshot_id else {}
+
+    def get_bind(self):
+        return self.bind
+
+@pytest.fixture(autouse=True)
+def fresh_single_flight(monkeypatch):
+    monkeypatch.setattr(single_flight_module, "single_flight", SingleFlight())
+    monkeypatch.setattr(
+        single_flight_module, "get_data_version",
+        lambda db, domains: (".".join(f"{domain}:{db.version}" for domain in sorted(domains)), None)
+    )
+
+def _aggregate():
+    calls = []
+    lock = Lock()
+
+    @coalesced("test", ["call_events"])
+    def aggregate(db, value):
+        with lock:
+            calls.append((db.bind, db.version))
+        time.sleep(0.2)
+        return value
+
+    return aggregate, calls
+
+def _concurrently(fn, argument_lists):
+    barrier = Barrier(len(argument_lists))
+    results = [None] * len(argument_lists)
+
+    def run(index, args):
+        barrier.wait()
+        results[index] = fn(*args)
+
+    threads = [Thread(target=run, args=(index, args)) for index, args in enumerate(argument_lists)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_identical_calls_run_once():
+    aggregate, calls = _aggregate()
+    results = _concurrently(aggregate, [(FakeSession(), 1) for _ in range(5)])
+    assert results == [1] * 5
+    assert len(calls) == 1
+    assert single_flight_module.single_flight.stats()["test"] == {"calls": 5, "executions": 1, "deduplicated": 4}
+
+def test_different_arguments_run_separately():
+    aggregate, calls = _aggregate()
+    assert _concurrently(aggregate, [(FakeSession(), 1), (FakeSession(), 2)]) == [1, 2]
+    assert len(calls) == 2
+
+def test_different_engines_run_separately():
+    aggregate, calls = _aggregate()
+    _concurrently(aggregate, [(FakeSession(bind="primary"), 1), (FakeSession(bind="replica-1"), 1)])
+    assert sorted(calls) == [("primary", 1), ("replica-1", 1)]
+
+def test_different_data_versions_run_separately():
+    aggregate, calls = _aggregate()
+    _concurrently(aggregate, [(FakeSession(version=5), 1), (FakeSession(version=6), 1)])
+    assert sorted(calls) == [("primary", 5), ("primary", 6)]
+
+def test_snapshot_sessions_are_not_coalesced():
+    aggregate, calls = _aggregate()
+    sessions = [FakeSession(snapshot_id="00000003-0000001B-1") for _ in range(3)]
+    _concurrently(aggregate, [(db, 1) for db in sessions])
+    assert len(calls) == 3
+    assert "test" not in single_flight_module.single_flight.stats()
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight()
+    started = Barrier(2)
+
+    def fail():
+        started.wait()
+        time.sleep(0.2)
+        raise ValueError("boom")
+
+    errors = []
+
+    def leader():
+        try:
+            flight.do("k", fail)
+        except ValueError as e:
+            errors.append(e)
+
+    def follower():
+        started.wait()
+        try:
+            flight.do("k", lambda: "not run")
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [Thread(target=leader), Thread(target=follower)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 2 and errors[0] is errors[1]
@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+import pytest
+from app.utils.trend_series import TREND_SERIES_MAX_PERIODS, build_series, period_count, trend_periods
+
+WEDNESDAY = date(2026, 3, 4)
+
+def test_weeks_start_on_monday():
+    periods = trend_periods(WEDNESDAY, date(2026, 3, 16), "week")
+    assert periods == [date(2026, 3, 2), date(2026, 3, 9), date(2026, 3, 16)]
+    assert all(period.weekday() == 0 for period in periods)
+
+def test_days_and_hours_start_on_each_day():
+    assert trend_periods(WEDNESDAY, date(2026, 3, 6), "day") == [date(2026, 3, 4), date(2026, 3, 5), date(2026, 3, 6)]
+    assert trend_periods(WEDNESDAY, date(2026, 3, 6), "hour") == trend_periods(WEDNESDAY, date(2026, 3, 6), "day")
+
+@pytest.mark.parametrize("interval", ["hour", "day", "week"])
+def test_period_count_matches_periods(interval):
+    for start_offset in range(7):
+        start = WEDNESDAY + timedelta(days=start_offset)
+        for length in range(-3, 40):
+            end = start + timedelta(days=length)
+            assert period_count(start, end, interval) == len(trend_periods(start, end, interval))
+
+def test_empty_window():
+    assert period_count(WEDNESDAY, WEDNESDAY - timedelta(days=1), "day") == 0
+    assert build_series([], {}, WEDNESDAY, date(2026, 3, 10), "day") == []
+
+def test_window_at_the_limit():
+    end = WEDNESDAY + timedelta(days=TREND_SERIES_MAX_PERIODS - 1)
+    assert period_count(WEDNESDAY, end, "day") == TREND_SERIES_MAX_PERIODS
+    assert period_count(WEDNESDAY, end + timedelta(days=1), "day") == TREND_SERIES_MAX_PERIODS + 1
+    # A week window counts weeks, so it may span far more days
+    assert period_count(WEDNESDAY, end, "week") < TREND_SERIES_MAX_PERIODS
+
+def test_gaps_filled_with_zeros():
+    rows = [
+        (1, date(2026, 3, 4), 4, 0.5, 0.25, 2.345),
+        (1, datetime(2026, 3, 6), 2, 1.0, None, None),
+    ]
+    [series] = build_series(rows, {1: "Chicago -> Dallas"}, WEDNESDAY, date(2026, 3, 7), "day")
+    assert (series.key, series.label, series.total_calls) == (1, "Chicago -> Dallas", 6)
+    assert [point.date for point in series.data] == [
+        "2026-03-04 00:00:00", "2026-03-05 00:00:00", "2026-03-06 00:00:00", "2026-03-07 00:00:00"
+    ]
+    assert [point.total_calls for point in series.data] == [4, 0, 2, 0]
+    first, gap, third = series.data[:3]
+    assert (first.success_rate, first.avg_sentiment, first.avg_rpm) == (50.0, 0.25, 2.35)
+    assert (gap.success_rate, gap.avg_sentiment, gap.avg_rpm) == (0, 0, 0)
+    assert (third.success_rate, third.avg_rpm) == (100.0, 0)
+
+def test_weekly_rows_land_on_monday_periods():
+    rows = [(7, date(2026, 3, 9), 3, 0.0, 0.0, 1.5)]
+    [series] = build_series(rows, {}, WEDNESDAY, date(2026, 3, 18), "week")
+    assert [(point.date, point.total_calls) for point in series.data] == [
+        ("2026-03-02 00:00:00", 0), ("2026-03-09 00:00:00", 3), ("2026-03-16 00:00:00", 0)
+    ]
+    assert series.label == ""
+
+def test_busiest_series_first():
+    rows = [
+        (2, WEDNESDAY, 1, 1.0, 0.0, 2.0),
+        (3, WEDNESDAY, 5, 1.0, 0.0, 2.0),
+        (1, WEDNESDAY, 1, 1.0, 0.0, 2.0),
+    ]
+    series = build_series(rows, {}, WEDNESDAY, WEDNESDAY, "day")
+    assert [item.key for item in series] == [3, 1, 2]
+
+def test_route_rejects_windows_over_the_limit(monkeypatch):
+    import asyncio
+    from fastapi import HTTPException, Response
+    from app.routes import metrics
+
+    monkeypatch.setattr(metrics, "check_not_modified", lambda *args, **kwargs: pytest.fail("reached the database"))
+    start = datetime(2026, 3, 4)
+    with pytest.raises(HTTPException) as rejected:
+        asyncio.run(metrics.get_trends_series(
+            request=None, response=Response(), group_by="lane", top=5, start_date=start,
+            end_date=start + timedelta(days=TREND_SERIES_MAX_PERIODS), interval="day", db=None, api_key="reader"
+        ))
+    assert rejected.value.status_code == 400
+    assert str(TREND_SERIES_MAX_PERIODS) in rejected.value.detail